@@ -0,0 +1,125 @@
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+
+from impl.lexer import Lexer, LexerError
+from impl.syntax import KINDS, ParserError, PredParser, LRParser
+from impl.tables import TableCache, dump_tables, load_tables
+
+# parses many inputs against one grammar: the tables are built (or loaded from the cache) once,
+# shipped to each worker process as the bytes of a table file and loaded there once
+
+def main():
+    ap = argparse.ArgumentParser(prog='python -m impl.batch', description='parse many files against one grammar')
+    ap.add_argument('grammar')
+    ap.add_argument('kind', choices=list(KINDS))
+    ap.add_argument('inputs', nargs='+')
+    ap.add_argument('--jobs', type=int, default=None, help='worker processes, all cores by default')
+    ap.add_argument('--lexer', help='lexer spec (see impl/lexer.py), inputs are split on whitespace without one')
+    args = ap.parse_args()
+
+    with open(args.grammar) as file:
+        grammar_text = file.read()
+    lexer_spec = None
+    if args.lexer:
+        with open(args.lexer) as file:
+            lexer_spec = file.read()
+
+    start = time.perf_counter()
+    failed = 0
+    for result in parse_many(grammar_text, args.kind, args.inputs, args.jobs, lexer_spec):
+        if result.error is None:
+            print(f'{result.path}: ok, {result.n_rules} rules')
+        else:
+            failed += 1
+            print(f'{result.path}: {result.error}')
+    print(f'{len(args.inputs)} inputs, {failed} failed, {(time.perf_counter() - start) * 1000:.1f}ms', file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+class BatchResult(NamedTuple):
+    path: str
+    # reductions (LR) or predictions (pred) made, 0 on error
+    n_rules: int
+    # indices into the grammar's rules, in the order parse() returns them, only with keep_rules
+    rules: list[int] | None
+    error: str | None
+
+# per worker process, set by _init
+_parser: PredParser | LRParser | None = None
+_lexer: Lexer | None = None
+_rule_ids: dict[int, int] = {}
+_keep_rules = False
+
+def _init(table_data: bytes, lexer_spec: str | None, keep_rules: bool):
+    global _parser, _lexer, _rule_ids, _keep_rules
+    _parser = load_tables(io.BytesIO(table_data))
+    _lexer = Lexer.from_spec(lexer_spec) if lexer_spec is not None else None
+    _rule_ids = {id(rule): i for i, rule in enumerate(_parser.g.rules)}
+    _keep_rules = keep_rules
+
+def _tokens(path: str) -> Iterable[str]:
+    if _lexer is not None:
+        with open(path) as file:
+            return _lexer.kinds(file.read())
+    return _split(path)
+
+def _split(path: str) -> Iterator[str]:
+    with open(path) as file:
+        for line in file:
+            yield from line.split()
+
+def _parse_one(path: str) -> BatchResult:
+    # errors are part of the result, one bad input does not stop the others
+    try:
+        tokens = _tokens(path)
+        if isinstance(_parser, PredParser):
+            applied = _parser.parse_iter(tokens)
+        else:
+            applied = _parser.parse(tokens)
+        if _keep_rules:
+            rules = [_rule_ids[id(rule)] for rule in applied]
+            return BatchResult(path, len(rules), rules, None)
+        return BatchResult(path, sum(1 for _ in applied), None, None)
+    except (OSError, UnicodeDecodeError, LexerError, ParserError) as e:
+        return BatchResult(path, 0, None, f'{type(e).__name__}: {e}')
+
+def build_table_data(grammar_text: str, kind: str, cache: TableCache | None = None) -> bytes:
+    # the compact form sent to the workers, see impl/tables.py
+    parser = (cache or TableCache()).load_or_build(grammar_text, kind)
+    buf = io.BytesIO()
+    dump_tables(parser, buf)
+    return buf.getvalue()
+
+def parse_many(
+    grammar_text: str,
+    kind: str,
+    paths: Iterable[str],
+    jobs: int | None = None,
+    lexer_spec: str | None = None,
+    keep_rules: bool = False,
+    cache: TableCache | None = None,
+) -> Iterator[BatchResult]:
+    # results come back in the order of paths, as soon as each one and those before it are done
+    # a GrammarError (e.g. a conflict) is raised before any input is read
+    table_data = build_table_data(grammar_text, kind, cache)
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1 or len(paths) <= 1:
+        _init(table_data, lexer_spec, keep_rules)
+        for path in paths:
+            yield _parse_one(path)
+        return
+
+    # a few chunks per worker, so small files don't pay one round trip each
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(jobs, initializer=_init, initargs=(table_data, lexer_spec, keep_rules)) as pool:
+        yield from pool.map(_parse_one, paths, chunksize=chunksize)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Generator, Iterator
+
+from impl.syntax import PredParser, SLRParser, LALRParser, parse_bnf
+from impl.tree import parse_tree
+from impl.glr import GLRParser
+from impl.packed import PackedTables
+from impl.regex import Concat, End, LazyDFA, Pattern, assign_ids, build_dfa, minimize_dfa, parse, positions, to_yaml
+
+# a case is a generator yielding (phase, thunk), the runner sends each thunk's result
+# back in so the next phase can use it, every run starts from scratch
+type Case = Generator[tuple[str, Callable[[], object]], object, None]
+
+# next to impl/, wherever this is run from
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'baseline.json')
+
+def main():
+    ap = argparse.ArgumentParser(prog='python -m impl.bench', description='time and peak memory per analysis phase')
+    ap.add_argument('--quick', action='store_true', help='small sizes, for a smoke run')
+    ap.add_argument('--repeat', type=int, default=3, help='timed runs per case, the best one is kept')
+    ap.add_argument('--only', help='run only the cases whose name contains this')
+    ap.add_argument('--save', nargs='?', const=BASELINE_PATH, help='write the results as the new baseline')
+    ap.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='fail on regressions against a baseline')
+    ap.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown / memory growth, 0.25 = 25%%')
+    ap.add_argument('--allow-missing', action='store_true', help='only warn about phases that are in just one of baseline and run')
+    args = ap.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        # the sizes, and so every case name, depend on --quick
+        if baseline.get('quick', False) != args.quick:
+            made = 'with' if baseline.get('quick', False) else 'without'
+            sys.exit(f'{args.compare} was made {made} --quick, compare it with a run made the same way')
+        # other interpreters have other timings and object sizes, the comparison still runs
+        made_on = f"{baseline.get('implementation', 'CPython')} {baseline.get('python', '?')}"
+        if made_on.rsplit('.', 1)[0] != interpreter().rsplit('.', 1)[0]:
+            print(f'warning: {args.compare} was made on {made_on}, this is {interpreter()}', file=sys.stderr)
+
+    results = {}
+    for name, case in cases(args.quick):
+        if args.only and args.only not in name: continue
+        for phase, seconds, peak in run_case(case, args.repeat):
+            key = f'{name}/{phase}'
+            results[key] = {'time': round(seconds, 6), 'peak': peak}
+            print(f'{key:<40} {seconds * 1000:10.2f}ms {peak / 1024:10.1f}KiB', flush=True)
+
+    report = {
+        'implementation': platform.python_implementation(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'quick': args.quick,
+        'results': results,
+    }
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+    if baseline is not None:
+        expected = {key: value for key, value in baseline['results'].items() if not args.only or args.only in key.rsplit('/', 1)[0]}
+        unmatched = unmatched_keys(expected, results)
+        regressions = compare(expected, results, args.tolerance)
+        for line in [*unmatched, *regressions]:
+            print(line)
+        if regressions or (unmatched and not args.allow_missing):
+            sys.exit(1)
+
+def interpreter() -> str:
+    return f'{platform.python_implementation()} {platform.python_version()}'
+
+def run_case(case: Callable[[], Case], repeat: int) -> Iterator[tuple[str, float, int]]:
+    # best wall time over `repeat` plain runs, then one more run under tracemalloc for the
+    # peak, which would otherwise skew the timings
+    best: dict[str, float] = {}
+    for _ in range(repeat):
+        for phase, seconds, _ in drive(case(), traced=False):
+            best[phase] = min(seconds, best.get(phase, seconds))
+
+    tracemalloc.start()
+    try:
+        for phase, _, peak in drive(case(), traced=True):
+            yield phase, best[phase], peak
+    finally:
+        tracemalloc.stop()
+
+def drive(gen: Case, traced: bool) -> Iterator[tuple[str, float, int]]:
+    result = None
+    while True:
+        try:
+            phase, thunk = gen.send(result)
+        except StopIteration:
+            return
+        if traced:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = thunk()
+        seconds = time.perf_counter() - start
+        # memory the phase needed on top of what was already live
+        peak = tracemalloc.get_traced_memory()[1] - base if traced else 0
+        yield phase, seconds, peak
+
+def unmatched_keys(baseline: dict[str, dict], results: dict[str, dict]) -> list[str]:
+    # a phase without a baseline is not guarded at all, one that no longer runs is a renamed
+    # or dropped case: either way the baseline needs regenerating with --save
+    lines = [f'not in baseline: {key}' for key in results if key not in baseline]
+    lines += [f'missing from run: {key}' for key in baseline if key not in results]
+    return lines
+
+def compare(baseline: dict[str, dict], results: dict[str, dict], tolerance: float) -> list[str]:
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None: continue
+        for metric in ('time', 'peak'):
+            # tiny phases are all noise
+            floor = 1e-3 if metric == 'time' else 64 * 1024
+            if new[metric] > max(old[metric], floor) * (1 + tolerance):
+                regressions.append(f'regression: {key} {metric} {old[metric]} -> {new[metric]}')
+    return regressions
+
+# generators, all seeded so a size always gives the same input
+
+def expr_grammar(levels: int, ll: bool = False) -> str:
+    # E0 is the loosest binding level, each level i has its own operator opi
+    lines = []
+    for i in range(levels):
+        cur, nxt = f'E{i}', f'E{i + 1}' if i + 1 < levels else 'P'
+        if ll:
+            lines.append(f"{cur} -> {nxt} {cur}'")
+            lines.append(f"{cur}' -> op{i} {nxt} {cur}' | ϵ")
+        else:
+            lines.append(f'{cur} -> {cur} op{i} {nxt} | {nxt}')
+    lines.append('P -> ( E0 ) | id')
+    return '\n'.join(lines)
+
+def expr_tokens(levels: int, n: int, seed: int = 0) -> list[str]:
+    # about n tokens of a valid E0 sentence, for either form of expr_grammar
+    rng = random.Random(seed)
+    tokens = ['id']
+    while len(tokens) < n:
+        tokens.append(f'op{rng.randrange(levels)}')
+        if rng.random() < 0.2:
+            tokens += ['(', 'id', f'op{rng.randrange(levels)}', 'id', ')']
+        else:
+            tokens.append('id')
+    return tokens
+
+def stmt_grammar(kinds: int) -> str:
+    # the Mini Java example's shape: a block of statements, one keyword statement per kind
+    lines = [
+        'Prog -> { L }',
+        'L -> S L | ϵ',
+        'S -> ' + ' | '.join([*(f'S{i}' for i in range(kinds)), 'id = E ;', '{ L }']),
+        *(f'S{i} -> kw{i} ( E ) S' for i in range(kinds)),
+        "E -> T E'",
+        "E' -> + T E' | ϵ",
+        'T -> id | num | ( E )',
+    ]
+    return '\n'.join(lines)
+
+def stmt_tokens(kinds: int, n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    tokens = ['{']
+    while len(tokens) < n:
+        if rng.random() < 0.1:
+            tokens += ['{', 'id', '=', 'num', ';', '}']
+        else:
+            tokens += [f'kw{rng.randrange(kinds)}', '(', 'id', '+', 'num', ')', 'id', '=', 'id', ';']
+    tokens.append('}')
+    return tokens
+
+def word_alternation(n: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = {''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 10))) for _ in range(n)}
+    return '|'.join(sorted(words))
+
+def class_regex(n: int, seed: int = 0) -> str:
+    # n alternatives of two classes each, over CJK code points so nothing needs escaping
+    rng = random.Random(seed)
+    def cls():
+        parts = []
+        for _ in range(rng.randint(1, 3)):
+            lo = rng.randrange(0x4E00, 0x9F00)
+            parts.append(f'{chr(lo)}-{chr(lo + rng.randrange(1, 64))}')
+        return '[' + ''.join(parts) + ']'
+    return '(' + '|'.join(cls() + cls() for _ in range(n)) + ')+'
+
+def blowup_regex(k: int) -> str:
+    # an a k + 1 chars from the end: the DFA needs 2^(k + 1) states
+    return '(a|b)*a' + '(a|b)' * k
+
+# cases
+
+def pred_case(text: str, tokens: list[str]) -> Callable[[], Case]:
+    def case() -> Case:
+        g = yield 'parse_bnf', lambda: parse_bnf(text)
+        parser = yield 'first_follow', lambda: PredParser(g)
+        yield 'build_table', parser.build_table
+        yield 'parse', lambda: parser.parse(tokens)
+        # same input, streamed: the peak should not grow with it
+        yield 'parse_iter', lambda: sum(1 for _ in parser.parse_iter(iter(tokens)))
+        yield 'parse_tree', lambda: parse_tree(parser, tokens)
+    return case
+
+def lr_case(text: str, tokens: list[str], cls: type[SLRParser] | type[LALRParser] = SLRParser) -> Callable[[], Case]:
+    def case() -> Case:
+        g = yield 'parse_bnf', lambda: parse_bnf(text)
+        parser = yield 'first_follow', lambda: cls(g)
+        yield 'build_states', parser.build_states
+        yield 'build_table', parser.build_table
+        yield 'parse', lambda: parser.parse(tokens)
+        yield 'parse_tree', lambda: parse_tree(parser, tokens)
+        packed = yield 'pack', lambda: PackedTables(parser)
+        yield 'parse_packed', lambda: packed.parse(tokens)
+    return case
+
+def glr_case(text: str, tokens: list[str]) -> Callable[[], Case]:
+    def case() -> Case:
+        g = yield 'parse_bnf', lambda: parse_bnf(text)
+        parser = yield 'first_follow', lambda: GLRParser(g)
+        yield 'build_states', parser.build_states
+        yield 'build_table', parser.build_table
+        yield 'parse', lambda: parser.parse_forest(tokens)
+    return case
+
+def regex_case(pattern: str, text: str) -> Callable[[], Case]:
+    def case() -> Case:
+        def tree():
+            root = Concat(parse(pattern), End())
+            assign_ids(root)
+            return root
+        root = yield 'parse', tree
+        dfa = yield 'build_dfa', lambda: build_dfa(root)
+        dfa = yield 'minimize', lambda: minimize_dfa(dfa)
+        yield 'to_yaml', lambda: to_yaml(dfa)
+        yield 'finditer', lambda: sum(1 for _ in Pattern(pattern, dfa).finditer(text))
+    return case
+
+def lazy_case(pattern: str, text: str, max_states: int) -> Callable[[], Case]:
+    def case() -> Case:
+        def tree():
+            root = Concat(parse(pattern), End())
+            assign_ids(root)
+            return root
+        root = yield 'parse', tree
+        pos = yield 'positions', lambda: positions(root)
+        matcher = yield 'compile', lambda: Pattern(pattern, LazyDFA(pos, max_states))
+        yield 'match', lambda: matcher.match_end(text)
+    return case
+
+def cases(quick: bool) -> list[tuple[str, Callable[[], Case]]]:
+    levels, kinds, n_tokens, n_words, n_classes = (5, 10, 2_000, 50, 10) if quick else (50, 200, 100_000, 2_000, 200)
+    # a sum of n ids has Catalan(n - 1) parses, the forest holds them in O(n^3)
+    n_ambiguous = 20 if quick else 60
+
+    words = word_alternation(n_words)
+    word_text = ' '.join(words.split('|')) * 5
+    classes = class_regex(n_classes)
+    rng = random.Random(0)
+    class_text = ''.join(chr(rng.randrange(0x4E00, 0x9F40)) for _ in range(n_tokens))
+    blowup = 8 if quick else 16
+    ab_text = ''.join(rng.choice('ab') for _ in range(n_tokens))
+
+    return [
+        (f'expr-{levels}/pred', pred_case(expr_grammar(levels, ll=True), expr_tokens(levels, n_tokens))),
+        (f'expr-{levels}/slr', lr_case(expr_grammar(levels), expr_tokens(levels, n_tokens))),
+        (f'expr-{levels}/lalr', lr_case(expr_grammar(levels), expr_tokens(levels, n_tokens), LALRParser)),
+        (f'expr-{levels}/glr', glr_case(expr_grammar(levels), expr_tokens(levels, n_tokens))),
+        (f'sum-{n_ambiguous}/glr', glr_case('E -> E + E | E * E | id', ' + '.join(['id'] * n_ambiguous).split())),
+        (f'stmt-{kinds}/pred', pred_case(stmt_grammar(kinds), stmt_tokens(kinds, n_tokens))),
+        (f'stmt-{kinds}/slr', lr_case(stmt_grammar(kinds), stmt_tokens(kinds, n_tokens))),
+        (f'regex-words-{n_words}', regex_case(words, word_text)),
+        (f'regex-classes-{n_classes}', regex_case(classes, class_text)),
+        (f'regex-lazy-{blowup}', lazy_case(blowup_regex(blowup), ab_text, 4096)),
+    ]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import sys
+from array import array
+from typing import TextIO
+
+from impl.packed import PackedTables
+from impl.syntax import KINDS, PredParser, LRParser, load_bnf
+from impl.tables import kind_of
+
+# writes a built parser as a standalone python module: the tables become constant tuples and
+# the driver loop is specialized to them, so importing it needs neither impl/syntax.py nor any
+# grammar analysis, e.g. python -m impl.codegen grammar.txt slr > expr_parser.py
+#
+# the module has TERMINALS (with '$'), NON_TERMINALS, RULES (head, body) and
+# parse_iter/parse, which yield/return rule indices and raise the module's own ParseError
+# the import is only fast from a .pyc, where the tables are unmarshalled as they are: ship the module
+# compiled (python -m py_compile) where bytecode is not written on import
+# with --packed LR tables are written packed (see impl/packed.py), as bytes loaded into arrays
+
+def main():
+    # python -m impl.codegen grammar kind [out.py] [--packed]
+    args = sys.argv[1:]
+    packed = '--packed' in args
+    if packed: args.remove('--packed')
+    with open(args[0]) as file:
+        parser = KINDS[args[1]](load_bnf(file))
+    if isinstance(parser, LRParser):
+        parser.build_states()
+    parser.build_table()
+    if len(args) > 2:
+        with open(args[2], 'w') as out:
+            generate(parser, out, args[0], packed)
+    else:
+        generate(parser, sys.stdout, args[0], packed)
+
+def _rows(name: str, rows: list[list[int]]) -> str:
+    # one row per line, a tuple of tuples is a single constant in the compiled module
+    lines = [f'{name} = (']
+    lines.extend(f'    {tuple(row)!r},' for row in rows)
+    lines.append(')')
+    return '\n'.join(lines)
+
+def _le_bytes(arr: array) -> bytes:
+    # little endian whatever the machine, the generated _ints swaps back on big endian ones
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+def _header(parser: PredParser | LRParser, out: TextIO, source: str):
+    g = parser.g
+    kind = kind_of(parser)
+    # source is a path from the command line, as a literal it stays on its comment line
+    out.write(f'# generated by impl/codegen.py from {source!r} ({kind}), do not edit\n\n')
+    out.write('from itertools import chain\n\n')
+    out.write(f'TERMINALS = {tuple(parser.term_list)!r}\n')
+    out.write(f'NON_TERMINALS = {tuple(g.non_terminals)!r}\n')
+    out.write('# rule index -> head, body\n')
+    out.write('RULES = (\n')
+    for rule in g.rules:
+        out.write(f'    ({rule.name!r}, {tuple(rule.body)!r}),\n')
+    out.write(')\n\n')
+    out.write('TERM_IDS = {t: i for i, t in enumerate(TERMINALS)}\n\n')
+    out.write('class ParseError(Exception):\n    pass\n\n')
+    out.write('def parse(tokens):\n    return list(parse_iter(tokens))\n\n')
+
+def generate(parser: PredParser | LRParser, out: TextIO, source: str = '<grammar>', packed: bool = False):
+    _header(parser, out, source)
+    if isinstance(parser, PredParser):
+        _pred(parser, out)
+    elif packed:
+        _lr_packed(PackedTables(parser), out)
+    else:
+        _lr(parser, out)
+
+def _pred(parser: PredParser, out: TextIO):
+    cg = parser.cg
+    n_terms = cg.n_terms
+    out.write('# symbol ids: terminals, then \'$\', then non terminals\n')
+    out.write('SYMBOLS = TERMINALS + NON_TERMINALS\n')
+    out.write('# non terminal -> terminal id -> rule index, -1 if empty\n')
+    out.write(_rows('PRED', parser.pred_rows) + '\n')
+    out.write('# rule index -> body ids, reversed, as they are pushed\n')
+    out.write(f'PUSH = {tuple(tuple(reversed(body)) for body in cg.bodies)!r}\n\n')
+    out.write(f'''def parse_iter(tokens):
+    # yields the index of each rule as it is applied, a leftmost derivation
+    term_ids = TERM_IDS
+    pred = PRED
+    push = PUSH
+    tokens = chain(tokens, ('$',))
+    a = next(tokens)
+    t = term_ids.get(a, -1)
+    stack = [{cg.eof}, {cg.heads[0]}]
+    while stack[-1] != {cg.eof}:
+        top = stack.pop()
+        if top == t:
+            a = next(tokens, '$')
+            t = term_ids.get(a, -1)
+        elif top < {n_terms}:
+            raise ParseError(f'wanted "{{SYMBOLS[top]}}", got "{{a}}"')
+        else:
+            rule_idx = pred[top - {n_terms}][t] if t >= 0 else -1
+            if rule_idx < 0:
+                raise ParseError(f'got "{{a}}" while parsing "{{SYMBOLS[top]}}"')
+            stack.extend(push[rule_idx])
+            yield rule_idx
+    if t != {cg.eof}:
+        raise ParseError(f'got "{{a}}" after the end of "{{SYMBOLS[{cg.heads[0]}]}}"')
+''')
+
+def _lr(parser: LRParser, out: TextIO):
+    out.write('# action cells: 0 is an error, j + 1 shifts to state j, -(r + 1) reduces rule r,\n')
+    out.write('# reducing rule 0 accepts; goto cells: target state or -1, by non terminal\n')
+    out.write(_rows('ACTION', parser.action_rows) + '\n')
+    out.write(_rows('GOTO', parser.goto_rows) + '\n')
+    out.write('# rule index -> symbols popped, goto column\n')
+    out.write(f'REDUCE = {tuple(zip(parser.rule_lens, parser.rule_heads))!r}\n\n')
+    out.write('''def parse_iter(tokens):
+    # yields the index of each rule as it is reduced, a rightmost derivation in reverse
+    term_ids = TERM_IDS
+    action = ACTION
+    goto = GOTO
+    reduce = REDUCE
+    stack = [0]
+    state = 0
+    for a in chain(tokens, ('$',)):
+        t = term_ids.get(a)
+        if t is None:
+            raise ParseError(f'unknown token "{a}"')
+        row = action[state]
+        while True:
+            code = row[t]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                break
+            if code == 0:
+                raise ParseError(f'got "{a}", expected one of {expected(state)}')
+            if code == -1:
+                return
+            n, head = reduce[-code - 1]
+            if n: del stack[-n:]
+            state = goto[stack[-1]][head]
+            stack.append(state)
+            row = action[state]
+            yield -code - 1
+    raise ParseError('unexpected end of input')
+
+def expected(state):
+    return [t for t, code in zip(TERMINALS, ACTION[state]) if code]
+''')
+
+def _lr_packed(tables: PackedTables, out: TextIO):
+    out.write('from array import array\nimport sys\n\n')
+    out.write('def _ints(data):\n')
+    out.write('    arr = array(\'i\')\n')
+    out.write('    arr.frombytes(data)\n')
+    out.write('    if sys.byteorder == \'big\': arr.byteswap()\n')
+    out.write('    return arr\n\n')
+    out.write('# see impl/packed.py: action(state, t) is ACTION[ACTION_BASE[state] + t] if ACTION_CHECK there is t,\n')
+    out.write('# else DEFAULT[state]; goto(state, nt) is GOTO[GOTO_BASE[nt] + state] if GOTO_CHECK there is state,\n')
+    out.write('# else GOTO_DEFAULT[nt]; action codes as in the unpacked module\n')
+    for name in ('default', 'action_base', 'action', 'action_check', 'goto_default', 'goto_base', 'goto', 'goto_check', 'rule_heads', 'rule_lens'):
+        out.write(f'{name.upper()} = _ints({_le_bytes(getattr(tables, name))!r})\n')
+    out.write('''
+def parse_iter(tokens):
+    # yields the index of each rule as it is reduced, a rightmost derivation in reverse
+    term_ids = TERM_IDS
+    default = DEFAULT
+    action_base = ACTION_BASE
+    action = ACTION
+    action_check = ACTION_CHECK
+    goto_default = GOTO_DEFAULT
+    goto_base = GOTO_BASE
+    goto = GOTO
+    goto_check = GOTO_CHECK
+    rule_heads = RULE_HEADS
+    rule_lens = RULE_LENS
+    stack = [0]
+    state = 0
+    for a in chain(tokens, ('$',)):
+        t = term_ids.get(a)
+        if t is None:
+            raise ParseError(f'unknown token "{a}"')
+        while True:
+            i = action_base[state] + t
+            code = action[i] if action_check[i] == t else default[state]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                break
+            if code == 0:
+                raise ParseError(f'got "{a}", expected one of {expected(state)}')
+            if code == -1:
+                return
+            rule_idx = -code - 1
+            n = rule_lens[rule_idx]
+            if n: del stack[-n:]
+            k = rule_heads[rule_idx]
+            below = stack[-1]
+            i = goto_base[k] + below
+            state = goto[i] if goto_check[i] == below else goto_default[k]
+            stack.append(state)
+            yield rule_idx
+    raise ParseError('unexpected end of input')
+
+def action_at(state, t):
+    i = ACTION_BASE[state] + t
+    return ACTION[i] if ACTION_CHECK[i] == t else DEFAULT[state]
+
+def expected(state):
+    return [t for i, t in enumerate(TERMINALS) if action_at(state, i)]
+''')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import html
+import json
+import re
+import struct
+import sys
+from array import array
+from typing import BinaryIO, TextIO
+
+from impl.regex import DFA, fmt_class
+from impl.syntax import KINDS, PredParser, LRParser
+
+# DFAs and LL/LR tables written as YAML, JSON, Graphviz DOT or a compact binary form, a row
+# at a time to a file-like object, so nothing holds the whole document
+# numbering is always the object's own: DFA states in order of discovery from q0 (see
+# build_dfa), LR states in order of construction, LL rows in g.non_terminals order
+
+FORMATS = ('yaml', 'json', 'dot', 'bin')
+DFA_MAGIC = b'DFA\x01'
+
+def main():
+    ap = argparse.ArgumentParser(prog='python -m impl.emit', description='write a DFA or a parse table')
+    ap.add_argument('format', choices=FORMATS)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--regex', help='pattern, written as its minimal DFA')
+    src.add_argument('--grammar', help='grammar file, written as the table of --kind')
+    ap.add_argument('--kind', choices=list(KINDS), default='slr')
+    ap.add_argument('-o', '--output', help='file to write, stdout by default')
+    args = ap.parse_args()
+
+    if args.regex is not None:
+        from impl.regex import Concat, End, assign_ids, build_dfa, minimize_dfa, parse
+        root = Concat(parse(args.regex), End())
+        assign_ids(root)
+        obj = minimize_dfa(build_dfa(root))
+    else:
+        from impl.syntax import load_bnf
+        with open(args.grammar) as file:
+            obj = KINDS[args.kind](load_bnf(file))
+        if isinstance(obj, LRParser):
+            obj.build_states()
+        obj.build_table()
+
+    binary = args.format == 'bin'
+    if args.output:
+        with open(args.output, 'wb' if binary else 'w') as out:
+            write(obj, out, args.format)
+    else:
+        write(obj, sys.stdout.buffer if binary else sys.stdout, args.format)
+
+def write(obj: DFA | PredParser | LRParser, out: TextIO | BinaryIO, fmt: str):
+    # bin wants a binary file, the others a text one
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown format "{fmt}", expected one of {FORMATS}')
+    if isinstance(obj, DFA):
+        write_dfa(obj, out, fmt)
+    elif fmt == 'bin':
+        # the table file of impl/tables.py, load_tables reads it back
+        from impl.tables import dump_tables
+        dump_tables(obj, out)
+    elif isinstance(obj, PredParser):
+        PRED_WRITERS[fmt](obj, out)
+    else:
+        LR_WRITERS[fmt](obj, out)
+
+# scalars
+
+PLAIN = re.compile(r"[A-Za-z_][\w'.-]*")
+
+def yaml_str(s: str) -> str:
+    # plain when that reads back as the same string, else double quoted (JSON's quoting is YAML's)
+    if PLAIN.fullmatch(s) and s.lower() not in ('true', 'false', 'null', 'yes', 'no', 'on', 'off'):
+        return s
+    return json.dumps(s, ensure_ascii=False)
+
+def dot_str(s: str) -> str:
+    # quoted, control chars shown as \\xNN
+    s = s.replace('\\', '\\\\').replace('"', '\\"')
+    return '"' + ''.join(c if c.isprintable() else f'\\\\x{ord(c):02x}' for c in s) + '"'
+
+def fmt_action(code: int) -> str:
+    # see LRParser.action_rows
+    if code == -1: return 'acc'
+    if code > 0: return f's{code - 1}'
+    return f'r{-code - 1}'
+
+class Items:
+    # writes the items of a JSON array or a YAML flow sequence, with the commas in between
+    def __init__(self, out: TextIO, sep: str = ', '):
+        self.out = out
+        self.sep = sep
+        self.first = True
+
+    def add(self, text: str):
+        if not self.first: self.out.write(self.sep)
+        self.out.write(text)
+        self.first = False
+
+# DFA
+
+def write_dfa(dfa: DFA, out: TextIO | BinaryIO, fmt: str):
+    DFA_WRITERS[fmt](dfa, out)
+
+def dfa_yaml(dfa: DFA, out: TextIO):
+    # -1 is the dead state, X, the last name
+    names = [f'q{s}' for s in range(len(dfa.trans))]
+    names.append('X')
+    quoted = [yaml_str(fmt_class(x)) for x in dfa.alphabet]
+    labels = [f'  {label}: ' for label in quoted]
+    out.write('states: [')
+    items = Items(out)
+    for name in names:
+        items.add(f'"{name}"')
+    out.write(']\n')
+    out.write('input_alphabet: [' + ', '.join(quoted) + ']\n')
+    out.write(f'start_state: "{names[dfa.start]}"\n')
+    out.write('accept_states: [' + ', '.join(f'"{names[s]}"' for s in sorted(dfa.accept)) + ']\n')
+    out.write('delta:\n')
+    for s, row in enumerate(dfa.trans):
+        out.write(f' {names[s]}:\n' + ''.join([label + names[t] + '\n' for label, t in zip(labels, row)]))
+    out.write(' X:\n' + ''.join([label + 'X\n' for label in labels]))
+
+def dfa_json(dfa: DFA, out: TextIO):
+    # alphabet: [first, last] code points, delta: a row of target states per state, -1 is dead
+    out.write('{\n"alphabet": ' + json.dumps([list(x) for x in dfa.alphabet]))
+    out.write(f',\n"start": {dfa.start}')
+    out.write(',\n"accept": ' + json.dumps({str(s): tag for s, tag in sorted(dfa.accept.items())}))
+    out.write(',\n"delta": [')
+    items = Items(out, ',\n  ')
+    out.write('\n  ')
+    for row in dfa.trans:
+        items.add(json.dumps(row))
+    out.write('\n]\n}\n')
+
+def dfa_dot(dfa: DFA, out: TextIO):
+    # the dead state is left out, edges between the same two states are merged
+    out.write('digraph dfa {\n  rankdir=LR;\n  node [shape=circle];\n  start [shape=point];\n')
+    out.write(f'  start -> q{dfa.start};\n')
+    for s, tag in sorted(dfa.accept.items()):
+        label = f'q{s}' if tag == 0 else f'q{s}\\n#{tag}'
+        out.write(f'  q{s} [shape=doublecircle, label="{label}"];\n')
+    for s, row in enumerate(dfa.trans):
+        edges: dict[int, list[str]] = {}
+        for x, t in enumerate(row):
+            if t >= 0: edges.setdefault(t, []).append(fmt_class(dfa.alphabet[x]))
+        for t, labels in edges.items():
+            out.write(f'  q{s} -> q{t} [label={dot_str(",".join(labels))}];\n')
+    out.write('}\n')
+
+def _le(values, typecode: str = 'i') -> bytes:
+    arr = array(typecode, values)
+    if sys.byteorder == 'big': arr.byteswap()
+    return arr.tobytes()
+
+def dfa_bin(dfa: DFA, out: BinaryIO):
+    # magic, then u32s: classes + (first, last) each, states, start, accepting + (state, tag)
+    # each, then the rows as i32 (-1 is dead); all little endian, load_dfa reads it back
+    out.write(DFA_MAGIC)
+    out.write(struct.pack('<I', len(dfa.alphabet)))
+    out.write(_le((v for x in dfa.alphabet for v in x), 'I'))
+    out.write(struct.pack('<II', len(dfa.trans), dfa.start))
+    out.write(struct.pack('<I', len(dfa.accept)))
+    out.write(_le((v for item in sorted(dfa.accept.items()) for v in item), 'I'))
+    for row in dfa.trans:
+        out.write(_le(row))
+
+def _read(file: BinaryIO, n: int, typecode: str = 'i') -> array:
+    arr = array(typecode)
+    arr.frombytes(file.read(arr.itemsize * n))
+    if len(arr) != n:
+        raise ValueError('truncated DFA file')
+    if sys.byteorder == 'big': arr.byteswap()
+    return arr
+
+def load_dfa(file: BinaryIO) -> DFA:
+    if file.read(4) != DFA_MAGIC:
+        raise ValueError('not a DFA file')
+    n_classes, = struct.unpack('<I', file.read(4))
+    bounds = _read(file, 2 * n_classes, 'I')
+    alphabet = [(bounds[2 * k], bounds[2 * k + 1]) for k in range(n_classes)]
+    n_states, start = struct.unpack('<II', file.read(8))
+    n_accept, = struct.unpack('<I', file.read(4))
+    pairs = _read(file, 2 * n_accept, 'I')
+    accept = {pairs[2 * k]: pairs[2 * k + 1] for k in range(n_accept)}
+    trans = [_read(file, n_classes).tolist() for _ in range(n_states)]
+    return DFA(alphabet, trans, start, accept)
+
+DFA_WRITERS = {'yaml': dfa_yaml, 'json': dfa_json, 'dot': dfa_dot, 'bin': dfa_bin}
+
+# LL(1) table
+
+def pred_yaml(parser: PredParser, out: TextIO):
+    g = parser.g
+    out.write('terminals: [' + ', '.join(map(yaml_str, parser.term_list)) + ']\n')
+    out.write('non_terminals: [' + ', '.join(map(yaml_str, g.non_terminals)) + ']\n')
+    out.write('rules:\n')
+    out.writelines(f'  - {json.dumps(str(rule), ensure_ascii=False)}\n' for rule in g.rules)
+    out.write('table:\n')
+    for nt, row in zip(g.non_terminals, parser.pred_rows):
+        cells = [f'{yaml_str(t)}: {r}' for t, r in zip(parser.term_list, row) if r >= 0]
+        out.write(f'  {yaml_str(nt)}: {{' + ', '.join(cells) + '}\n')
+
+def pred_json(parser: PredParser, out: TextIO):
+    # table: per non terminal, terminal -> rule index
+    g = parser.g
+    out.write('{\n"terminals": ' + json.dumps(parser.term_list, ensure_ascii=False))
+    out.write(',\n"non_terminals": ' + json.dumps(g.non_terminals, ensure_ascii=False))
+    out.write(',\n"rules": [')
+    items = Items(out, ',\n  ')
+    out.write('\n  ')
+    for rule in g.rules:
+        items.add(json.dumps({'head': rule.name, 'body': rule.body}, ensure_ascii=False))
+    out.write('\n],\n"table": {')
+    items = Items(out, ',\n  ')
+    out.write('\n  ')
+    for nt, row in zip(g.non_terminals, parser.pred_rows):
+        cells = {t: r for t, r in zip(parser.term_list, row) if r >= 0}
+        items.add(f'{json.dumps(nt, ensure_ascii=False)}: {json.dumps(cells, ensure_ascii=False)}')
+    out.write('\n}\n}\n')
+
+def pred_dot(parser: PredParser, out: TextIO):
+    # the table as one HTML-like label, a row per non terminal
+    g = parser.g
+    esc = lambda s: html.escape(s, quote=True)
+    out.write('digraph table {\n  node [shape=plaintext];\n  table [label=<\n')
+    out.write('<table border="0" cellborder="1" cellspacing="0">\n<tr><td></td>')
+    out.writelines(f'<td><b>{esc(t)}</b></td>' for t in parser.term_list)
+    out.write('</tr>\n')
+    for nt, row in zip(g.non_terminals, parser.pred_rows):
+        out.write(f'<tr><td><b>{esc(nt)}</b></td>')
+        out.writelines(f'<td>{esc(str(g.rules[r])) if r >= 0 else ""}</td>' for r in row)
+        out.write('</tr>\n')
+    out.write('</table>>];\n}\n')
+
+PRED_WRITERS = {'yaml': pred_yaml, 'json': pred_json, 'dot': pred_dot}
+
+# LR tables
+
+def lr_yaml(parser: LRParser, out: TextIO):
+    # action cells as s<state>, r<rule>, acc; error cells and missing gotos are left out
+    g = parser.g
+    out.write('terminals: [' + ', '.join(map(yaml_str, parser.term_list)) + ']\n')
+    out.write('non_terminals: [' + ', '.join(map(yaml_str, g.non_terminals)) + ']\n')
+    out.write('rules:\n')
+    out.writelines(f'  - {json.dumps(str(rule), ensure_ascii=False)}\n' for rule in g.rules)
+    out.write('states:\n')
+    for i, (actions, gotos) in enumerate(zip(parser.action_rows, parser.goto_rows)):
+        cells = [f'{yaml_str(t)}: {fmt_action(code)}' for t, code in zip(parser.term_list, actions) if code]
+        out.write(f'  {i}:\n    action: {{' + ', '.join(cells) + '}\n')
+        cells = [f'{yaml_str(nt)}: {j}' for nt, j in zip(g.non_terminals, gotos) if j >= 0]
+        out.write('    goto: {' + ', '.join(cells) + '}\n')
+
+def lr_json(parser: LRParser, out: TextIO):
+    # states: per state its action (terminal -> s<state>, r<rule>, acc) and goto cells
+    g = parser.g
+    out.write('{\n"terminals": ' + json.dumps(parser.term_list, ensure_ascii=False))
+    out.write(',\n"non_terminals": ' + json.dumps(g.non_terminals, ensure_ascii=False))
+    out.write(',\n"rules": [')
+    items = Items(out, ',\n  ')
+    out.write('\n  ')
+    for rule in g.rules:
+        items.add(json.dumps({'head': rule.name, 'body': rule.body}, ensure_ascii=False))
+    out.write('\n],\n"states": [')
+    items = Items(out, ',\n  ')
+    out.write('\n  ')
+    for actions, gotos in zip(parser.action_rows, parser.goto_rows):
+        state = {
+            'action': {t: fmt_action(code) for t, code in zip(parser.term_list, actions) if code},
+            'goto': {nt: j for nt, j in zip(g.non_terminals, gotos) if j >= 0},
+        }
+        items.add(json.dumps(state, ensure_ascii=False))
+    out.write('\n]\n}\n')
+
+def lr_dot(parser: LRParser, out: TextIO):
+    # the automaton: shifts and gotos are edges, reductions are listed in their state
+    g = parser.g
+    out.write('digraph lr {\n  rankdir=LR;\n  node [shape=box];\n')
+    for i, (actions, gotos) in enumerate(zip(parser.action_rows, parser.goto_rows)):
+        reduces: dict[int, list[str]] = {}
+        edges: dict[int, list[str]] = {}
+        for t, code in zip(parser.term_list, actions):
+            if code > 0:
+                edges.setdefault(code - 1, []).append(t)
+            elif code < 0:
+                reduces.setdefault(code, []).append(t)
+        for nt, j in zip(g.non_terminals, gotos):
+            if j >= 0: edges.setdefault(j, []).append(nt)
+        lines = [str(i)]
+        for code, ts in reduces.items():
+            action = 'acc' if code == -1 else str(g.rules[-code - 1])
+            lines.append(f'{action} on {" ".join(ts)}')
+        label = '\\n'.join(dot_str(line)[1:-1] for line in lines)
+        out.write(f'  s{i} [label="{label}"];\n')
+        for j, labels in edges.items():
+            out.write(f'  s{i} -> s{j} [label={dot_str(" ".join(labels))}];\n')
+    out.write('}\n')
+
+LR_WRITERS = {'yaml': lr_yaml, 'json': lr_json, 'dot': lr_dot}
+
+if __name__ == '__main__':
+    main()
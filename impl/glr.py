@@ -0,0 +1,309 @@
+import gc
+import sys
+from itertools import chain
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from impl.syntax import Grammar, GrammarError, ParserError, Rule, SLRParser
+
+if TYPE_CHECKING:
+    from impl.tree import TreeBuilder
+
+# GLR on SLR tables: conflicting cells keep every action and parse_forest() follows all of them at
+# once on a graph-structured stack (GSS), sharing the trees in a packed forest (SPPF), see Rekers 1992
+# while there is a single stack top and its cell has one action it runs as plain LR
+
+def main():
+    # python -m impl.glr grammar "tokens ...": prints the forest and how many trees it holds
+    from impl.syntax import load_bnf
+    with open(sys.argv[1]) as file:
+        parser = GLRParser(load_bnf(file))
+    parser.build_states()
+    parser.build_table()
+    print(f'{len(parser.conflicts)} conflicting cells')
+    root = parser.parse_forest(sys.argv[2].split())
+    print(root.to_str(parser.g))
+    print(f'{count_trees(root)} trees')
+
+class ForestNode:
+    # sym (symbol id) derives tokens [start, end) in every way listed in families:
+    # (rule index, child nodes), none for tokens, more than one where the input is ambiguous
+    # nearly every node has one family, it is kept in rule/kids and only the others go in a list,
+    # and a lone child (a unit rule, most of an expression grammar's nodes) is kept without its tuple:
+    # a list and two tuples per node were two thirds of the memory of a forest
+    __slots__ = ('sym', 'start', 'end', 'rule', 'kids', 'more')
+    sym: int
+    start: int
+    end: int
+    # the first family, rule is -1 until there is one
+    rule: int
+    kids: 'tuple[ForestNode, ...] | ForestNode'
+    more: list[tuple[int, tuple['ForestNode', ...]]] | None
+
+    def __init__(self, sym: int, start: int, end: int):
+        self.sym = sym
+        self.start = start
+        self.end = end
+        self.rule = -1
+        self.kids = ()
+        self.more = None
+
+    @property
+    def families(self) -> list[tuple[int, tuple['ForestNode', ...]]]:
+        if self.rule < 0: return []
+        kids = self.kids
+        first = (self.rule, kids if type(kids) is tuple else (kids,))
+        return [first] if self.more is None else [first, *self.more]
+
+    def add(self, rule_idx: int, kids: tuple['ForestNode', ...]):
+        if self.rule < 0:
+            self.rule = rule_idx
+            self.kids = kids[0] if len(kids) == 1 else kids
+        elif self.more is None:
+            self.more = [(rule_idx, kids)]
+        else:
+            self.more.append((rule_idx, kids))
+
+    def to_str(self, g: Grammar) -> str:
+        # each node once, in the order first reached; later uses are named #k
+        cg = g.compiled()
+        names: dict[ForestNode, str] = {}
+        lines = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node in names or not node.families: continue
+            names[node] = f'#{len(names)}'
+            for rule_idx, kids in node.families:
+                alt = ' '.join(kid_name(cg, kid) for kid in kids) or 'ϵ'
+                lines.append(f'{names[node]} {cg.symbols[node.sym]}[{node.start}:{node.end}] -> {alt}  ({rule_idx})')
+            stack.extend(kid for _, kids in reversed(node.families) for kid in reversed(kids))
+        return '\n'.join(lines)
+
+def kid_name(cg, node: ForestNode) -> str:
+    return f'{cg.symbols[node.sym]}[{node.start}:{node.end}]'
+
+class StackNode:
+    # a GSS node: a parser state reached after tokens [0, pos), linked to the nodes below it
+    # with the forest node of the symbol in between
+    __slots__ = ('state', 'pos', 'links', 'depth')
+    state: int
+    pos: int
+    links: list[tuple['StackNode', ForestNode]]
+    # how many links down the stack is a single path, so reductions that short skip the search;
+    # only links to nodes in the frontier can still be added, so depth counts past those only when
+    # they have left it
+    depth: int
+
+    def __init__(self, state: int, pos: int, below: 'StackNode | None', forest: ForestNode | None, depth: int = 0):
+        self.state = state
+        self.pos = pos
+        self.links = [] if below is None else [(below, forest)]
+        self.depth = depth
+
+def count_trees(root: ForestNode) -> int | float:
+    # parse trees packed in the forest, inf if a cycle (A -> A) makes them infinite
+    counts: dict[ForestNode, int | float] = {}
+    stack = [(root, False)]
+    while stack:
+        node, done = stack.pop()
+        if node in counts and counts[node] is not None: continue
+        if not node.families:
+            counts[node] = 1
+        elif done:
+            total = 0
+            for _, kids in node.families:
+                n = 1
+                for kid in kids:
+                    c = counts[kid]
+                    n *= float('inf') if c is None else c
+                total += n
+            counts[node] = total
+        elif node in counts:
+            # reached again while its own children are pending
+            counts[node] = float('inf')
+        else:
+            counts[node] = None
+            stack.append((node, True))
+            stack.extend((kid, False) for _, kids in node.families for kid in kids if kid not in counts)
+    return counts[root]
+
+def ambiguities(root: ForestNode) -> Iterator[ForestNode]:
+    # nodes with more than one derivation, each once
+    seen = {root}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if len(node.families) > 1:
+            yield node
+        for _, kids in node.families:
+            for kid in kids:
+                if kid not in seen:
+                    seen.add(kid)
+                    stack.append(kid)
+
+class GLRParser(SLRParser):
+    # (state, terminal id) -> every action of a conflicting cell, action_rows keeps the first one
+    conflicts: dict[tuple[int, int], list[int]]
+    # the actions of every cell as a tuple, shared between equal cells
+    glr_rows: list[list[tuple[int, ...]]]
+
+    def build_table(self):
+        self.conflicts = {}
+        super().build_table()
+        cells: dict[int, tuple[int, ...]] = {}
+        self.glr_rows = [[cells.setdefault(code, (code,) if code else ()) for code in row] for row in self.action_rows]
+        for (state, t), codes in self.conflicts.items():
+            self.glr_rows[state][t] = tuple(codes)
+
+    def conflict(self, state: int, t: int, code: int, reduce_code: int):
+        self.conflicts.setdefault((state, t), [code]).append(reduce_code)
+
+    def parse_iter(self, tokens: Iterable[str], builder: 'TreeBuilder | None' = None) -> Iterator[Rule]:
+        # plain LR on action_rows would follow only the first action of a conflicting cell
+        if self.conflicts:
+            raise GrammarError(f'Grammar is ambiguous ({len(self.conflicts)} conflicting cells), use parse_forest')
+        return super().parse_iter(tokens, builder)
+
+    def parse_forest(self, tokens: Iterable[str]) -> ForestNode:
+        # the forest node of the start symbol over the whole input
+        # it is all small objects that live until the end, collection passes over them would only
+        # get longer as the input does (2.5x the parse time on a 50k token input)
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self.build_forest(tokens)
+        finally:
+            if enabled: gc.enable()
+
+    def build_forest(self, tokens: Iterable[str]) -> ForestNode:
+        cg = self.cg
+        eof = cg.eof
+        n_terms = cg.n_terms
+        rows = self.glr_rows
+        goto_rows = self.goto_rows
+        rule_heads = self.rule_heads
+        rule_lens = self.rule_lens
+        term_ids = self.term_ids
+
+        frontier = {0: StackNode(0, 0, None, None)}
+        for pos, a in enumerate(chain(tokens, ('$',))):
+            t = term_ids.get(a)
+            if t is None:
+                raise ParserError(f'unknown token \"{a}\"')
+            # symbol (nt index), start -> forest node ending here
+            forest: dict[tuple[int, int], ForestNode] = {}
+            # families already in a forest node, the same one can be found twice (e.g. by ϵ-rules)
+            packed: set[tuple[ForestNode, int, tuple[ForestNode, ...]]] = set()
+
+            if len(frontier) == 1:
+                # plain LR: reduce while the only top has a single reduction and a single path for it
+                (node,) = frontier.values()
+                while True:
+                    cell = rows[node.state][t]
+                    if len(cell) != 1 or cell[0] >= -1: break
+                    rule_idx = -cell[0] - 1
+                    n = rule_lens[rule_idx]
+                    if node.depth < n: break
+                    kids = [None] * n
+                    below = node
+                    for k in range(n - 1, -1, -1):
+                        below, kids[k] = below.links[0]
+                    head = rule_heads[rule_idx]
+                    fnode = forest.get((head, below.pos))
+                    if fnode is None:
+                        fnode = forest[(head, below.pos)] = ForestNode(head + n_terms, below.pos, pos)
+                    kids = tuple(kids)
+                    key = (fnode, rule_idx, kids)
+                    if key not in packed:
+                        packed.add(key)
+                        fnode.add(rule_idx, kids)
+                    j = goto_rows[below.state][head]
+                    # below is out of the frontier now, so no link can be added to it
+                    node = StackNode(j, pos, below, fnode, below.depth + 1)
+                frontier = {node.state: node}
+
+            self.reduce_all(frontier, t, pos, forest, packed)
+
+            if t == eof:
+                for node in frontier.values():
+                    if -1 in rows[node.state][t]:
+                        return node.links[0][1]
+                raise ParserError(f'got \"$\", expected one of {self.expected_any(frontier)}')
+
+            leaf = ForestNode(t, pos, pos + 1)
+            shifted: dict[int, StackNode] = {}
+            for node in frontier.values():
+                for code in rows[node.state][t]:
+                    if code <= 0: continue
+                    target = shifted.get(code - 1)
+                    if target is None:
+                        shifted[code - 1] = StackNode(code - 1, pos + 1, node, leaf, node.depth + 1)
+                    else:
+                        target.links.append((node, leaf))
+                        target.depth = 0
+            if not shifted:
+                raise ParserError(f'got \"{a}\", expected one of {self.expected_any(frontier)}')
+            frontier = shifted
+        raise ParserError('unexpected end of input')
+
+    def reduce_all(self, frontier: dict[int, StackNode], t: int, pos: int, forest: dict[tuple[int, int], ForestNode],
+                   packed: set[tuple[ForestNode, int, tuple[ForestNode, ...]]]):
+        # every reduction on t from the stack tops, which can add tops (and links to them) in turn;
+        # a link added to an existing top redoes the reductions that can go through it
+        n_terms = self.cg.n_terms
+        rows = self.glr_rows
+        goto_rows = self.goto_rows
+        rule_heads = self.rule_heads
+        rule_lens = self.rule_lens
+        # links already in a top, the same one can be found twice
+        linked = {(top, below) for top in frontier.values() for below, _ in top.links}
+
+        todo = [(node, code, None) for node in frontier.values() for code in rows[node.state][t] if code < -1]
+        while todo:
+            node, code, link = todo.pop()
+            rule_idx = -code - 1
+            head = rule_heads[rule_idx]
+            for below, kids in paths(node, rule_lens[rule_idx], link):
+                fnode = forest.get((head, below.pos))
+                if fnode is None:
+                    fnode = forest[(head, below.pos)] = ForestNode(head + n_terms, below.pos, pos)
+                if (fnode, rule_idx, kids) not in packed:
+                    packed.add((fnode, rule_idx, kids))
+                    fnode.add(rule_idx, kids)
+
+                j = goto_rows[below.state][head]
+                target = frontier.get(j)
+                if target is None:
+                    target = frontier[j] = StackNode(j, pos, below, fnode, below.depth + 1 if below.pos < pos else 0)
+                    linked.add((target, below))
+                    todo.extend((target, c, None) for c in rows[j][t] if c < -1)
+                elif (target, below) not in linked:
+                    linked.add((target, below))
+                    new_link = (below, fnode)
+                    target.links.append(new_link)
+                    target.depth = 0
+                    for top in frontier.values():
+                        todo.extend((top, c, new_link) for c in rows[top.state][t] if c < -1 and rule_lens[-c - 1])
+
+    def expected_any(self, frontier: dict[int, StackNode]) -> list[str]:
+        return [t for t, i in self.term_ids.items() if any(self.glr_rows[node.state][i] for node in frontier.values())]
+
+def paths(node: StackNode, n: int, link: tuple[StackNode, ForestNode] | None) -> Iterator[tuple[StackNode, tuple[ForestNode, ...]]]:
+    # every way down n links from node: the node reached and the forest nodes passed, in body order
+    # with a link only the paths through it; it starts at a node of this level, so a path that
+    # left the level without taking it is dropped right away
+    level = node.pos
+    stack = [(node, n, (), link is None)]
+    while stack:
+        v, k, kids, through = stack.pop()
+        if k == 0:
+            yield v, kids
+            continue
+        for l in v.links:
+            if through or l is link:
+                stack.append((l[0], k - 1, (l[1],) + kids, True))
+            elif l[0].pos == level:
+                stack.append((l[0], k - 1, (l[1],) + kids, False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import sys
+from typing import Iterator
+
+from impl.regex import DFA, ColumnMap, Concat, End, assign_ids, build_dfa, minimize_dfa, parse, union_all
+
+def main():
+    # spec: one "name regex" per line, names starting with _ are skipped (e.g. "_ws [ \t\n]+")
+    spec_path = sys.argv[1]
+    with open(spec_path) as file:
+        lexer = Lexer.from_spec(file.read())
+
+    text = input("Input: ") if len(sys.argv) == 2 else sys.argv[2]
+    for kind, lexeme, offset in lexer.tokenize(text):
+        print(f'{offset}: {kind} {lexeme!r}')
+
+class LexerError(Exception):
+    pass
+
+class Lexer:
+    # maximal munch scanner, on ties the rule that comes first wins
+    rules: list[tuple[str, str]]
+    skip: set[str]
+    dfa: DFA
+
+    def __init__(self, rules: list[tuple[str, str]], skip: set[str] | None = None):
+        self.rules = rules
+        self.skip = set() if skip is None else skip
+
+        # (p1)#1 | (p2)#2 | ... as a single DFA
+        if not rules:
+            raise LexerError('no token rules')
+        root = union_all([Concat(parse(pattern), End(tag)) for tag, (_, pattern) in enumerate(rules)])
+        assign_ids(root)
+        self.dfa = minimize_dfa(build_dfa(root))
+        self.cols = ColumnMap(self.dfa.alphabet)
+        self.accepting = [self.dfa.accept.get(s, -1) for s in range(len(self.dfa.trans))]
+
+    @classmethod
+    def from_spec(cls, text: str) -> 'Lexer':
+        rules = []
+        for n, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line[0] == '#': continue
+            parts = line.split(None, 1)
+            if len(parts) < 2:
+                raise LexerError(f'line {n}: no pattern for "{parts[0]}"')
+            rules.append((parts[0], parts[1]))
+        return cls(rules, {name for name, _ in rules if name.startswith('_')})
+
+    def tokenize(self, text: str) -> Iterator[tuple[str, str, int]]:
+        # lazily yields (kind, lexeme, offset)
+        cols = self.cols
+        trans = self.dfa.trans
+        accepting = self.accepting
+        start = self.dfa.start
+        n = len(text)
+        pos = 0
+        while pos < n:
+            state = start
+            last_end = -1
+            last_tag = -1
+            i = pos
+            while i < n:
+                col = cols[text[i]]
+                if col < 0: break
+                state = trans[state][col]
+                if state < 0: break
+                i += 1
+                if accepting[state] >= 0:
+                    last_end = i
+                    last_tag = accepting[state]
+            if last_end < 0:
+                raise LexerError(f'unexpected character {text[pos]!r} at offset {pos}')
+            kind = self.rules[last_tag][0]
+            if kind not in self.skip:
+                yield kind, text[pos:last_end], pos
+            pos = last_end
+
+    def kinds(self, text: str) -> Iterator[str]:
+        # token kinds only, the input PredParser.parse and LRParser.parse expect
+        for kind, _, _ in self.tokenize(text):
+            yield kind
+
+if __name__ == '__main__':
+    main()
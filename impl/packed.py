@@ -0,0 +1,196 @@
+import sys
+from array import array
+from collections import Counter
+from itertools import chain
+from typing import Iterable, Iterator
+
+from impl.syntax import LRParser, ParserError
+
+# LR tables packed the way yacc/bison do it: each state's most common reduction becomes its
+# default and is dropped from the row, the remaining cells of all rows are combed into one flat
+# array (a row's cell for column c lives at base[row] + c, check tells whose it is), gotos the
+# same way by non terminal with the most common target as the default
+# a default reduction also fills the row's error cells, so an error may be found a few
+# reductions later than with the full rows, but never after shifting the wrong token
+
+def main():
+    # python -m impl.packed grammar [kind]: sizes of the table forms
+    from impl.syntax import KINDS, load_bnf
+    kind = sys.argv[2] if len(sys.argv) > 2 else 'slr'
+    lr_kinds = [k for k, cls in KINDS.items() if issubclass(cls, LRParser)]
+    if kind not in lr_kinds:
+        sys.exit(f'usage: python -m impl.packed grammar [{"|".join(lr_kinds)}], only LR tables are packed')
+    with open(sys.argv[1]) as file:
+        parser = KINDS[kind](load_bnf(file))
+    parser.build_states()
+    parser.build_table()
+    packed = PackedTables(parser)
+    n_dict = dict_bytes(parser)
+    print(f'{len(parser.action_rows)} states')
+    print(f'dict   {n_dict:>10} bytes')
+    print(f'rows   {rows_bytes(parser):>10} bytes')
+    print(f'packed {packed.nbytes():>10} bytes, {packed.nbytes() / n_dict:.1%} of dict')
+
+def pack(rows: list[dict[int, int]], n_cols: int) -> tuple[array, array, array]:
+    # first fit, fullest rows first: returns base (per row), values and check (the column of
+    # the value in each slot, -1 if free); equal rows share a base, other rows never do,
+    # so check[base[r] + c] == c only for cells of row r
+    # lookups go to any column below n_cols, also those of default cells
+    base = array('i', [0] * len(rows))
+    values = array('i')
+    check = array('i')
+    used = 0
+    bases: set[int] = set()
+    shared: dict[tuple[tuple[int, int], ...], int] = {}
+    for r in sorted(range(len(rows)), key=lambda r: -len(rows[r])):
+        row = rows[r]
+        key = tuple(sorted(row.items()))
+        if key in shared:
+            base[r] = shared[key]
+            continue
+        mask = 0
+        for c in row:
+            mask |= 1 << c
+        b = 0
+        while (used >> b) & mask or b in bases:
+            b += 1
+        used |= mask << b
+        bases.add(b)
+        shared[key] = base[r] = b
+        for c, v in row.items():
+            i = b + c
+            if i >= len(values):
+                values.extend([0] * (i + 1 - len(values)))
+                check.extend([-1] * (i + 1 - len(check)))
+            values[i] = v
+            check[i] = c
+    # every base + column in range, so lookups need no bounds test
+    n = max(bases, default=0) + n_cols
+    if n > len(values):
+        values.extend([0] * (n - len(values)))
+        check.extend([-1] * (n - len(check)))
+    return base, values, check
+
+class PackedTables:
+    # action(state, t): i = action_base[state] + t, action[i] if action_check[i] == t
+    # else default[state]; codes as in LRParser.action_rows
+    default: array
+    action_base: array
+    action: array
+    action_check: array
+    # goto(state, nt): i = goto_base[nt] + state, goto[i] if goto_check[i] == state
+    # else goto_default[nt]
+    goto_default: array
+    goto_base: array
+    goto: array
+    goto_check: array
+    rule_heads: array
+    rule_lens: array
+    terminals: list[str]
+    term_ids: dict[str, int]
+
+    def __init__(self, parser: LRParser):
+        self.terminals = parser.term_list
+        self.term_ids = parser.term_ids
+        self.rule_heads = array('i', parser.rule_heads)
+        self.rule_lens = array('i', parser.rule_lens)
+
+        self.default = array('i')
+        action_rows = []
+        for row in parser.action_rows:
+            reduces = Counter(code for code in row if code < -1)
+            default = reduces.most_common(1)[0][0] if reduces else 0
+            self.default.append(default)
+            action_rows.append({t: code for t, code in enumerate(row) if code and code != default})
+        self.action_base, self.action, self.action_check = pack(action_rows, len(self.terminals))
+
+        self.goto_default = array('i')
+        goto_rows = []
+        n_nts = len(parser.goto_rows[0]) if parser.goto_rows else 0
+        for k in range(n_nts):
+            column = {i: row[k] for i, row in enumerate(parser.goto_rows) if row[k] >= 0}
+            targets = Counter(column.values())
+            default = targets.most_common(1)[0][0] if targets else -1
+            self.goto_default.append(default)
+            goto_rows.append({i: j for i, j in column.items() if j != default})
+        self.goto_base, self.goto, self.goto_check = pack(goto_rows, len(parser.goto_rows))
+
+    def nbytes(self) -> int:
+        arrays = (self.default, self.action_base, self.action, self.action_check,
+                  self.goto_default, self.goto_base, self.goto, self.goto_check)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def action_at(self, state: int, t: int) -> int:
+        i = self.action_base[state] + t
+        return self.action[i] if self.action_check[i] == t else self.default[state]
+
+    def goto_at(self, state: int, nt: int) -> int:
+        i = self.goto_base[nt] + state
+        return self.goto[i] if self.goto_check[i] == state else self.goto_default[nt]
+
+    def expected(self, state: int) -> list[str]:
+        return [t for i, t in enumerate(self.terminals) if self.action_at(state, i)]
+
+    def parse(self, tokens: Iterable[str]) -> list[int]:
+        return list(self.parse_iter(tokens))
+
+    def parse_iter(self, tokens: Iterable[str]) -> Iterator[int]:
+        # LRParser.parse_iter on the packed tables, yields rule indices
+        term_ids = self.term_ids
+        default = self.default
+        action_base = self.action_base
+        action = self.action
+        action_check = self.action_check
+        goto_default = self.goto_default
+        goto_base = self.goto_base
+        goto = self.goto
+        goto_check = self.goto_check
+        rule_heads = self.rule_heads
+        rule_lens = self.rule_lens
+
+        stack = [0]
+        state = 0
+        for a in chain(tokens, ('$',)):
+            t = term_ids.get(a)
+            if t is None:
+                raise ParserError(f'unknown token \"{a}\"')
+            while True:
+                i = action_base[state] + t
+                code = action[i] if action_check[i] == t else default[state]
+                if code > 0:
+                    state = code - 1
+                    stack.append(state)
+                    break
+                if code == 0:
+                    raise ParserError(f'got \"{a}\", expected one of {self.expected(state)}')
+                rule_idx = -code - 1
+                if rule_idx == 0:
+                    return
+                n = rule_lens[rule_idx]
+                if n: del stack[-n:]
+                k = rule_heads[rule_idx]
+                below = stack[-1]
+                i = goto_base[k] + below
+                state = goto[i] if goto_check[i] == below else goto_default[k]
+                stack.append(state)
+                yield rule_idx
+        raise ParserError('unexpected end of input')
+
+def dict_bytes(parser: LRParser) -> int:
+    # what LRParser.action_table and goto_table take: the dicts, their tuple keys and action
+    # objects (symbols and state numbers are shared and not counted)
+    actions = LRParser.action_table.func(parser)
+    gotos = LRParser.goto_table.func(parser)
+    total = sys.getsizeof(actions) + sys.getsizeof(gotos)
+    for key, action in actions.items():
+        total += sys.getsizeof(key) + sys.getsizeof(action)
+    total += sum(sys.getsizeof(key) for key in gotos)
+    return total
+
+def rows_bytes(parser: LRParser) -> int:
+    # the dense rows: a list per state, the small ints are shared
+    rows = (*parser.action_rows, *parser.goto_rows)
+    return sys.getsizeof(parser.action_rows) + sys.getsizeof(parser.goto_rows) + sum(sys.getsizeof(row) for row in rows)
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,32 @@
+import io
 import sys
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from typing import TypeVar
-import copy
+from typing import TYPE_CHECKING, Iterator, NamedTuple, TypeVar
+
+if TYPE_CHECKING:
+    from impl.stats import Stats
 
 def main():
-    pat = sys.argv[1] if len(sys.argv) > 1 else input("Regex: ")
-    pat = f'({pat})#'
+    args = sys.argv[1:]
+    minimize = '--no-min' not in args
+    stats = None
+    if '--stats' in args:
+        from impl.stats import Stats
+        stats = Stats()
+    args = [a for a in args if a not in ('--no-min', '--stats')]
+    pat = args[0] if args else input("Regex: ")
 
-    root = parse(pat)
+    root = Concat(parse(pat), End())
     assign_ids(root)
 
-    dfa = gen_dfa(root)
+    dfa = gen_dfa(root, minimize, stats)
     print(dfa)
+    if stats is not None:
+        print(stats)
 
 T = TypeVar('T')
-type Node = Leaf | Concat | Union | Star
+type Node = Leaf | Concat | Union | Star | Plus | End
 
 @dataclass
 class Concat:
@@ -30,196 +42,573 @@ class Union:
 class Star:
     c1: Node
 
+# c1 c1*, without copying c1
+@dataclass
+class Plus:
+    c1: Node
+
 @dataclass
 class Leaf:
-    c: str
+    # sorted, disjoint (first, last) code point ranges, empty for ϵ
+    ranges: tuple[tuple[int, int], ...]
     i: int = 0
 
-def parse(sub):
-    last: Node = Leaf('')
-    i = 0
-    while i < len(sub):
-        c = sub[i]
-        if c == '|':
-            rest = parse(sub[i + 1:])
-            last = Union(last, rest)
-            break
+    @classmethod
+    def char(cls, c: str) -> 'Leaf':
+        return cls(((ord(c), ord(c)),))
+
+MAX_CHAR = 0x10FFFF
+
+# \n, \t, \r are control chars and \s is whitespace, any other escaped char is itself
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r'}
+SPACE = ((9, 13), (32, 32))
+
+# end marker (the # in the dragon book), reaching it accepts pattern number `tag`
+@dataclass
+class End:
+    tag: int = 0
+    i: int = 0
+
+@dataclass
+class DFA:
+    # disjoint (first, last) code point ranges, chars in the same range are never told apart
+    alphabet: list[tuple[int, int]]
+    # trans[state][alphabet index] -> state, -1 is the dead state
+    trans: list[list[int]]
+    start: int
+    # accepting state -> tag of the pattern it accepts, lower tags win
+    accept: dict[int, int]
+
+class RegexError(Exception):
+    pass
+
+def concat_all(seq: list[Node]) -> Node:
+    if not seq: return Leaf(())
+    node = seq[0]
+    for x in seq[1:]:
+        node = Concat(node, x)
+    return node
+
+def union_all(alts: list[Node]) -> Node:
+    # balanced, so firstpos/lastpos of wide alternations stay small along the way
+    while len(alts) > 1:
+        paired = [Union(alts[j], alts[j + 1]) for j in range(0, len(alts) - 1, 2)]
+        if len(alts) % 2: paired.append(alts[-1])
+        alts = paired
+    return alts[0]
+
+def normalize_ranges(ranges: list[tuple[int, int]]) -> tuple[tuple[int, int], ...]:
+    # sort and merge overlapping or adjacent ranges
+    out = []
+    for lo, hi in sorted(ranges):
+        if out and lo <= out[-1][1] + 1:
+            out[-1] = (out[-1][0], max(out[-1][1], hi))
         else:
-            if c == '(':
-                close = sub.rindex(')')
-                c = parse(sub[i + 1:close])
-                i = close
-            elif c == '[':
-                elems = []
+            out.append((lo, hi))
+    return tuple(out)
+
+def parse_class(pat: str, i: int) -> tuple[Node, int]:
+    # i is right after the '[', returns the node and the index right after the ']'
+    negate = i < len(pat) and pat[i] == '^'
+    if negate: i += 1
+    ranges = []
+    while True:
+        if i >= len(pat): raise RegexError('missing "]"')
+        c = pat[i]
+        if c == ']': break
+        if c == '\\':
+            i += 1
+            if i >= len(pat): raise RegexError('missing "]"')
+            c = pat[i]
+            if c == 's':
+                ranges.extend(SPACE)
                 i += 1
-                while sub[i] != ']':
-                    if sub[i] == '-':
-                        a, b = sub[i - 1], sub[i + 1]
-                        elems.extend(chr(j) for j in range(ord(a), ord(b) + 1))
-                    else:
-                        elems.append(sub[i])
-                    i += 1
-                c = Leaf(elems[0])
-                for x in elems[1:]:
-                    c = Union(c, Leaf(x))
-            else:
-                c = Leaf(c)
-            
-            if i + 1 < len(sub):
-                if sub[i + 1] == '*':
-                    c = Star(c)
-                    i += 1
-                elif sub[i + 1] == '?':
-                    c = Union(c, Leaf(''))
-                    i += 1
-                elif sub[i + 1] == '+':
-                    c = Concat(c, Star(copy.deepcopy(c)))
-                    i += 1
-
-            if isinstance(last, Leaf) and last.c == '':
-                last = c
-            else:
-                last = Concat(last, c)
+                continue
+            c = ESCAPES.get(c, c)
+        # a-b range, a '-' right before the ']' is literal
+        if i + 2 < len(pat) and pat[i + 1] == '-' and pat[i + 2] != ']':
+            i += 2
+            last = pat[i]
+            if last == '\\' and i + 1 < len(pat):
+                i += 1
+                last = ESCAPES.get(pat[i], pat[i])
+            if ord(last) < ord(c): raise RegexError(f'reversed range "{c}-{last}"')
+            ranges.append((ord(c), ord(last)))
+        else:
+            ranges.append((ord(c), ord(c)))
+        i += 1
+    ranges = normalize_ranges(ranges)
+    if negate:
+        inverted = []
+        prev = 0
+        for lo, hi in ranges:
+            if lo > prev: inverted.append((prev, lo - 1))
+            prev = hi + 1
+        if prev <= MAX_CHAR: inverted.append((prev, MAX_CHAR))
+        ranges = tuple(inverted)
+    if not ranges: raise RegexError('empty "[]"')
+    return Leaf(ranges), i + 1
+
+def parse(pat: str) -> Node:
+    # single pass, open groups are kept in an explicit stack instead of recursing
+    stack: list[tuple[list[Node], list[Node]]] = []
+    # alternatives already closed by a '|', and the sequence being built
+    alts: list[Node] = []
+    seq: list[Node] = []
+    i = 0
+    while i < len(pat):
+        c = pat[i]
         i += 1
-    return last
+        if c == '|':
+            alts.append(concat_all(seq))
+            seq = []
+        elif c == '(':
+            stack.append((alts, seq))
+            alts, seq = [], []
+        elif c == ')':
+            if not stack: raise RegexError(f'unbalanced ")" at {i - 1}')
+            group = union_all([*alts, concat_all(seq)])
+            alts, seq = stack.pop()
+            seq.append(group)
+        elif c in '*+?':
+            if not seq: raise RegexError(f'nothing to repeat at {i - 1}')
+            if c == '*':
+                seq[-1] = Star(seq[-1])
+            elif c == '+':
+                seq[-1] = Plus(seq[-1])
+            else:
+                seq[-1] = Union(seq[-1], Leaf(()))
+        elif c == '[':
+            node, i = parse_class(pat, i)
+            seq.append(node)
+        elif c == '\\':
+            if i == len(pat): raise RegexError('pattern ends with "\\"')
+            c = pat[i]
+            seq.append(Leaf(SPACE) if c == 's' else Leaf.char(ESCAPES.get(c, c)))
+            i += 1
+        else:
+            seq.append(Leaf.char(c))
+    if stack: raise RegexError('missing ")"')
+    return union_all([*alts, concat_all(seq)])
+
+def postorder(root: Node) -> list[Node]:
+    # children before their parents, leaves from left to right
+    out = []
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded or isinstance(node, Leaf) or isinstance(node, End):
+            out.append(node)
+            continue
+        stack.append((node, True))
+        if isinstance(node, Concat) or isinstance(node, Union):
+            stack.append((node.c2, False))
+        stack.append((node.c1, False))
+    return out
 
 def assign_ids(root: Node):
     counter = 1
-    def recurse(node: Node):
-        nonlocal counter
-        if isinstance(node, Concat) or isinstance(node, Union):
-            recurse(node.c1)
-            recurse(node.c2)
-        elif isinstance(node, Star):
-            recurse(node.c1)
-        elif isinstance(node, Leaf):
+    for node in postorder(root):
+        if isinstance(node, Leaf) or isinstance(node, End):
             node.i = counter
             counter += 1
-    recurse(root)
-
-def gen_dfa(root: Node):
-    _null = {}
-    def nullable(n: Node):
-        nonlocal _null
-        if id(n) in _null: return _null[id(n)]
-        if isinstance(n, Leaf): res = n.c == ''
-        elif isinstance(n, Union):
-            res = nullable(n.c1) or nullable(n.c2)
-        elif isinstance(n, Concat):
-            res = nullable(n.c1) and nullable(n.c2)
-        elif isinstance(n, Star):
-            res = True
-        _null[id(n)] = res
-        return res
-    
-    _first = {}
-    def firstpos(n: Node):
-        nonlocal _first
-        if id(n) in _first: return _first[id(n)]
-        if isinstance(n, Leaf): res = {n.i} if n.c else set()
-        elif isinstance(n, Union):
-            res = firstpos(n.c1).union(firstpos(n.c2))
-        elif isinstance(n, Concat):
-            if nullable(n.c1):
-                res = firstpos(n.c1).union(firstpos(n.c2))
-            else:
-                res = firstpos(n.c1)
-        elif isinstance(n, Star):
-            res = firstpos(n.c1)
-        _first[id(n)] = res
-        return res
-    
-    _last = {}
-    def lastpos(n: Node):
-        nonlocal _last
-        if id(n) in _last: return _last[id(n)]
-        if isinstance(n, Leaf): res = {n.i} if n.c else set()
-        elif isinstance(n, Union):
-            res = lastpos(n.c1).union(lastpos(n.c2))
-        elif isinstance(n, Concat):
-            if nullable(n.c2):
-                res = lastpos(n.c1).union(lastpos(n.c2))
-            else:
-                res = lastpos(n.c2)
-        elif isinstance(n, Star):
-            res = lastpos(n.c1)
-        _last[id(n)] = res
-        return res
-    
+
+class Positions(NamedTuple):
+    # what the DFA is made from: the leaves' positions and how they follow each other
+    alphabet: list[tuple[int, int]]
+    # position -> indices of the alphabet classes it matches
+    classes: dict[int, list[int]]
+    followpos: dict[int, set[int]]
+    # End position -> its tag
+    ends: dict[int, int]
+    initial: frozenset[int]
+
+def positions(root: Node) -> Positions:
+    # nullable, firstpos and lastpos by id(node), children are always done first
+    null = {}
+    first = {}
+    last = {}
     followpos = {}
     def add_follow(i, others):
-        nonlocal followpos
         if i not in followpos: followpos[i] = set()
         followpos[i].update(others)
     chars = {}
-    def recurse(n: Node):
-        nonlocal chars
-        if isinstance(n, Concat):
-            recurse(n.c1)
-            recurse(n.c2)
-            l = lastpos(n.c1)
-            r = firstpos(n.c2)
-            for i in l:
-                add_follow(i, r)
+    ends = {}
+    for n in postorder(root):
+        k = id(n)
+        if isinstance(n, Leaf):
+            null[k] = not n.ranges
+            first[k] = last[k] = {n.i} if n.ranges else set()
+            if n.ranges: chars[n.i] = n.ranges
+        elif isinstance(n, End):
+            null[k] = False
+            first[k] = last[k] = {n.i}
+            ends[n.i] = n.tag
         elif isinstance(n, Union):
-            recurse(n.c1)
-            recurse(n.c2)
-        elif isinstance(n, Star):
-            recurse(n.c1)
-            l = lastpos(n)
-            r = firstpos(n)
-            for i in l:
-                add_follow(i, r)
-        elif isinstance(n, Leaf):
-            chars[n.i] = n.c
-    recurse(root)
-    i_terminal = [i for i, c in chars.items() if c == '#'][0]
-    alphabet = sorted(set(chars.values()).difference({'#', ''}))
-    
-    def to_state(s): return ','.join(map(str, sorted(s)))
-    
-    initial = to_state(firstpos(root))
-    states = {initial}
-    queue = [initial]
-    accept_states = set()
-    trans = {}
-    while queue:
-        S_state = queue[0]
-        queue.pop(0)
-        S = list(map(int, S_state.split(','))) if S_state else set()
-        if i_terminal in S: accept_states.add(S_state)
-        for x in alphabet:
-            U = set().union(*[followpos.get(i, set()) for i in S if chars[i] == x])
-            U_state = to_state(U) if U else 'X'
-            if U and U_state not in states:
-                states.add(U_state)
-                queue.append(U_state)
-            trans[(S_state, x)] = U_state
+            a, b = id(n.c1), id(n.c2)
+            null[k] = null[a] or null[b]
+            first[k] = first[a] | first[b]
+            last[k] = last[a] | last[b]
+        elif isinstance(n, Concat):
+            a, b = id(n.c1), id(n.c2)
+            null[k] = null[a] and null[b]
+            first[k] = first[a] | first[b] if null[a] else first[a]
+            last[k] = last[a] | last[b] if null[b] else last[b]
+            for i in last[a]:
+                add_follow(i, first[b])
+        elif isinstance(n, Star) or isinstance(n, Plus):
+            a = id(n.c1)
+            null[k] = isinstance(n, Star) or null[a]
+            first[k] = first[a]
+            last[k] = last[a]
+            for i in last[a]:
+                add_follow(i, first[a])
+    alphabet, classes = partition_alphabet(chars)
+    return Positions(alphabet, classes, followpos, ends, frozenset(first[id(root)]))
 
-    counter = 1
-    state_names = {}
-    for state in states:
-        if state == initial: continue
-        state_names[state] = f'q{counter}'
-        counter += 1
-    state_names[initial] = 'q0'
-    state_names['X'] = 'X'
-
-    for x in alphabet:
-        trans[('X', x)] = 'X'
-    states.add('X')
-
-    yml = 'states: [' + ', '.join(f'"{state_names[s]}"' for s in states) + ']\n'
-    yml += 'input_alphabet: [' + ', '.join(alphabet) + ']\n'
-    yml += f'start_state: \"{state_names[initial]}\"\n'
-    yml += 'accept_states: [' + ', '.join(f'"{state_names[s]}"' for s in accept_states) + ']\n'
-    yml += 'delta:\n'
-    for s in states:
-        yml += f' {state_names[s]}:\n'
-        for x in alphabet:
-            yml += f'  {x}: {state_names[trans[(s, x)]]}\n'
-
-    return yml
+def accepted_tag(pos: Positions, S: frozenset[int]) -> int:
+    # tag accepted in the state of positions S, -1 if none
+    tags = [pos.ends[i] for i in S if i in pos.ends]
+    return min(tags) if tags else -1
+
+def build_dfa(root: Node) -> DFA:
+    pos = positions(root)
+    classes = pos.classes
+    followpos = pos.followpos
+
+    # subset of positions -> state index, in order of discovery
+    state_ids = {pos.initial: 0}
+    queue = [pos.initial]
+    trans = []
+    accept = {}
+    for S in queue:
+        tag = accepted_tag(pos, S)
+        if tag >= 0: accept[state_ids[S]] = tag
+        # alphabet index -> positions that follow, only for the classes present in S
+        moves: dict[int, set[int]] = {}
+        for i in S:
+            if i not in classes: continue
+            f = followpos.get(i, ())
+            for x in classes[i]:
+                if x in moves:
+                    moves[x].update(f)
+                else:
+                    moves[x] = set(f)
+        row = [-1] * len(pos.alphabet)
+        # new states are numbered in alphabet order, however the sets happen to iterate
+        for x in sorted(moves):
+            U = moves[x]
+            if not U: continue
+            U = frozenset(U)
+            if U not in state_ids:
+                state_ids[U] = len(queue)
+                queue.append(U)
+            row[x] = state_ids[U]
+        trans.append(row)
+
+    return DFA(pos.alphabet, trans, 0, accept)
+
+# transition of a LazyDFA not made yet
+UNKNOWN = -2
+
+class LazyDFA:
+    # the DFA of build_dfa, made one transition at a time as the matcher first takes it, for
+    # patterns whose full DFA is huge but whose inputs only visit a few of its states
+    # at most max_states states are kept, when full the whole cache is flushed (as RE2 does) and
+    # the states still needed are made again, so memory stays bounded whatever the input: the cap
+    # is in states, trans never holds more than max_states * len(alphabet) cells
+    alphabet: list[tuple[int, int]]
+    # trans[state][alphabet index] -> state, -1 is the dead state, UNKNOWN not made yet
+    trans: list[list[int]]
+    # state -> tag it accepts, -1 if none
+    accepting: list[int]
+    start: int
+
+    def __init__(self, pos: Positions, max_states: int = 4096):
+        self.pos = pos
+        self.alphabet = pos.alphabet
+        # a flush makes the start state, the state being left and its target again
+        self.max_states = max(max_states, 3)
+        # position -> the classes it matches, as a set
+        self.class_sets = {i: set(xs) for i, xs in pos.classes.items()}
+        # state -> its positions, and back
+        self.sets: list[frozenset[int]] = []
+        self.state_ids: dict[frozenset[int], int] = {}
+        self.trans = []
+        self.accepting = []
+        # transitions made and cache flushes, for tuning max_states
+        self.misses = 0
+        self.flushes = 0
+        self.start = self.add(pos.initial)
+
+    def add(self, S: frozenset[int]) -> int:
+        j = len(self.sets)
+        self.sets.append(S)
+        self.state_ids[S] = j
+        self.trans.append([UNKNOWN] * len(self.alphabet))
+        self.accepting.append(accepted_tag(self.pos, S))
+        return j
+
+    def flush(self):
+        # trans and accepting are cleared in place, matchers keep references to them
+        self.sets.clear()
+        self.state_ids.clear()
+        self.trans.clear()
+        self.accepting.clear()
+        self.flushes += 1
+        self.start = self.add(self.pos.initial)
+
+    def step(self, state: int, col: int) -> int:
+        # makes trans[state][col] and returns it; a flush renumbers the states,
+        # the state returned is always valid in the new numbering
+        self.misses += 1
+        S = self.sets[state]
+        followpos = self.pos.followpos
+        U = set()
+        for i in S:
+            if col in self.class_sets.get(i, ()):
+                U.update(followpos.get(i, ()))
+        if not U:
+            self.trans[state][col] = -1
+            return -1
+        U = frozenset(U)
+        j = self.state_ids.get(U)
+        if j is None:
+            if len(self.sets) >= self.max_states:
+                self.flush()
+                state = self.state_ids.get(S)
+                if state is None: state = self.add(S)
+                j = self.state_ids.get(U)
+            if j is None: j = self.add(U)
+        self.trans[state][col] = j
+        return j
+
+def partition_alphabet(chars: dict[int, tuple[tuple[int, int], ...]]) -> tuple[list[tuple[int, int]], dict[int, list[int]]]:
+    # split every leaf's ranges at each other's bounds, into disjoint classes
+    # returns the classes, and position -> indices of the classes it matches
+    bounds = set()
+    for ranges in chars.values():
+        for lo, hi in ranges:
+            bounds.add(lo)
+            bounds.add(hi + 1)
+    bounds = sorted(bounds)
+    cuts = [(bounds[k], bounds[k + 1] - 1) for k in range(len(bounds) - 1)]
+
+    # only keep pieces some leaf actually covers
+    covered = normalize_ranges([r for ranges in chars.values() for r in ranges])
+    alphabet = []
+    j = 0
+    for lo, hi in cuts:
+        while j < len(covered) and covered[j][1] < lo: j += 1
+        if j < len(covered) and covered[j][0] <= lo:
+            alphabet.append((lo, hi))
+
+    starts = [lo for lo, _ in alphabet]
+    classes = {}
+    for i, ranges in chars.items():
+        xs = []
+        for lo, hi in ranges:
+            x = bisect_left(starts, lo)
+            while x < len(alphabet) and alphabet[x][1] <= hi:
+                xs.append(x)
+                x += 1
+        classes[i] = xs
+    return alphabet, classes
+
+def minimize_dfa(dfa: DFA) -> DFA:
+    # Hopcroft's partition refinement, the dead state takes part as state n
+    n = len(dfa.trans)
+    dead = n
+    def delta(p, c):
+        if p == dead: return dead
+        q = dfa.trans[p][c]
+        return dead if q < 0 else q
+
+    # inv[c][q]: every p with delta(p, c) == q
+    inv = [[[] for _ in range(n + 1)] for _ in dfa.alphabet]
+    for p in range(n + 1):
+        for c in range(len(dfa.alphabet)):
+            inv[c][delta(p, c)].append(p)
+
+    # states accepting different tags are never equivalent
+    by_tag: dict[int, set[int]] = {}
+    for p in range(n + 1):
+        by_tag.setdefault(dfa.accept.get(p, -1), set()).add(p)
+    blocks = list(by_tag.values())
+    block_of = [0] * (n + 1)
+    for k, b in enumerate(blocks):
+        for p in b: block_of[p] = k
+
+    work = list(range(len(blocks)))
+    in_work = set(work)
+    while work:
+        a = work.pop()
+        in_work.discard(a)
+        splitter = list(blocks[a])
+        for c in range(len(dfa.alphabet)):
+            # block -> its states that go into the splitter on c
+            touched: dict[int, list[int]] = {}
+            for q in splitter:
+                for p in inv[c][q]:
+                    touched.setdefault(block_of[p], []).append(p)
+            for b, ps in touched.items():
+                if len(ps) == len(blocks[b]): continue
+                new = set(ps)
+                blocks[b] -= new
+                k = len(blocks)
+                blocks.append(new)
+                for p in new: block_of[p] = k
+                if b in in_work or len(new) < len(blocks[b]):
+                    work.append(k)
+                    in_work.add(k)
+                else:
+                    work.append(b)
+                    in_work.add(b)
+
+    # renumber reachable blocks in order of discovery, dropping the dead one
+    dead_block = block_of[dead]
+    new_ids = {block_of[dfa.start]: 0}
+    order = [block_of[dfa.start]]
+    trans = []
+    for b in order:
+        p = next(iter(blocks[b]))
+        row = []
+        for c in range(len(dfa.alphabet)):
+            q = block_of[delta(p, c)]
+            if q == dead_block:
+                row.append(-1)
+                continue
+            if q not in new_ids:
+                new_ids[q] = len(order)
+                order.append(q)
+            row.append(new_ids[q])
+        trans.append(row)
+    accept = {new_ids[block_of[p]]: tag for p, tag in dfa.accept.items() if block_of[p] in new_ids}
+    return DFA(dfa.alphabet, trans, 0, accept)
+
+def fmt_class(r: tuple[int, int]) -> str:
+    lo, hi = r
+    return chr(lo) if lo == hi else f'{chr(lo)}-{chr(hi)}'
+
+class ColumnMap(dict[str, int]):
+    # char -> alphabet index (-1 if none), found by bisection on first use and then cached
+    def __init__(self, alphabet: list[tuple[int, int]]):
+        super().__init__()
+        self.alphabet = alphabet
+        self.starts = [lo for lo, _ in alphabet]
+
+    def __missing__(self, c: str) -> int:
+        o = ord(c)
+        x = bisect_right(self.starts, o) - 1
+        col = x if x >= 0 and o <= self.alphabet[x][1] else -1
+        self[c] = col
+        return col
+
+def to_yaml(dfa: DFA) -> str:
+    # for large DFAs write straight to a file with impl.emit.write_dfa
+    from impl.emit import write_dfa
+    out = io.StringIO()
+    write_dfa(dfa, out, 'yaml')
+    return out.getvalue()
+
+def gen_dfa(root: Node, minimize: bool = True, stats: 'Stats | None' = None) -> str:
+    build, minimize_, yaml = build_dfa, minimize_dfa, to_yaml
+    if stats is not None:
+        # to_yaml's first call would otherwise time the import of impl.emit (and impl.syntax)
+        import impl.emit
+        build = stats.timed('build_dfa', build_dfa)
+        minimize_ = stats.timed('minimize', minimize_dfa)
+        yaml = stats.timed('to_yaml', to_yaml)
+
+    dfa = build(root)
+    if stats is not None:
+        stats.sizes['positions'] = sum(1 for node in postorder(root) if isinstance(node, End) or isinstance(node, Leaf) and node.ranges)
+        stats.sizes['dfa_states'] = len(dfa.trans)
+    if minimize:
+        dfa = minimize_(dfa)
+    if stats is not None:
+        cells = len(dfa.trans) * len(dfa.alphabet)
+        stats.sizes['min_states' if minimize else 'states'] = len(dfa.trans)
+        stats.sizes['alphabet'] = len(dfa.alphabet)
+        stats.sizes['transitions'] = sum(t >= 0 for row in dfa.trans for t in row)
+        if cells:
+            stats.sizes['density'] = stats.sizes['transitions'] / cells
+    return yaml(dfa)
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    string: str
+
+    def group(self) -> str:
+        return self.string[self.start:self.end]
+
+class Pattern:
+    # matcher over a DFA: text chars map to alphabet columns, states are row indices
+    pattern: str
+    dfa: DFA | LazyDFA
+
+    def __init__(self, pattern: str, dfa: DFA | LazyDFA):
+        self.pattern = pattern
+        self.dfa = dfa
+        self.cols = ColumnMap(dfa.alphabet)
+        if isinstance(dfa, LazyDFA):
+            # filled in as states are made
+            self.accepting = dfa.accepting
+            self.step = dfa.step
+        else:
+            # tag accepted by each state, -1 if none
+            self.accepting = [dfa.accept.get(s, -1) for s in range(len(dfa.trans))]
+            self.step = None
+
+    def match_end(self, text: str, pos: int = 0) -> int:
+        # end of the longest match starting at pos, -1 if there is none
+        cols = self.cols
+        trans = self.dfa.trans
+        accepting = self.accepting
+        step = self.step
+        state = self.dfa.start
+        last = pos if accepting[state] >= 0 else -1
+        for i in range(pos, len(text)):
+            col = cols[text[i]]
+            if col < 0: break
+            nxt = trans[state][col]
+            # only a LazyDFA has these
+            if nxt == UNKNOWN: nxt = step(state, col)
+            state = nxt
+            # dead state, nothing longer can match
+            if state < 0: break
+            if accepting[state] >= 0: last = i + 1
+        return last
+
+    def match(self, text: str, pos: int = 0) -> Match | None:
+        end = self.match_end(text, pos)
+        return Match(pos, end, text) if end >= 0 else None
+
+    def fullmatch(self, text: str) -> Match | None:
+        m = self.match(text)
+        return m if m is not None and m.end == len(text) else None
+
+    def finditer(self, text: str) -> Iterator[Match]:
+        pos = 0
+        while pos <= len(text):
+            end = self.match_end(text, pos)
+            if end < 0:
+                pos += 1
+                continue
+            yield Match(pos, end, text)
+            pos = end if end > pos else pos + 1
+
+def compile(pattern: str, minimize: bool = True, lazy: bool = False, max_states: int = 4096) -> Pattern:
+    # lazy: states are made while matching and at most max_states are kept (see LazyDFA)
+    root = Concat(parse(pattern), End())
+    assign_ids(root)
+    if lazy:
+        return Pattern(pattern, LazyDFA(positions(root), max_states))
+    dfa = build_dfa(root)
+    if minimize:
+        dfa = minimize_dfa(dfa)
+    return Pattern(pattern, dfa)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,47 @@
+import sys
+import time
+
+from impl.syntax import KINDS, Grammar, PredParser, LRParser, parse_bnf
+
+def main():
+    # python -m impl.session kind grammar1 grammar2 ...: analyzes each version after the previous one
+    kind = sys.argv[1]
+    session = Session()
+    for path in sys.argv[2:]:
+        with open(path) as file:
+            grammar_text = file.read()
+        start = time.perf_counter()
+        parser = session.analyze(grammar_text, kind)
+        # changed is only set when the previous analysis could be reused
+        changed = sorted(parser.cg.symbols[nt] for nt in parser.changed) if hasattr(parser, 'changed') else 'everything'
+        print(f'{path}: {(time.perf_counter() - start) * 1000:.1f}ms, changed: {changed}')
+
+class Session:
+    # the last analysis of a grammar being edited, the next one only redoes what the edit touched
+    # (see FirstFollow.compute_from, StateReuse, LRParser.patch_row and PredParser.patch_table)
+    parser: PredParser | LRParser | None
+
+    def __init__(self):
+        self.parser = None
+
+    def parser_for(self, g: Grammar, cls: type[PredParser] | type[LRParser], stats=None) -> PredParser | LRParser:
+        # FIRST/FOLLOW are ready, build the states/table and hand it to keep()
+        prev = self.parser if type(self.parser) is cls else None
+        # prev is taken apart while building, if that fails there is nothing left to reuse
+        self.parser = None
+        return cls(g, stats, prev)
+
+    def keep(self, parser: PredParser | LRParser):
+        parser.prev = None
+        self.parser = parser
+
+    def analyze(self, grammar_text: str, kind: str = 'slr') -> PredParser | LRParser:
+        parser = self.parser_for(parse_bnf(grammar_text), KINDS[kind])
+        if isinstance(parser, LRParser):
+            parser.build_states()
+        parser.build_table()
+        self.keep(parser)
+        return parser
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import time
+from functools import wraps
+from typing import Callable, TypeVar
+
+from impl.packed import PackedTables, dict_bytes
+
+# optional instrumentation: parsers built without a Stats object run none of this,
+# with one the instance's methods are wrapped to time phases and count calls
+
+F = TypeVar('F', bound=Callable)
+
+# method -> phase name
+PHASES = {
+    'compute': 'first_follow',
+    'compute_from': 'first_follow',
+    'build_states': 'build_states',
+    'build_lookaheads': 'lookaheads',
+    'build_table': 'build_table',
+}
+# memoized method -> (memo attribute, key of the argument)
+MEMOS: dict[str, tuple[str, Callable]] = {
+    'first': ('first_map', tuple),
+    'follow': ('follow_map', lambda nt: nt),
+    'closure_of': ('nt_closure', lambda nt: nt),
+}
+COUNTED = ('closure', 'closure_lr1', 'closure_la', 'goto_kernels', 'goto')
+
+class Stats:
+    # phase -> seconds, summed over calls; a phase run from inside another (lookaheads in
+    # build_states) is only counted as itself, so the times add up to the total
+    times: dict[str, float]
+    calls: dict[str, int]
+    # calls of a memoized method answered from its memo
+    hits: dict[str, int]
+    # states, items, table density, ...
+    sizes: dict[str, int | float]
+
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+        self.hits = {}
+        self.sizes = {}
+        # time taken by the phases run from each phase that is running, innermost last
+        self.nested: list[float] = []
+        self.parsers = []
+        # id(action_rows) -> (action_rows, packed bytes, dict bytes): packing is the costly part
+        # of collect, which runs for both __str__ and to_dict
+        self.table_bytes: dict[int, tuple[list, int, int]] = {}
+
+    def timed(self, name: str, fn: F) -> F:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            self.nested.append(0.0)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                inner = self.nested.pop()
+                if self.nested: self.nested[-1] += seconds
+                self.times[name] = self.times.get(name, 0.0) + seconds - inner
+                self.calls[name] = self.calls.get(name, 0) + 1
+        return wrapper
+
+    def counted(self, name: str, fn: F) -> F:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def memoized(self, name: str, fn: F, owner, memo_attr: str, key: Callable) -> F:
+        # the memo is looked up on every call, it may not exist yet when attaching
+        @wraps(fn)
+        def wrapper(arg):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if key(arg) in getattr(owner, memo_attr, ()):
+                self.hits[name] = self.hits.get(name, 0) + 1
+            return fn(arg)
+        return wrapper
+
+    def attach(self, parser):
+        # wraps the instance's own methods, the class and other instances are untouched
+        for method, phase in PHASES.items():
+            if hasattr(parser, method):
+                setattr(parser, method, self.timed(phase, getattr(parser, method)))
+        for method, (memo_attr, key) in MEMOS.items():
+            if hasattr(parser, method):
+                setattr(parser, method, self.memoized(method, getattr(parser, method), parser, memo_attr, key))
+        for method in COUNTED:
+            if hasattr(parser, method):
+                setattr(parser, method, self.counted(method, getattr(parser, method)))
+        self.parsers.append(parser)
+        return parser
+
+    def collect(self):
+        # sizes of whatever the attached parsers have built so far
+        for parser in self.parsers:
+            g = parser.g
+            self.sizes['terminals'] = len(g.terminals)
+            self.sizes['non_terminals'] = len(g.non_terminals)
+            self.sizes['rules'] = len(g.rules)
+            if hasattr(parser, 'nullable'):
+                self.sizes['nullable'] = sum(parser.nullable)
+            n_terms = len(g.terminals) + 1
+            if hasattr(parser, 'action_rows'):
+                states = parser.states
+                self.sizes['states'] = len(states)
+                self.sizes['kernel_items'] = sum(len(s.kernel) for s in states)
+                self.sizes['items'] = sum(len(s.items) for s in states)
+                self.sizes['transitions'] = sum(len(out) for out in parser.state_out)
+                if states:
+                    actions = sum(1 for row in parser.action_rows for code in row if code)
+                    gotos = sum(1 for row in parser.goto_rows for j in row if j >= 0)
+                    self.sizes['action_density'] = actions / (len(states) * n_terms)
+                    self.sizes['goto_density'] = gotos / (len(states) * max(len(g.non_terminals) - 1, 1))
+                    # packed tables (see impl/packed.py) against action_table/goto_table
+                    packed, n_dict = self.packed_sizes(parser)
+                    self.sizes['table_dict_bytes'] = n_dict
+                    self.sizes['table_packed_bytes'] = packed
+                    self.sizes['table_packed_ratio'] = packed / n_dict
+            elif hasattr(parser, 'pred_rows'):
+                cells = sum(1 for row in parser.pred_rows for r in row if r >= 0)
+                self.sizes['table_cells'] = cells
+                if g.non_terminals:
+                    self.sizes['table_density'] = cells / (len(g.non_terminals) * n_terms)
+
+    def packed_sizes(self, parser) -> tuple[int, int]:
+        # the rows are kept in the cache so their id can't be reused by rebuilt ones
+        rows = parser.action_rows
+        cached = self.table_bytes.get(id(rows))
+        if cached is None:
+            cached = self.table_bytes[id(rows)] = (rows, PackedTables(parser).nbytes(), dict_bytes(parser))
+        return cached[1], cached[2]
+
+    def to_dict(self) -> dict:
+        self.collect()
+        return {'times': self.times, 'calls': self.calls, 'hits': self.hits, 'sizes': self.sizes}
+
+    def __str__(self) -> str:
+        self.collect()
+        lines = [f'{"phase":<16}{"calls":>8}{"time":>12}']
+        for name, seconds in self.times.items():
+            lines.append(f'{name:<16}{self.calls[name]:>8}{seconds * 1000:>10.2f}ms')
+        counted = [name for name in self.calls if name not in self.times]
+        if counted:
+            lines.append(f'{"call":<16}{"calls":>8}{"memo hits":>12}')
+            for name in counted:
+                hits = f'{self.hits.get(name, 0) / self.calls[name]:.1%}' if name in MEMOS else '-'
+                lines.append(f'{name:<16}{self.calls[name]:>8}{hits:>12}')
+        if self.sizes:
+            lines.append('size')
+            for name, value in self.sizes.items():
+                text = f'{value:.1%}' if isinstance(value, float) else str(value)
+                lines.append(f'  {name:<18}{text:>10}')
+        return '\n'.join(lines)
@@ -1,51 +1,82 @@
+import re
 import sys
-from dataclasses import dataclass
-from typing import TypeVar
+from dataclasses import dataclass, field
+from functools import cached_property
+from itertools import chain
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, NamedTuple, TypeVar
+
+if TYPE_CHECKING:
+    from impl.stats import Stats
+    from impl.tree import TreeBuilder
 
 EPSILON = 'ϵ'
 
 def main_pred():
-    grammar_path = sys.argv[1]
+    args = sys.argv[1:]
+    stats = make_stats(args)
+    grammar_path = args[0]
     with open(grammar_path) as file:
-        grammar_text = file.read()
-    gm = parse_bnf(grammar_text)
+        gm = load_bnf(file)
     # print(gm)
 
-    ipt = input("Input: ") if len(sys.argv) == 2 else sys.argv[2]
+    ipt = input("Input: ") if len(args) == 1 else args[1]
 
-    parser = PredParser(gm)
+    parser = PredParser(gm, stats)
     parser.build_table()
 
-    print(parser.first_map)
-    print(parser.follow_map)
+    print({nt: parser.first([nt]) for nt in gm.non_terminals})
+    print({nt: parser.follow(nt) for nt in gm.non_terminals})
     print(parser.table)
 
-    rules = parser.parse(ipt.strip().split())
-    for r in rules:
+    for r in parser.parse_iter(ipt.strip().split()):
         print(r)
 
+    if stats is not None:
+        print(stats)
+
 def main():
-    grammar_path = sys.argv[1]
+    args = sys.argv[1:]
+    stats = make_stats(args)
+    grammar_path = args[0]
     with open(grammar_path) as file:
-        grammar_text = file.read()
-    gm = parse_bnf(grammar_text)
+        gm = load_bnf(file)
     print(gm)
 
-    parser = SLRParser(gm)
+    parser = SLRParser(gm, stats)
     parser.build_states()
     parser.build_table()
     globals()['parser'] = parser
 
+    if len(args) > 1:
+        for r in parser.parse(args[1].strip().split()):
+            print(r)
+
+    if stats is not None:
+        print(stats)
+
+def make_stats(args: list[str]) -> 'Stats | None':
+    # --stats anywhere in args (removed from them) turns on the instrumentation
+    if '--stats' not in args: return None
+    args.remove('--stats')
+    from impl.stats import Stats
+    return Stats()
+
 T = TypeVar('T')
 
 @dataclass(order=True)
 class Rule:
     name: str
     body: list[str]
+    # line, column (from 1) of the body in the grammar source, None for rules made in code
+    pos: tuple[int, int] | None = field(default=None, compare=False, repr=False)
 
     def __str__(self) -> str:
         return f'{self.name} -> {" ".join(self.body)}'
 
+    def where(self) -> str:
+        # for messages: the rule and where it came from
+        return f'"{self}"' if self.pos is None else f'"{self}" (line {self.pos[0]}, column {self.pos[1]})'
+
 @dataclass
 class Grammar:
     rules: list[Rule]
@@ -54,47 +85,124 @@ class Grammar:
     terminals: list[str]
     # X: every rule X -> ...
     rule_map: dict[str, list[Rule]]
+    # interned form, made on first use by compiled()
+    cg: 'CompiledGrammar | None' = field(default=None, repr=False, compare=False)
+
+    def compiled(self) -> 'CompiledGrammar':
+        # only valid for the symbols and rules it was made from, whatever changes them resets cg
+        if self.cg is None:
+            self.cg = CompiledGrammar(self)
+        return self.cg
 
     def is_terminal(self, s: str):
-        return s == '' or s in self.terminals
+        cg = self.compiled()
+        return s == '' or cg.ids.get(s, cg.eof) < cg.eof
 
     def is_non_terminal(self, s: str):
-        return s in self.non_terminals
+        cg = self.compiled()
+        return cg.ids.get(s, -1) >= cg.n_terms
 
     def starting_symbol(self):
         return self.rules[0].name
 
     def is_symbol(self, s: str):
-        return s in self.terminals or s in self.non_terminals
+        cg = self.compiled()
+        return cg.ids.get(s, cg.eof) != cg.eof
+
+class CompiledGrammar:
+    # the grammar with every symbol interned to a dense int: terminals first, then '$', then
+    # non terminals, so a terminal's id is also its bit in FIRST/FOLLOW/lookahead bitsets
+    # all the analysis runs on this, the strings are only for display
+    symbols: list[str]
+    ids: dict[str, int]
+    # ids below n_terms are terminals, eof is the id of '$'
+    n_terms: int
+    eof: int
+    # rule index -> id of its head, ids of its body
+    heads: list[int]
+    bodies: list[tuple[int, ...]]
+    # symbol id -> index of every rule it is the head of, empty for terminals
+    rules_of: list[list[int]]
+
+    def __init__(self, g: Grammar):
+        self.symbols = [*g.terminals, '$', *g.non_terminals]
+        self.ids = ids = {s: i for i, s in enumerate(self.symbols)}
+        self.n_terms = len(g.terminals) + 1
+        self.eof = self.n_terms - 1
+        self.heads = [ids[rule.name] for rule in g.rules]
+        self.bodies = [tuple(ids[s] for s in rule.body) for rule in g.rules]
+        self.rules_of = [[] for _ in self.symbols]
+        for rule_idx, head in enumerate(self.heads):
+            self.rules_of[head].append(rule_idx)
+
+    def is_nt(self, s: int) -> bool:
+        return s >= self.n_terms
+
+# symbols are split on whitespace, a | on its own separates alternatives
+SYMBOL = re.compile(r'\S+')
 
 def parse_bnf(text: str) -> Grammar:
+    return load_bnf(text.splitlines())
+
+def load_bnf(lines: Iterable[str]) -> Grammar:
+    # one pass over lines (a file works), each rule keeps the line and column of its body
+    #   X -> a b | c | ϵ      alternatives split on a | with whitespace around it,
+    #   X -> a |                an empty one (like after a trailing |) is ϵ
+    #     | d                   a line starting with | adds alternatives to the rule above
+    #   X -> a |= "|" ||        a | next to other chars is part of a symbol
+    # symbols are kept in dicts (ordered sets) so the whole load is linear in the text
     g = Grammar([], [], [], {})
-    for line in text.splitlines():
-        line = line.strip()
-        if not line: continue
-        if line[0] == '#': continue
-
-        name, bodies = map(str.strip, line.split('->', 1))
-        for body_str in bodies.split(' | '):
-            body = body_str.split()
-            if not body or body == [EPSILON]: body = []
-            rule = Rule(name, body)
+    # symbol -> None, in order of appearance
+    heads: dict[str, None] = {}
+    symbols: dict[str, None] = {}
+    name = None
+    for line_no, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped or stripped[0] == '#': continue
+
+        if stripped == '|' or stripped.startswith('|') and stripped[1].isspace():
+            if name is None:
+                raise GrammarError(f'line {line_no}: "|" before any rule')
+            col = line.index('|') + 1
+        else:
+            arrow = line.find('->')
+            if arrow < 0:
+                raise GrammarError(f'line {line_no}: expected "->" in "{stripped}"')
+            name = line[:arrow].strip()
+            if not name or len(name.split()) > 1:
+                raise GrammarError(f'line {line_no}: expected one symbol before "->", got "{name}"')
+            heads[name] = None
+            col = arrow + 2
+
+        rule_map = g.rule_map.setdefault(name, [])
+        for body_col, body in split_alternatives(line, col):
+            if body == [EPSILON]: body = []
+            rule = Rule(name, body, (line_no, body_col + 1))
             g.rules.append(rule)
-            g.rule_map.setdefault(name, []).append(rule)
-
-    for rule in g.rules:
-        if rule.name not in g.non_terminals:
-            g.non_terminals.append(rule.name)
-
-    for rule in g.rules:
-        for s in rule.body:
-            if s not in g.non_terminals and s and s not in g.terminals:
-                g.terminals.append(s)
-
-    g.terminals.sort()
+            rule_map.append(rule)
+            for sym in body:
+                symbols[sym] = None
 
+    g.non_terminals = list(heads)
+    g.terminals = sorted(sym for sym in symbols if sym not in heads)
     return g
 
+def split_alternatives(line: str, start: int) -> Iterator[tuple[int, list[str]]]:
+    # the bodies in line[start:], each with the column (from 0) where it begins
+    col = start
+    body: list[str] = []
+    for m in SYMBOL.finditer(line, start):
+        sym = m.group()
+        if sym == '|':
+            yield col, body
+            body = []
+            # an empty body begins right after its |
+            col = m.end()
+        else:
+            if not body: col = m.start()
+            body.append(sym)
+    yield col, body
+
 class GrammarError(Exception):
     pass
 
@@ -103,133 +211,562 @@ class ParserError(Exception):
 
 class FirstFollow:
     g: Grammar
+    cg: CompiledGrammar
     first_map: dict[tuple[str, ...], set[str]]
     follow_map: dict[str, set[str]]
-
-    def __init__(self, g: Grammar):
+    # terminal -> bit index (its symbol id), '$' is the last one
+    term_list: list[str]
+    term_ids: dict[str, int]
+    # by symbol id: whether it derives ϵ, and its FIRST/FOLLOW bitsets (a terminal's FIRST is itself)
+    nullable: list[bool]
+    first_bits: list[int]
+    follow_bits: list[int]
+    # called as progress(phase, count) while building, e.g. ('states', states built so far)
+    progress: Callable[[str, int], None] | None = None
+    # phase times, call counts and sizes, only collected when given (see impl/stats.py)
+    stats: 'Stats | None' = None
+    # analysis of the grammar before an edit, what the edit didn't touch is taken from it
+    prev: 'FirstFollow | None' = None
+    # with prev: symbol id -> its id in prev, -1 if new
+    prev_ids: list[int]
+    # with prev: prev's terminal id -> id here (-1 if gone), None if the terminals are the same
+    term_map: list[int] | None
+    # with prev: non terminals whose rules changed, and those whose nullable/FIRST or FOLLOW may have
+    changed: set[int]
+    dirty_first: set[int]
+    dirty_follow: set[int]
+
+    def __init__(self, g: Grammar, stats: 'Stats | None' = None, prev: 'FirstFollow | None' = None):
         self.g = g
+        self.cg = g.compiled()
         self.first_map = {}
         self.follow_map = {}
-
-    def first(self, syms: list[str]) -> set[str]:
-        key = tuple(syms)
-        if key in self.first_map: return self.first_map[key]
-
-        if len(syms) == 0:
-            res = {''}
-        if len(syms) == 1:
-            if self.g.is_terminal(syms[0]):
-                res = {syms[0]}
-            else:
-                res = set().union(*[self.first(rule.body) for rule in self.g.rule_map[syms[0]]])
+        self.term_list = self.cg.symbols[:self.cg.n_terms]
+        self.term_ids = {t: i for i, t in enumerate(self.term_list)}
+        if stats is not None:
+            self.stats = stats
+            stats.attach(self)
+        if prev is not None and self.can_reuse(prev):
+            self.prev = prev
+            self.compute_from(prev)
         else:
-            res = set()
-            has_empty = True
-            # X -> Y Z W
-            for sym in syms:
-                f = self.first([sym])
-                res.update(f - {''})
-                if '' not in f:
-                    has_empty = False
+            self.compute()
+
+    @classmethod
+    def without_sets(cls, g: Grammar):
+        # an instance over g that never computes FIRST/FOLLOW, for tables built elsewhere
+        parser = cls.__new__(cls)
+        parser.g = g
+        parser.cg = g.compiled()
+        parser.first_map = {}
+        parser.follow_map = {}
+        parser.term_list = parser.cg.symbols[:parser.cg.n_terms]
+        parser.term_ids = {t: i for i, t in enumerate(parser.term_list)}
+        return parser
+
+    def can_reuse(self, prev: 'FirstFollow') -> bool:
+        # tables loaded from disk have no sets, and a symbol that went from terminal to non terminal
+        # (or back) changes the items of rules that are otherwise the same
+        return (
+            hasattr(prev, 'first_bits')
+            and prev.g.starting_symbol() == self.g.starting_symbol()
+            and not set(prev.g.terminals).intersection(self.g.non_terminals)
+            and not set(prev.g.non_terminals).intersection(self.g.terminals)
+        )
+
+    def compute(self):
+        # nullable, FIRST and FOLLOW of every non terminal, as a fixpoint over worklists
+        cg = self.cg
+        n_terms = cg.n_terms
+        n = len(cg.symbols)
+        heads = cg.heads
+        bodies = cg.bodies
+        nts = range(n_terms, n)
+        self.first_map.clear()
+        self.follow_map.clear()
+
+        # nullable: a rule is nullable once all its symbols are, count them down
+        nullable = [False] * n
+        remaining = []
+        # X: index of every rule with X in the body, once per occurrence
+        uses: list[list[int]] = [[] for _ in range(n)]
+        queue = []
+        for rule_idx, body in enumerate(bodies):
+            if any(s < n_terms for s in body):
+                remaining.append(-1)
+                continue
+            remaining.append(len(body))
+            for s in body:
+                uses[s].append(rule_idx)
+            if not body and not nullable[heads[rule_idx]]:
+                nullable[heads[rule_idx]] = True
+                queue.append(heads[rule_idx])
+        for nt in queue:
+            for rule_idx in uses[nt]:
+                remaining[rule_idx] -= 1
+                head = heads[rule_idx]
+                if remaining[rule_idx] == 0 and not nullable[head]:
+                    nullable[head] = True
+                    queue.append(head)
+        self.nullable = nullable
+
+        # FIRST: A -> B ... means FIRST(A) includes FIRST(B)
+        first = dict.fromkeys(nts, 0)
+        first_incl: dict[int, set[int]] = {nt: set() for nt in nts}
+        for head, body in zip(heads, bodies):
+            for s in body:
+                if s < n_terms:
+                    first[head] |= 1 << s
+                    break
+                if s != head:
+                    first_incl[head].add(s)
+                if not nullable[s]:
                     break
-            if has_empty: res.add('')
+        self.propagate(first, first_incl)
+        self.first_bits = first_bits = [1 << t for t in range(n_terms)] + list(first.values())
+
+        # FOLLOW: A -> ... B beta adds FIRST(beta), and FOLLOW(B) includes FOLLOW(A) if beta is nullable
+        follow = dict.fromkeys(nts, 0)
+        follow[heads[0]] = 1 << cg.eof
+        follow_incl: dict[int, set[int]] = {nt: set() for nt in nts}
+        for head, body in zip(heads, bodies):
+            rest = 0
+            rest_nullable = True
+            for s in reversed(body):
+                if s < n_terms:
+                    rest = 1 << s
+                    rest_nullable = False
+                    continue
+                follow[s] |= rest
+                if rest_nullable and s != head:
+                    follow_incl[s].add(head)
+                if nullable[s]:
+                    rest |= first_bits[s]
+                else:
+                    rest = first_bits[s]
+                    rest_nullable = False
+        self.propagate(follow, follow_incl)
+        self.follow_bits = [0] * n_terms + list(follow.values())
+
+    def compute_from(self, prev: 'FirstFollow'):
+        # compute(), redone only for the non terminals that depend on one whose rules changed since prev
+        g = self.g
+        cg = self.cg
+        n_terms = cg.n_terms
+        n = len(cg.symbols)
+        heads = cg.heads
+        bodies = cg.bodies
+        rules_of = cg.rules_of
+        nts = range(n_terms, n)
+        rule_map = g.rule_map
+        prev_ids = self.prev_ids = [prev.cg.ids.get(s, -1) for s in cg.symbols]
+        # prev's bitsets are read through prev_bits, which moves them to the terminal ids here
+        self.term_map = None if prev.term_list == self.term_list else [cg.ids.get(t, -1) for t in prev.term_list]
+        self.bits_map = {}
+        prev_bits = self.prev_bits
+
+        # unchanged non terminals keep prev's Rule objects, so tables that refer to them stay valid,
+        # with where they are now (pos isn't compared, the rules may have moved in the text)
+        changed = set()
+        same: dict[int, Rule] = {}
+        for nt in nts:
+            name = cg.symbols[nt]
+            old = prev.g.rule_map.get(name)
+            if old == rule_map[name]:
+                for new, rule in zip(rule_map[name], old):
+                    rule.pos = new.pos
+                    same[id(new)] = rule
+                rule_map[name] = old
+            else:
+                changed.add(nt)
+        g.rules = [same.get(id(rule), rule) for rule in g.rules]
+        self.changed = changed
+
+        # X -> heads of the rules with X in the body, and of those where only non terminals come before X,
+        # which are the only ones whose nullable/FIRST can depend on X
+        used_by: list[set[int]] = [set() for _ in range(n)]
+        first_used_by: list[set[int]] = [set() for _ in range(n)]
+        for head, body in zip(heads, bodies):
+            prefix = True
+            for s in body:
+                if s >= n_terms:
+                    used_by[s].add(head)
+                    if prefix: first_used_by[s].add(head)
+                else:
+                    prefix = False
+
+        # nullable and FIRST can only change for what reaches a changed non terminal
+        dirty = set(changed)
+        queue = list(changed)
+        for x in queue:
+            for h in first_used_by[x]:
+                if h not in dirty:
+                    dirty.add(h)
+                    queue.append(h)
+        self.dirty_first = dirty
+        rules = [rule_idx for nt in dirty for rule_idx in rules_of[nt]]
+
+        nullable = [False] * n
+        for nt in nts:
+            if nt not in dirty: nullable[nt] = prev.nullable[prev_ids[nt]]
+        remaining = []
+        uses: dict[int, list[int]] = {nt: [] for nt in dirty}
+        queue = []
+        for k, rule_idx in enumerate(rules):
+            body = bodies[rule_idx]
+            if any(s < n_terms or s not in dirty and not nullable[s] for s in body):
+                remaining.append(-1)
+                continue
+            body = [s for s in body if s in dirty]
+            remaining.append(len(body))
+            for s in body:
+                uses[s].append(k)
+            head = heads[rule_idx]
+            if not body and not nullable[head]:
+                nullable[head] = True
+                queue.append(head)
+        for nt in queue:
+            for k in uses[nt]:
+                remaining[k] -= 1
+                head = heads[rules[k]]
+                if remaining[k] == 0 and not nullable[head]:
+                    nullable[head] = True
+                    queue.append(head)
+        self.nullable = nullable
+
+        first = [1 << t for t in range(n_terms)] + [0] * (n - n_terms)
+        for nt in nts:
+            if nt not in dirty: first[nt] = prev_bits(prev.first_bits[prev_ids[nt]])
+        dirty_first = dict.fromkeys(dirty, 0)
+        first_incl: dict[int, set[int]] = {nt: set() for nt in dirty}
+        for rule_idx in rules:
+            head = heads[rule_idx]
+            for s in bodies[rule_idx]:
+                if s < n_terms:
+                    dirty_first[head] |= 1 << s
+                    break
+                if s not in dirty:
+                    dirty_first[head] |= first[s]
+                elif s != head:
+                    first_incl[head].add(s)
+                if not nullable[s]:
+                    break
+        for nt, bits in self.propagate(dirty_first, first_incl).items():
+            first[nt] = bits
+        self.first_bits = first
+
+        # FOLLOW(B) may change if B occurs in a rule that was added or removed, before a symbol
+        # whose FIRST/nullable did change, or at the nullable end of a rule of such a non terminal
+        fdirty = {nt for nt in nts if prev_ids[nt] < 0}
+        for nt in changed:
+            name = cg.symbols[nt]
+            old = {tuple(rule.body) for rule in prev.g.rule_map.get(name, ())}
+            for body in old.symmetric_difference(tuple(rule.body) for rule in rule_map[name]):
+                fdirty.update(s for s in map(cg.ids.get, body) if s is not None and s >= n_terms)
+        # the rules of a deleted non terminal are removed rules too
+        for name in prev.g.non_terminals:
+            nt = cg.ids.get(name)
+            if nt is None or nt < n_terms:
+                for rule in prev.g.rule_map.get(name, ()):
+                    fdirty.update(s for s in map(cg.ids.get, rule.body) if s is not None and s >= n_terms)
+        moved = [
+            x for x in dirty
+            if prev_ids[x] < 0 or first[x] != prev_bits(prev.first_bits[prev_ids[x]]) or nullable[x] != prev.nullable[prev_ids[x]]
+        ]
+        for x in moved:
+            for h in used_by[x]:
+                for rule_idx in rules_of[h]:
+                    body = bodies[rule_idx]
+                    for k, s in enumerate(body):
+                        if s == x:
+                            fdirty.update(t for t in body[:k] if t >= n_terms)
+        queue = list(fdirty)
+        for y in queue:
+            for rule_idx in rules_of[y]:
+                for s in reversed(bodies[rule_idx]):
+                    if s < n_terms: break
+                    if s not in fdirty:
+                        fdirty.add(s)
+                        queue.append(s)
+                    if not nullable[s]: break
+        self.dirty_follow = fdirty
+
+        follow = [0] * n
+        for nt in nts:
+            if nt not in fdirty: follow[nt] = prev_bits(prev.follow_bits[prev_ids[nt]])
+        dirty_follow = dict.fromkeys(fdirty, 0)
+        follow_incl: dict[int, set[int]] = {nt: set() for nt in fdirty}
+        if heads[0] in fdirty:
+            dirty_follow[heads[0]] |= 1 << cg.eof
+        users = set()
+        for y in fdirty:
+            users |= used_by[y]
+        for h in users:
+            for rule_idx in rules_of[h]:
+                rest = 0
+                rest_nullable = True
+                for s in reversed(bodies[rule_idx]):
+                    if s < n_terms:
+                        rest = 1 << s
+                        rest_nullable = False
+                        continue
+                    if s in fdirty:
+                        dirty_follow[s] |= rest
+                        if rest_nullable and s != h:
+                            if h in fdirty:
+                                follow_incl[s].add(h)
+                            else:
+                                dirty_follow[s] |= follow[h]
+                    if nullable[s]:
+                        rest |= first[s]
+                    else:
+                        rest = first[s]
+                        rest_nullable = False
+        for nt, bits in self.propagate(dirty_follow, follow_incl).items():
+            follow[nt] = bits
+        self.follow_bits = follow
+
+    def prev_bits(self, bits: int) -> int:
+        # a bitset over prev's terminals as one over the terminals here, those that are gone are dropped
+        term_map = self.term_map
+        if term_map is None: return bits
+        res = self.bits_map.get(bits)
+        if res is None:
+            res = 0
+            rest = bits
+            while rest:
+                low = rest & -rest
+                t = term_map[low.bit_length() - 1]
+                if t >= 0: res |= 1 << t
+                rest ^= low
+            self.bits_map[bits] = res
+        return res
 
-        self.first_map[key] = res
+    @staticmethod
+    def propagate(sets: dict[T, int], includes: dict[T, set[T]]) -> dict[T, int]:
+        # sets[a] |= sets[b] for every b reachable from a through includes
+        # DeRemer & Pennello's digraph algorithm, each strongly connected component is solved once
+        done = len(sets) + 1
+        depth = dict.fromkeys(sets, 0)
+        stack = []
+        for root in sets:
+            if depth[root]: continue
+            stack.append(root)
+            depth[root] = len(stack)
+            work = [(root, len(stack), iter(includes[root]))]
+            while work:
+                x, d, it = work[-1]
+                for y in it:
+                    if not depth[y]:
+                        stack.append(y)
+                        depth[y] = len(stack)
+                        work.append((y, len(stack), iter(includes[y])))
+                        break
+                    depth[x] = min(depth[x], depth[y])
+                    sets[x] |= sets[y]
+                else:
+                    work.pop()
+                    # x is the root of its component
+                    if depth[x] == d:
+                        while True:
+                            top = stack.pop()
+                            depth[top] = done
+                            sets[top] = sets[x]
+                            if top == x: break
+                    if work:
+                        parent = work[-1][0]
+                        depth[parent] = min(depth[parent], depth[x])
+                        sets[parent] |= sets[x]
+        return sets
+
+    def bits_to_set(self, bits: int) -> set[str]:
+        terms = self.term_list
+        res = set()
+        while bits:
+            low = bits & -bits
+            res.add(terms[low.bit_length() - 1])
+            bits ^= low
         return res
 
-    def follow(self, nt: str, visited: set[int] | None = None) -> set[str]:
-        if visited is None: visited = set()
+    def first_of(self, syms: Iterable[int]) -> tuple[int, bool]:
+        # (FIRST bitset, whether syms is nullable)
+        first_bits = self.first_bits
+        nullable = self.nullable
+        bits = 0
+        for s in syms:
+            bits |= first_bits[s]
+            if not nullable[s]:
+                return bits, False
+        return bits, True
 
-        key = nt
-        if key in self.follow_map: return self.follow_map[key]
+    def first(self, syms: list[str]) -> set[str]:
+        key = tuple(syms)
+        if key in self.first_map: return self.first_map[key]
 
-        res = set()
-        if nt == self.g.starting_symbol():
-            res.add('$')
-
-        for rule_idx, rule in enumerate(self.g.rules):
-            if rule_idx in visited: continue
-            if nt not in rule.body: continue
-
-            for i in range(len(rule.body)):
-                if rule.body[i] != nt: continue
-                # not the last symbol
-                if i != len(rule.body) - 1:
-                    first_rest = self.first(rule.body[i + 1:])
-                    res.update(first_rest - {''})
-                    has_empty = '' in first_rest
-                else:
-                    has_empty = True
+        ids = self.cg.ids
+        bits, has_empty = self.first_of([ids[s] for s in syms if s])
+        res = self.bits_to_set(bits)
+        if has_empty: res.add('')
 
-                if has_empty and rule.name != nt:
-                    res.update(self.follow(rule.name, visited.union({rule_idx})))
+        self.first_map[key] = res
+        return res
 
-        self.follow_map[key] = res
+    def follow(self, nt: str) -> set[str]:
+        if nt in self.follow_map: return self.follow_map[nt]
+        res = self.bits_to_set(self.follow_bits[self.cg.ids[nt]])
+        self.follow_map[nt] = res
         return res
 
 class PredParser(FirstFollow):
-    table: dict[tuple[str, str], Rule]
-
-    def __init__(self, g: Grammar):
-        super().__init__(g)
-        self.table = {}
+    # non terminal (in g.non_terminals order) -> terminal id -> rule index, -1 if empty
+    pred_rows: list[list[int]]
+
+    def __init__(self, g: Grammar, stats: 'Stats | None' = None, prev: 'PredParser | None' = None):
+        super().__init__(g, stats, prev)
+        self.pred_rows = []
+
+    @classmethod
+    def from_rows(cls, g: Grammar, pred_rows: list[list[int]]) -> 'PredParser':
+        # ready to parse() with rows built elsewhere (see impl/tables.py), FIRST/FOLLOW are not computed
+        parser = cls.without_sets(g)
+        parser.pred_rows = pred_rows
+        return parser
+
+    @cached_property
+    def table(self) -> dict[tuple[str, str], Rule]:
+        # (non terminal, terminal) -> rule, a view of pred_rows for display, read once the table is built
+        rules = self.g.rules
+        return {
+            (nt, t): rules[rule_idx]
+            for nt, row in zip(self.g.non_terminals, self.pred_rows)
+            for t, rule_idx in zip(self.term_list, row) if rule_idx >= 0
+        }
 
     def build_table(self):
-        for rule in self.g.rules:
-            f = self.first(rule.body)
-            for s in f - {''}:
-                if (rule.name, s) in self.table:
-                    raise GrammarError('Grammar is ambiguous')
-                self.table[(rule.name, s)] = rule
-            if '' in f:
-                for s in self.follow(rule.name):
-                    if (rule.name, s) in self.table:
-                        raise GrammarError('Grammar is ambiguous')
-                    self.table[(rule.name, s)] = rule
-
-    def parse(self, tokens: list[str]) -> list[Rule]:
-        out_rules = []
-
-        tokens = [*tokens, '$']
-        token_idx = 0
-        stack = ['$', self.g.starting_symbol()]
-        while stack[-1] != '$':
+        cg = self.cg
+        n_terms = cg.n_terms
+        if isinstance(self.prev, PredParser):
+            rules = self.patch_table(self.prev)
+        else:
+            rules = range(len(cg.bodies))
+            self.pred_rows = [[-1] * n_terms for _ in range(len(cg.symbols) - n_terms)]
+        rows = self.pred_rows
+        filled = 0
+        for k, rule_idx in enumerate(rules):
+            if self.progress is not None and k % 32 == 0:
+                self.progress('table', filled)
+            head = cg.heads[rule_idx]
+            row = rows[head - n_terms]
+            bits, nullable = self.first_of(cg.bodies[rule_idx])
+            if nullable:
+                # FIRST(body) and FOLLOW(head) would both pick this rule, that is already a conflict
+                if bits & self.follow_bits[head]:
+                    raise GrammarError(f'Grammar is ambiguous (FIRST/FOLLOW conflict on {self.g.rules[rule_idx].where()})')
+                bits |= self.follow_bits[head]
+            while bits:
+                low = bits & -bits
+                t = low.bit_length() - 1
+                bits ^= low
+                if row[t] >= 0:
+                    rules = self.g.rules
+                    raise GrammarError(f'Grammar is ambiguous ("{cg.symbols[t]}" predicts {rules[row[t]].where()} and {rules[rule_idx].where()})')
+                row[t] = rule_idx
+                filled += 1
+
+    def patch_table(self, prev: 'PredParser') -> list[int]:
+        # takes over prev's rows and clears those whose FIRST/FOLLOW inputs may have changed,
+        # returns the rules that fill them back in
+        # FOLLOW only matters for non terminals with an empty derivation
+        cg = self.cg
+        n_terms = cg.n_terms
+        redo = self.dirty_first | {nt for nt in self.dirty_follow if self.nullable[nt]}
+        ids = {id(rule): i for i, rule in enumerate(self.g.rules)}
+        # prev rule index -> index here, kept rows only hold unchanged rules
+        remap = [ids.get(id(rule), -1) for rule in prev.g.rules]
+        same_ids = all(new == old for old, new in enumerate(remap) if new >= 0)
+        # terminal id here -> column in prev's rows, a new terminal has no cells in a kept row
+        cols = None if self.term_map is None else self.prev_ids[:n_terms]
+        old_rows = prev.pred_rows
+        prev.pred_rows = []
+        rows = []
+        for nt in range(n_terms, len(cg.symbols)):
+            p = self.prev_ids[nt]
+            if p < 0 or nt in redo:
+                rows.append([-1] * n_terms)
+                continue
+            row = old_rows[p - prev.cg.n_terms]
+            if cols is not None:
+                row = [row[c] if c >= 0 else -1 for c in cols]
+            if not same_ids:
+                row[:] = [remap[r] if r >= 0 else -1 for r in row]
+            rows.append(row)
+        self.pred_rows = rows
+        return [rule_idx for nt in range(n_terms, len(cg.symbols)) if nt in redo for rule_idx in cg.rules_of[nt]]
+
+    def parse(self, tokens: Iterable[str], builder: 'TreeBuilder | None' = None) -> list[Rule]:
+        return list(self.parse_iter(tokens, builder))
+
+    def parse_iter(self, tokens: Iterable[str], builder: 'TreeBuilder | None' = None) -> Iterator[Rule]:
+        # yields each rule as it is applied (a leftmost derivation), reading tokens only as needed,
+        # e.g. from Lexer.kinds; memory grows with the stack depth, not the input
+        # a ParserError comes out of the iteration, after the rules applied before it
+        # with a builder the tree is built along (see impl/tree.py)
+        cg = self.cg
+        rules = self.g.rules
+        bodies = cg.bodies
+        n_terms = cg.n_terms
+        rows = self.pred_rows
+        term_ids = self.term_ids
+
+        tokens = chain(tokens, ('$',))
+        a = next(tokens)
+        t = term_ids.get(a, -1)
+        pos = 0
+        stack = [cg.eof, cg.heads[0]]
+        # tree node of each stack entry
+        nodes = None if builder is None else [-1, builder.root(cg.heads[0])]
+        while stack[-1] != cg.eof:
             top = stack[-1]
-            a = tokens[token_idx]
-            if top == a:
-                token_idx += 1
+            if top == t:
                 stack.pop()
-            elif self.g.is_terminal(top):
-                raise ParserError(f'wanted \"{top}\", got \"{a}\"')
-            elif (top, a) not in self.table:
-                raise ParserError(f'got \"{a}\" while parsing \"{top}\"')
+                if nodes is not None: builder.token(nodes.pop(), pos)
+                a = next(tokens, '$')
+                t = term_ids.get(a, -1)
+                pos += 1
+            elif top < n_terms:
+                raise ParserError(f'wanted \"{cg.symbols[top]}\", got \"{a}\"')
+            elif t < 0 or rows[top - n_terms][t] < 0:
+                raise ParserError(f'got \"{a}\" while parsing \"{cg.symbols[top]}\"')
             else:
-                rule = self.table[(top, a)]
-                out_rules.append(rule)
+                rule_idx = rows[top - n_terms][t]
                 stack.pop()
-                for Y in reversed(rule.body):
-                    stack.append(Y)
-
-        return out_rules
-
-@dataclass(order=True)
-class RuleItem:
-    rule: Rule
+                stack.extend(reversed(bodies[rule_idx]))
+                if nodes is not None: nodes.extend(reversed(builder.expand(nodes.pop(), rule_idx, pos)))
+                yield rules[rule_idx]
+        # the start symbol is done, what is left of the input is not part of it
+        if t != cg.eof:
+            raise ParserError(f'got \"{a}\" after the end of \"{cg.symbols[cg.heads[0]]}\"')
+
+# dot position `idx` inside rule number `rule_idx`
+class RuleItem(NamedTuple):
+    rule_idx: int
     idx: int = 0
 
     # symbol right after the dot
-    def symbol_after(self) -> str | None:
-        if self.idx == len(self.rule.body): return None
-        return self.rule.body[self.idx]
+    def symbol_after(self, g: Grammar) -> str | None:
+        body = g.rules[self.rule_idx].body
+        if self.idx == len(body): return None
+        return body[self.idx]
 
     # symbol right before the dot
-    def symbol_before(self) -> str | None:
+    def symbol_before(self, g: Grammar) -> str | None:
         if self.idx == 0: return None
-        return self.rule.body[self.idx - 1]
+        return g.rules[self.rule_idx].body[self.idx - 1]
 
-    def __str__(self) -> str:
-        extra = ' ' if self.idx < len(self.rule.body) else ''
-        return f'{self.rule.name} -> {" ".join(self.rule.body[:self.idx])}{extra}.{" ".join(self.rule.body[self.idx:])}'
+    def to_str(self, g: Grammar) -> str:
+        rule = g.rules[self.rule_idx]
+        extra = ' ' if self.idx < len(rule.body) else ''
+        return f'{rule.name} -> {" ".join(rule.body[:self.idx])}{extra}.{" ".join(rule.body[self.idx:])}'
 
 @dataclass
 class LRShift:
@@ -246,13 +783,15 @@ type LRAction = LRShift | LRReduce | LRAccept
 
 @dataclass
 class LRState:
+    # items that identify the state, used as its key
+    kernel: frozenset[RuleItem]
+    # kernel + closure, sorted
     items: list[RuleItem]
+    # LALR(1)/LR(1): item -> bitset of lookahead terminals
+    lookaheads: dict[RuleItem, int] | None = None
 
-    def normalize(self):
-        self.items.sort()
-
-    def __str__(self) -> str:
-        return 'LRState:\n  ' + '\n  '.join(map(str, self.items))
+    def to_str(self, g: Grammar) -> str:
+        return 'LRState:\n  ' + '\n  '.join(item.to_str(g) for item in self.items)
 
 def extend_grammar(g: Grammar) -> Grammar:
     s = g.starting_symbol()
@@ -268,100 +807,578 @@ def extend_grammar(g: Grammar) -> Grammar:
     g.rules.insert(0, new_rule)
     g.non_terminals.insert(0, new)
     g.rule_map[new] = [new_rule]
+    g.cg = None
     return g
 
-class SLRParser(FirstFollow):
-    action_table: dict[tuple[int, str], LRAction]
-    goto_table: dict[tuple[int, str], int]
+class StateReuse:
+    # LR(0) states of prev, the parser of the grammar before an edit, seen from the edited grammar:
+    # a state whose items all come from unchanged rules is still a state, only renumbered
+    def __init__(self, parser: 'LRParser', prev: 'LRParser'):
+        self.prev = prev
+        ids = {id(rule): i for i, rule in enumerate(parser.g.rules)}
+        # prev rule index -> index here, -1 if the rule is gone
+        self.remap = [ids.get(id(rule), -1) for rule in prev.g.rules]
+        self.back = [-1] * len(parser.g.rules)
+        for old, new in enumerate(self.remap):
+            if new >= 0: self.back[new] = old
+        # the rules that are left kept their indices, kernels and items can be shared as they are
+        self.same_ids = all(new == old for old, new in enumerate(self.remap) if new >= 0)
+        # or at least their order, then remapped items are still sorted
+        kept = [new for new in self.remap if new >= 0]
+        self.same_order = kept == sorted(kept)
+        # prev's item -> the item here, for the rules that are left
+        self.item_map = {} if self.same_ids else {
+            RuleItem(old, k): RuleItem(new, k)
+            for old, new in enumerate(self.remap) if new >= 0
+            for k in range(len(prev.cg.bodies[old]) + 1)
+        }
+        # prev symbol id -> id here, the symbols of a reusable state's gotos are all still there
+        self.sym_map = [parser.cg.ids.get(s, -1) for s in prev.cg.symbols]
+        self.same_syms = prev.cg.symbols == parser.cg.symbols
+        # prev's symbols kept their relative order, so its gotos are already sorted
+        self.sym_order = parser.sym_order
+        kept = sorted((s for s, new in enumerate(self.sym_map) if new >= 0), key=prev.sym_order.__getitem__)
+        ranks = [parser.sym_order[self.sym_map[s]] for s in kept]
+        self.same_sym_order = ranks == sorted(ranks)
+
+    def find(self, kernel: frozenset[RuleItem]) -> int | None:
+        if self.same_ids:
+            return self.prev.state_index.get(kernel)
+        old = []
+        for r, k in kernel:
+            if self.back[r] < 0: return None
+            old.append(RuleItem(self.back[r], k))
+        return self.prev.state_index.get(frozenset(old))
+
+    def state(self, p: int, kernel: frozenset[RuleItem]) -> LRState | None:
+        # prev's state p as a state here, None if one of its rules changed
+        remap = self.remap
+        items = self.prev.states[p].items
+        if self.same_ids:
+            if -1 in remap:
+                for r, _ in items:
+                    if remap[r] < 0: return None
+            return LRState(kernel, items)
+        new = list(map(self.item_map.get, items))
+        if None in new: return None
+        if not self.same_order: new.sort()
+        return LRState(kernel, new)
+
+    def kernel(self, q: int) -> frozenset[RuleItem]:
+        kernel = self.prev.states[q].kernel
+        if self.same_ids: return kernel
+        return frozenset(map(self.item_map.__getitem__, kernel))
+
+    def gotos(self, p: int) -> list[tuple[int, int]]:
+        out = self.prev.state_out[p]
+        if self.same_syms: return out
+        sym_map = self.sym_map
+        out = [(sym_map[sym], q) for sym, q in out]
+        if not self.same_sym_order:
+            out.sort(key=lambda x: self.sym_order[x[0]])
+        return out
+
+class LRParser(FirstFollow):
+    # shared LR machinery, subclasses decide the lookaheads of each reduction
     states: list[LRState]
-    state_trans: dict[tuple[int, str], int]
-
-    def __init__(self, g: Grammar):
-        super().__init__(extend_grammar(g))
-        self.action_table = {}
-        self.goto_table = {}
+    # kernel -> index in states (LR(1) also keys on the lookaheads)
+    state_index: dict[frozenset, int]
+    # state -> its (symbol id, target) transitions, in sym_order
+    state_out: list[list[tuple[int, int]]]
+    # action cells: 0 is an error, j + 1 shifts to state j, -(r + 1) reduces rule r,
+    # reducing rule 0 (S' -> S) means accept; goto cells: target state or -1, by non terminal
+    action_rows: list[list[int]]
+    goto_rows: list[list[int]]
+    # with prev: how its states map here, and state -> the state of prev it was taken from,
+    # build_table patches that state's rows
+    reuse: StateReuse | None = None
+    from_prev: dict[int, int]
+    # state -> its complete items but S' -> S., the reductions of its row
+    reductions: list[list[RuleItem]]
+
+    def __init__(self, g: Grammar, stats: 'Stats | None' = None, prev: 'LRParser | None' = None):
+        super().__init__(extend_grammar(g), stats, prev)
         self.states = []
-        self.state_trans = {}
-
-    def closure(self, items: list[RuleItem]) -> LRState:
-        state = LRState(items)
-        start_i = 0
-        while True:
-            prev_size = len(state.items)
-            for i in range(start_i, len(state.items)):
-                sym = state.items[i].symbol_after()
-                if sym is not None and self.g.is_non_terminal(sym):
-                    items = [RuleItem(rule) for rule in self.g.rule_map[sym]]
-                    for item in items:
-                        if item not in state.items:
-                            state.items.append(item)
-
-            # were there any new items
-            if prev_size == len(state.items):
-                break
-            # skip over ones we've already checked
-            start_i = prev_size
-        state.normalize()
-        return state
-
-    def goto(self, state: LRState, sym: str) -> LRState:
+        self.state_index = {}
+        self.state_out = []
+        cg = self.cg
+        n_nts = len(cg.symbols) - cg.n_terms
+        # symbol id -> order in which goto is taken for each state, non terminals first
+        self.sym_order = [n_nts + t for t in range(cg.n_terms)] + list(range(n_nts))
+        # non terminal id -> X -> .a items reachable from a dot right before it
+        self.nt_closure: dict[int, list[RuleItem]] = {}
+        # item -> (FIRST bitset, nullable) of what comes after the symbol after the dot
+        self.suffix_first: dict[RuleItem, tuple[int, bool]] = {}
+        self.action_rows = []
+        self.goto_rows = []
+        self.from_prev = {}
+        self.reductions = []
+
+    def closure_of(self, nt: int) -> list[RuleItem]:
+        # every X -> .a item reachable from a dot right before nt
+        if nt in self.nt_closure: return self.nt_closure[nt]
+        cg = self.cg
         items = []
-        for prev in state.items:
-            if prev.symbol_after() == sym:
-                items.append(RuleItem(prev.rule, prev.idx + 1))
-        return self.closure(items)
+        seen = {nt}
+        queue = [nt]
+        for x in queue:
+            for rule_idx in cg.rules_of[x]:
+                body = cg.bodies[rule_idx]
+                items.append(RuleItem(rule_idx))
+                if body and body[0] >= cg.n_terms and body[0] not in seen:
+                    seen.add(body[0])
+                    queue.append(body[0])
+        self.nt_closure[nt] = items
+        return items
+
+    def closure(self, kernel: frozenset[RuleItem]) -> LRState:
+        bodies = self.cg.bodies
+        n_terms = self.cg.n_terms
+        items = set(kernel)
+        seen = set()
+        for rule_idx, k in kernel:
+            body = bodies[rule_idx]
+            if k < len(body):
+                sym = body[k]
+                if sym >= n_terms and sym not in seen:
+                    seen.add(sym)
+                    items.update(self.closure_of(sym))
+        return LRState(kernel, sorted(items))
+
+    def goto_kernels(self, state: LRState) -> list[tuple[int, frozenset[RuleItem]]]:
+        # all non empty gotos from state, grouped in a single pass
+        bodies = self.cg.bodies
+        groups: dict[int, list[RuleItem]] = {}
+        for rule_idx, k in state.items:
+            body = bodies[rule_idx]
+            if k < len(body):
+                groups.setdefault(body[k], []).append(RuleItem(rule_idx, k + 1))
+        return [(sym, frozenset(groups[sym])) for sym in sorted(groups, key=self.sym_order.__getitem__)]
+
+    def goto(self, state: LRState, sym: int) -> LRState:
+        bodies = self.cg.bodies
+        kernel = frozenset(
+            RuleItem(rule_idx, k + 1) for rule_idx, k in state.items
+            if k < len(bodies[rule_idx]) and bodies[rule_idx][k] == sym
+        )
+        return self.closure(kernel)
 
     def build_states(self):
         states = self.states
-        states.append(self.closure([RuleItem(self.g.rules[0])]))
-
-        start_i = 0
-        while True:
-            prev_size = len(states)
-            for i in range(start_i, len(states)):
-                for sym in [*self.g.non_terminals, *self.g.terminals]:
-                    if sym == self.g.starting_symbol(): continue
-                    new_state = self.goto(states[i], sym)
-                    # ignore empty states
-                    if not new_state.items: continue
-                    try:
-                        j = states.index(new_state)
-                    except ValueError:
-                        j = None
-                    # new_state isn't in states
-                    if j is None:
-                        j = len(states)
-                        states.append(new_state)
-                    self.state_trans[(i, sym)] = j
-
-            if prev_size == len(states):
-                break
-            start_i = prev_size
+        reuse = self.reuse = StateReuse(self, self.prev) if type(self.prev) is type(self) else None
+        # state here <-> the state of prev it was taken from
+        from_prev = self.from_prev
+        to_new = [-1] * len(self.prev.states) if reuse is not None else []
+
+        def add(kernel: frozenset[RuleItem], p: int | None = None) -> int:
+            j = len(states)
+            self.state_index[kernel] = j
+            state = None
+            if reuse is not None:
+                if p is None: p = reuse.find(kernel)
+                if p is not None: state = reuse.state(p, kernel)
+            if state is None:
+                state = self.closure(kernel)
+            else:
+                from_prev[j] = p
+                to_new[p] = j
+            states.append(state)
+            return j
+
+        def target(kernel: frozenset[RuleItem], p: int | None = None) -> int:
+            j = self.state_index.get(kernel)
+            # new state
+            return add(kernel, p) if j is None else j
+
+        add(frozenset([RuleItem(0)]))
+        i = 0
+        while i < len(states):
+            p = from_prev.get(i)
+            if p is None:
+                out = [(sym, target(kernel)) for sym, kernel in self.goto_kernels(states[i])]
+            else:
+                out = [(sym, to_new[q] if to_new[q] >= 0 else target(reuse.kernel(q), q)) for sym, q in reuse.gotos(p)]
+            self.state_out.append(out)
+            i += 1
+            if self.progress is not None and i % 32 == 0:
+                self.progress('states', len(states))
 
     def build_table(self):
-        for i, state in enumerate(self.states):
-            # S' -> S.
-            if RuleItem(self.g.rules[0], 1) in state.items:
-                self.action_table[(i, '$')] = LRAccept()
-
-            for s in self.g.terminals:
-                j = self.state_trans.get((i, s))
-                if j is not None:
-                    self.action_table[(i, s)] = LRShift(j)
-            for item in state.items:
-                if item.symbol_after() is None and item.rule.name != self.g.starting_symbol():
-                    follow = self.follow(item.rule.name)
-                    for c in follow:
-                        if (i, c) in self.action_table:
-                            kind = 'R/R' if isinstance(self.action_table[(i, c)], LRReduce) else 'S/R'
-                            raise GrammarError(f'Grammar is ambiguous ({kind} conflict)')
-                        self.action_table[(i, c)] = LRReduce(self.g.rules.index(item.rule))
-
-            for n in self.g.non_terminals:
-                if n == self.g.starting_symbol(): continue
-                j = self.state_trans.get((i, n))
-                if j is not None:
-                    self.goto_table[(i, n)] = j
+        prev = self.prev if self.from_prev else None
+        if prev is not None:
+            # symbol id here -> its column in prev's rows, None when the columns are the same
+            n_terms = self.cg.n_terms
+            cols = None if self.term_map is None else self.prev_ids[:n_terms]
+            nt_cols = None
+            if prev.cg.symbols[prev.cg.n_terms:] != self.cg.symbols[n_terms:]:
+                nt_cols = [c - prev.cg.n_terms if c >= 0 else -1 for c in self.prev_ids[n_terms:]]
+        self.action_rows = []
+        self.goto_rows = []
+        self.reductions = []
+        filled = 0
+        for i in range(len(self.states)):
+            if self.progress is not None and i % 32 == 0:
+                self.progress('table', filled)
+            p = self.from_prev.get(i) if prev is not None else None
+            rows = self.table_row(i) if p is None else self.patch_row(i, p, prev, cols, nt_cols)
+            self.action_rows.append(rows[0])
+            self.goto_rows.append(rows[1])
+            filled += len(self.state_out[i])
+
+        self.index_rules()
+
+    def table_row(self, i: int) -> tuple[list[int], list[int]]:
+        # the action and goto rows of state i
+        cg = self.cg
+        n_terms = cg.n_terms
+        bodies = cg.bodies
+        state = self.states[i]
+        actions = [0] * n_terms
+        gotos = [-1] * (len(cg.symbols) - n_terms)
+        # S' -> S.
+        if RuleItem(0, 1) in state.kernel:
+            actions[cg.eof] = -1
+
+        # the start symbol never comes after a dot, so it has no gotos
+        for sym, j in self.state_out[i]:
+            if sym >= n_terms:
+                gotos[sym - n_terms] = j
+            else:
+                actions[sym] = j + 1
+        reductions = []
+        for item in state.items:
+            rule_idx, k = item
+            if k < len(bodies[rule_idx]) or rule_idx == 0: continue
+            reductions.append(item)
+            bits = self.lookaheads(i, item)
+            while bits:
+                low = bits & -bits
+                t = low.bit_length() - 1
+                bits ^= low
+                if actions[t]:
+                    self.conflict(i, t, actions[t], -(rule_idx + 1))
+                    continue
+                actions[t] = -(rule_idx + 1)
+        self.reductions.append(reductions)
+        return actions, gotos
+
+    def patch_row(self, i: int, p: int, prev: 'LRParser', cols: list[int] | None,
+                  nt_cols: list[int] | None) -> tuple[list[int], list[int]]:
+        # the rows of state i from those of prev's state p, which has the same items: only the
+        # columns, shift/goto targets and the reductions whose rule or lookaheads moved are redone
+        # prev's rows are taken over, not copied
+        cg = self.cg
+        n_terms = cg.n_terms
+        actions = prev.action_rows[p]
+        gotos = prev.goto_rows[p]
+        # the state's symbols are all still there, a new one has no cells yet
+        if cols is not None:
+            actions = [actions[c] if c >= 0 else 0 for c in cols]
+        if nt_cols is not None:
+            gotos = [gotos[c] if c >= 0 else -1 for c in nt_cols]
+        # the targets are always written again: prev numbered its states its own way, and a
+        # reordered grammar can give the same out list with every target moved
+        for sym, j in self.state_out[i]:
+            if sym >= n_terms:
+                gotos[sym - n_terms] = j
+            else:
+                actions[sym] = j + 1
+
+        reuse = self.reuse
+        reductions = prev.reductions[p]
+        if not reuse.same_ids:
+            reductions = [reuse.item_map[old] for old in reductions]
+        self.reductions.append(reductions)
+        redo = []
+        for item, old in zip(reductions, prev.reductions[p]):
+            if old.rule_idx != item.rule_idx or self.lookaheads_changed(i, item, p, old, prev):
+                bits = self.prev_bits(prev.lookaheads(p, old))
+                while bits:
+                    low = bits & -bits
+                    actions[low.bit_length() - 1] = 0
+                    bits ^= low
+                redo.append(item)
+        for item in redo:
+            code = -(item.rule_idx + 1)
+            bits = self.lookaheads(i, item)
+            while bits:
+                low = bits & -bits
+                t = low.bit_length() - 1
+                bits ^= low
+                if actions[t]:
+                    # the fresh row reports the conflict the same way a full build would
+                    self.reductions.pop()
+                    return self.table_row(i)
+                actions[t] = code
+        return actions, gotos
+
+    def lookaheads_changed(self, state: int, item: RuleItem, p: int, old: RuleItem, prev: 'LRParser') -> bool:
+        # whether item reduces on other terminals in state than old did in prev's state p
+        return self.lookaheads(state, item) != self.prev_bits(prev.lookaheads(p, old))
+
+    def conflict(self, state: int, t: int, code: int, reduce_code: int):
+        # reduce_code wants the cell (state, t) that already holds code, the first action found
+        # accept counts as a shift
+        kind = 'R/R' if code < -1 else 'S/R'
+        rule = self.g.rules[-reduce_code - 1]
+        raise GrammarError(f'Grammar is ambiguous ({kind} conflict on "{self.cg.symbols[t]}" reducing {rule.where()})')
+
+    def index_rules(self):
+        # what parse() needs of each rule: its head (non terminal index) and length
+        n_terms = self.cg.n_terms
+        self.rule_heads = [head - n_terms for head in self.cg.heads]
+        self.rule_lens = [len(body) for body in self.cg.bodies]
+
+    def lookaheads(self, state: int, item: RuleItem) -> int:
+        # bitset of terminals on which the complete item is reduced
+        raise NotImplementedError
+
+    def closure_la(self, kernel: dict[RuleItem, int]) -> dict[RuleItem, int]:
+        # LR(1) closure: every item of the closure -> its lookahead bitset
+        # all X -> .a items share the lookaheads of X, so those are solved per non terminal
+        cg = self.cg
+        bodies = cg.bodies
+        n_terms = cg.n_terms
+        suffix_first = self.suffix_first
+        nt_la: dict[int, int] = {}
+        includes: dict[int, set[int]] = {}
+        queue = []
+
+        def expand(item: RuleItem, la: int, parent: int | None):
+            rule_idx, k = item
+            body = bodies[rule_idx]
+            if k >= len(body) or body[k] < n_terms: return
+            sym = body[k]
+            if item not in suffix_first:
+                suffix_first[item] = self.first_of(body[k + 1:])
+            bits, nullable = suffix_first[item]
+            if sym not in nt_la:
+                nt_la[sym] = 0
+                includes[sym] = set()
+                queue.append(sym)
+            nt_la[sym] |= bits
+            if nullable:
+                if parent is None:
+                    nt_la[sym] |= la
+                elif parent != sym:
+                    includes[sym].add(parent)
+
+        for item, la in kernel.items():
+            expand(item, la, None)
+        for nt in queue:
+            for rule_idx in cg.rules_of[nt]:
+                expand(RuleItem(rule_idx), 0, nt)
+        self.propagate(nt_la, includes)
+
+        la = dict(kernel)
+        for nt in queue:
+            for rule_idx in cg.rules_of[nt]:
+                la[RuleItem(rule_idx)] = nt_la[nt]
+        return la
+
+    @classmethod
+    def from_rows(cls, g: Grammar, action_rows: list[list[int]], goto_rows: list[list[int]]) -> 'LRParser':
+        # ready to parse() with rows made by build_table (see impl/tables.py)
+        # g must already be extended, states and FIRST/FOLLOW are not computed
+        parser = cls.without_sets(g)
+        parser.states = []
+        parser.state_index = {}
+        parser.state_out = []
+        parser.action_rows = action_rows
+        parser.goto_rows = goto_rows
+        parser.index_rules()
+        return parser
+
+    @cached_property
+    def state_trans(self) -> dict[tuple[int, int], int]:
+        # (state, symbol id) -> target state, a view of state_out, read once the states are built
+        return {(i, sym): j for i, out in enumerate(self.state_out) for sym, j in out}
+
+    @cached_property
+    def action_table(self) -> dict[tuple[int, str], LRAction]:
+        # (state, terminal) -> action, a view of action_rows for display, read once the table is built
+        table = {}
+        for i, row in enumerate(self.action_rows):
+            for t, code in zip(self.term_list, row):
+                if code > 0:
+                    table[(i, t)] = LRShift(code - 1)
+                elif code == -1:
+                    table[(i, t)] = LRAccept()
+                elif code < 0:
+                    table[(i, t)] = LRReduce(-code - 1)
+        return table
+
+    @cached_property
+    def goto_table(self) -> dict[tuple[int, str], int]:
+        # (state, non terminal) -> state, same for goto_rows
+        return {
+            (i, n): j
+            for i, row in enumerate(self.goto_rows)
+            for n, j in zip(self.g.non_terminals, row) if j >= 0
+        }
+
+    def parse(self, tokens: Iterable[str], builder: 'TreeBuilder | None' = None) -> list[Rule]:
+        # returns the reductions made, in order (a rightmost derivation, reversed)
+        return list(self.parse_iter(tokens, builder))
+
+    def parse_iter(self, tokens: Iterable[str], builder: 'TreeBuilder | None' = None) -> Iterator[Rule]:
+        # yields each reduction as it is made, with a builder the tree is built along (see impl/tree.py)
+        rules = self.g.rules
+        term_ids = self.term_ids
+        action_rows = self.action_rows
+        goto_rows = self.goto_rows
+        rule_heads = self.rule_heads
+        rule_lens = self.rule_lens
+
+        stack = [0]
+        for pos, a in enumerate(chain(tokens, ('$',))):
+            t = term_ids.get(a)
+            if t is None:
+                raise ParserError(f'unknown token \"{a}\"')
+            while True:
+                code = action_rows[stack[-1]][t]
+                if code > 0:
+                    stack.append(code - 1)
+                    if builder is not None: builder.shift(t, pos)
+                    break
+                if code == 0:
+                    raise ParserError(f'got \"{a}\", expected one of {self.expected(stack[-1])}')
+                rule_idx = -code - 1
+                if rule_idx == 0:
+                    return
+                n = rule_lens[rule_idx]
+                if n: del stack[-n:]
+                stack.append(goto_rows[stack[-1]][rule_heads[rule_idx]])
+                if builder is not None: builder.reduce(rule_idx, pos)
+                yield rules[rule_idx]
+        raise ParserError('unexpected end of input')
+
+    def expected(self, state: int) -> list[str]:
+        return [t for t, i in self.term_ids.items() if self.action_rows[state][i]]
+
+class SLRParser(LRParser):
+    def lookaheads(self, state: int, item: RuleItem) -> int:
+        return self.follow_bits[self.cg.heads[item.rule_idx]]
+
+    def lookaheads_changed(self, state: int, item: RuleItem, p: int, old: RuleItem, prev: LRParser) -> bool:
+        # FOLLOW is only redone for dirty_follow, the rest is prev's
+        return self.cg.heads[item.rule_idx] in self.dirty_follow and super().lookaheads_changed(state, item, p, old, prev)
+
+class LALRParser(LRParser):
+    # LR(0) states with lookaheads from DeRemer & Pennello's relations:
+    # reads/includes between non terminal transitions, lookback from complete items
+    la_map: dict[tuple[int, int], int]
+
+    def build_states(self):
+        super().build_states()
+        self.build_lookaheads()
+
+    def build_lookaheads(self):
+        cg = self.cg
+        n_terms = cg.n_terms
+        bodies = cg.bodies
+        nullable = self.nullable
+        trans = self.state_trans
+        # body[k:] is all nullable for k >= nullable_from[rule_idx]
+        nullable_from = []
+        for body in bodies:
+            k = len(body)
+            while k > 0 and nullable[body[k - 1]]:
+                k -= 1
+            nullable_from.append(k)
+
+        # transitions (p, A) on a non terminal A
+        direct: dict[tuple[int, int], int] = {}
+        reads: dict[tuple[int, int], set[tuple[int, int]]] = {}
+        includes: dict[tuple[int, int], set[tuple[int, int]]] = {}
+        for (p, sym), r in trans.items():
+            if sym < n_terms: continue
+            bits = 0
+            reads[(p, sym)] = set()
+            includes[(p, sym)] = set()
+            for x, _ in self.state_out[r]:
+                if x < n_terms:
+                    bits |= 1 << x
+                elif nullable[x]:
+                    reads[(p, sym)].add((r, x))
+            if RuleItem(0, 1) in self.states[r].kernel:
+                bits |= 1 << cg.eof
+            direct[(p, sym)] = bits
+
+        lookback: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for (p, nt) in direct:
+            for rule_idx in cg.rules_of[nt]:
+                q = p
+                for k, x in enumerate(bodies[rule_idx]):
+                    if x >= n_terms and k + 1 >= nullable_from[rule_idx]:
+                        includes[(q, x)].add((p, nt))
+                    q = trans[(q, x)]
+                lookback.setdefault((q, rule_idx), []).append((p, nt))
+
+        read_sets = self.propagate(direct, reads)
+        follow_sets = self.propagate(dict(read_sets), includes)
+
+        self.la_map = {}
+        for key, sources in lookback.items():
+            bits = 0
+            for src in sources:
+                bits |= follow_sets[src]
+            self.la_map[key] = bits
+        for q, state in enumerate(self.states):
+            state.lookaheads = {
+                item: self.la_map.get((q, item.rule_idx), 0)
+                for item in state.items if item.idx == len(bodies[item.rule_idx]) and item.rule_idx != 0
+            }
+
+    def lookaheads(self, state: int, item: RuleItem) -> int:
+        return self.la_map.get((state, item.rule_idx), 0)
+
+class LR1Parser(LRParser):
+    # canonical LR(1) collection, states with the same core but different lookaheads are kept apart
+
+    def closure_lr1(self, kernel: dict[RuleItem, int]) -> LRState:
+        la = self.closure_la(kernel)
+        return LRState(frozenset(kernel), sorted(la), la)
+
+    def build_states(self):
+        states = self.states
+        bodies = self.cg.bodies
+        start = {RuleItem(0): 1 << self.cg.eof}
+        states.append(self.closure_lr1(start))
+        self.state_index[frozenset(start.items())] = 0
+
+        i = 0
+        while i < len(states):
+            groups: dict[int, dict[RuleItem, int]] = {}
+            for (rule_idx, k), bits in states[i].lookaheads.items():
+                body = bodies[rule_idx]
+                if k < len(body):
+                    groups.setdefault(body[k], {})[RuleItem(rule_idx, k + 1)] = bits
+            out = []
+            for sym in sorted(groups, key=self.sym_order.__getitem__):
+                kernel = groups[sym]
+                key = frozenset(kernel.items())
+                j = self.state_index.get(key)
+                if j is None:
+                    j = len(states)
+                    states.append(self.closure_lr1(kernel))
+                    self.state_index[key] = j
+                out.append((sym, j))
+            self.state_out.append(out)
+            i += 1
+            if self.progress is not None and i % 32 == 0:
+                self.progress('states', len(states))
+
+    def lookaheads(self, state: int, item: RuleItem) -> int:
+        return self.states[state].lookaheads[item]
+
+# parser kind (as taken on the command line and in table files) -> class
+KINDS: dict[str, type[PredParser] | type[LRParser]] = {
+    'pred': PredParser,
+    'slr': SLRParser,
+    'lalr': LALRParser,
+    'lr1': LR1Parser,
+}
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import BinaryIO
+
+from impl.syntax import KINDS, Grammar, Rule, PredParser, LRParser, parse_bnf
+
+# file layout, every int is little endian:
+#   magic, kind (u8)
+#   terminals, non terminals: u32 count + (u32 length + utf-8) each
+#   rules: u32 count + (u32 head, u32 length, i32 symbol ids) each, terminals come before non terminals
+#   pred: i32 rule index + 1 per (non terminal, terminal or '$'), 0 if empty
+#   lr:   u32 states, then action rows and goto rows as flat i32 arrays
+
+MAGIC = b'CPT\x01'
+
+def main():
+    grammar_path = sys.argv[1]
+    kind = sys.argv[2] if len(sys.argv) > 2 else 'slr'
+    with open(grammar_path) as file:
+        grammar_text = file.read()
+
+    start = time.perf_counter()
+    parser = TableCache().load_or_build(grammar_text, kind)
+    print(f'tables ready in {(time.perf_counter() - start) * 1000:.1f}ms')
+
+    if len(sys.argv) > 3:
+        for r in parser.parse(sys.argv[3].strip().split()):
+            print(r)
+
+def grammar_hash(grammar_text: str, kind: str) -> str:
+    h = hashlib.sha256()
+    h.update(MAGIC)
+    h.update(kind.encode())
+    h.update(b'\0')
+    h.update(grammar_text.encode())
+    return h.hexdigest()
+
+def _ints(values) -> bytes:
+    arr = array('i', values)
+    if sys.byteorder == 'big': arr.byteswap()
+    return arr.tobytes()
+
+def _read_ints(file: BinaryIO, n: int) -> array:
+    arr = array('i')
+    arr.frombytes(file.read(4 * n))
+    if len(arr) != n:
+        raise ValueError('truncated parse table file')
+    if sys.byteorder == 'big': arr.byteswap()
+    return arr
+
+def _read_u32(file: BinaryIO) -> int:
+    return struct.unpack('<I', file.read(4))[0]
+
+def _write_strs(file: BinaryIO, strs: list[str]):
+    file.write(struct.pack('<I', len(strs)))
+    for s in strs:
+        data = s.encode()
+        file.write(struct.pack('<I', len(data)))
+        file.write(data)
+
+def _read_strs(file: BinaryIO) -> list[str]:
+    return [file.read(_read_u32(file)).decode() for _ in range(_read_u32(file))]
+
+def kind_of(parser: PredParser | LRParser) -> str:
+    # the KINDS name of the parser's own class, subclasses such as GLRParser (whose cells can hold
+    # more than one action) have no table file or generated module
+    for kind, cls in KINDS.items():
+        if type(parser) is cls: return kind
+    raise ValueError(f'{type(parser).__name__} tables can not be written, only those of {", ".join(KINDS)}')
+
+def dump_tables(parser: PredParser | LRParser, file: BinaryIO):
+    g = parser.g
+    kind = kind_of(parser)
+    file.write(MAGIC)
+    file.write(struct.pack('<B', list(KINDS).index(kind)))
+    _write_strs(file, g.terminals)
+    _write_strs(file, g.non_terminals)
+
+    sym_ids = {s: i for i, s in enumerate([*g.terminals, *g.non_terminals])}
+    nt_ids = {n: i for i, n in enumerate(g.non_terminals)}
+    file.write(struct.pack('<I', len(g.rules)))
+    for rule in g.rules:
+        file.write(struct.pack('<II', nt_ids[rule.name], len(rule.body)))
+        file.write(_ints(sym_ids[s] for s in rule.body))
+
+    if isinstance(parser, PredParser):
+        file.write(_ints(r + 1 for row in parser.pred_rows for r in row))
+    else:
+        file.write(struct.pack('<I', len(parser.action_rows)))
+        file.write(_ints(code for row in parser.action_rows for code in row))
+        file.write(_ints(j for row in parser.goto_rows for j in row))
+
+def load_tables(file: BinaryIO) -> PredParser | LRParser:
+    if file.read(4) != MAGIC:
+        raise ValueError('not a parse table file')
+    cls = list(KINDS.values())[struct.unpack('<B', file.read(1))[0]]
+    terminals = _read_strs(file)
+    non_terminals = _read_strs(file)
+    symbols = [*terminals, *non_terminals]
+
+    g = Grammar([], non_terminals, terminals, {})
+    for _ in range(_read_u32(file)):
+        head, n = struct.unpack('<II', file.read(8))
+        rule = Rule(non_terminals[head], [symbols[s] for s in _read_ints(file, n)])
+        g.rules.append(rule)
+        g.rule_map.setdefault(rule.name, []).append(rule)
+
+    ext_terminals = [*terminals, '$']
+    if cls is PredParser:
+        w = len(ext_terminals)
+        flat = [r - 1 for r in _read_ints(file, len(non_terminals) * w)]
+        return PredParser.from_rows(g, [flat[i * w:(i + 1) * w] for i in range(len(non_terminals))])
+
+    n_states = _read_u32(file)
+    w = len(ext_terminals)
+    flat = _read_ints(file, n_states * w).tolist()
+    action_rows = [flat[i * w:(i + 1) * w] for i in range(n_states)]
+    w = len(non_terminals)
+    flat = _read_ints(file, n_states * w).tolist()
+    goto_rows = [flat[i * w:(i + 1) * w] for i in range(n_states)]
+    return cls.from_rows(g, action_rows, goto_rows)
+
+def default_cache_dir() -> str:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'compiladores')
+
+class TableCache:
+    # built tables on disk, keyed by the hash of the grammar text
+    path: str
+
+    def __init__(self, path: str | None = None):
+        self.path = path or default_cache_dir()
+
+    def file_for(self, grammar_text: str, kind: str) -> str:
+        return os.path.join(self.path, grammar_hash(grammar_text, kind) + '.tbl')
+
+    def load_or_build(self, grammar_text: str, kind: str = 'slr') -> PredParser | LRParser:
+        file_path = self.file_for(grammar_text, kind)
+        cls = KINDS[kind]
+        try:
+            with open(file_path, 'rb') as file:
+                parser = load_tables(file)
+            # a file of another kind under this name is rebuilt like a broken one
+            if type(parser) is cls: return parser
+        except (OSError, ValueError, IndexError, struct.error):
+            pass
+
+        parser = cls(parse_bnf(grammar_text))
+        if isinstance(parser, LRParser):
+            parser.build_states()
+        parser.build_table()
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            dump_tables(parser, file)
+        os.replace(tmp_path, file_path)
+        return parser
+
+if __name__ == '__main__':
+    main()
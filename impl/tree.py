@@ -0,0 +1,229 @@
+import sys
+from array import array
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple
+
+if TYPE_CHECKING:
+    from impl.syntax import CompiledGrammar, PredParser, LRParser
+
+# parse trees stored as parallel int arrays, one slot per node and no object per node,
+# built while parsing by handing a TreeBuilder to parse_iter (see parse_tree)
+
+def main():
+    # python -m impl.tree grammar kind "tokens ...": prints the tree
+    from impl.syntax import KINDS
+    from impl.syntax import LRParser, load_bnf
+    with open(sys.argv[1]) as file:
+        parser = KINDS[sys.argv[2]](load_bnf(file))
+    if isinstance(parser, LRParser):
+        parser.build_states()
+    parser.build_table()
+    tokens = sys.argv[3].split()
+    print(parse_tree(parser, tokens).to_str(tokens))
+
+class ParseTree:
+    # node i: its symbol id, the rule that expanded it (-1 for tokens), its first child and
+    # next sibling (-1 if none) and the tokens it covers, [start, end)
+    cg: 'CompiledGrammar'
+    sym: array
+    rule: array
+    first_child: array
+    next_sibling: array
+    start: array
+    end: array
+    root: int
+
+    def __init__(self, cg: 'CompiledGrammar', sym: array, rule: array, first_child: array, next_sibling: array, start: array, end: array, root: int):
+        self.cg = cg
+        self.sym = sym
+        self.rule = rule
+        self.first_child = first_child
+        self.next_sibling = next_sibling
+        self.start = start
+        self.end = end
+        self.root = root
+
+    def __len__(self) -> int:
+        return len(self.sym)
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.sym, self.rule, self.first_child, self.next_sibling, self.start, self.end))
+
+    def node(self, i: int | None = None) -> 'Node':
+        return Node(self, self.root if i is None else i)
+
+    def symbol(self, i: int) -> str:
+        return self.cg.symbols[self.sym[i]]
+
+    def is_token(self, i: int) -> bool:
+        return self.rule[i] < 0 and self.sym[i] < self.cg.n_terms
+
+    def children(self, i: int) -> Iterator[int]:
+        next_sibling = self.next_sibling
+        child = self.first_child[i]
+        while child >= 0:
+            yield child
+            child = next_sibling[child]
+
+    def walk(self, i: int | None = None) -> Iterator[tuple[int, bool]]:
+        # (node, True) before its children and (node, False) after them, without recursion
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        stack = [self.root if i is None else i]
+        while stack:
+            node = stack[-1]
+            if node >= 0:
+                yield node, True
+                # ~node marks the exit, its children go on top of it
+                stack[-1] = ~node
+                child = first_child[node]
+                mark = len(stack)
+                while child >= 0:
+                    stack.append(child)
+                    child = next_sibling[child]
+                stack[mark:] = reversed(stack[mark:])
+            else:
+                stack.pop()
+                yield ~node, False
+
+    def visit(self, visitor: 'Visitor', i: int | None = None):
+        for node, entering in self.walk(i):
+            if entering:
+                visitor.enter(self, node)
+            else:
+                visitor.exit(self, node)
+
+    def to_str(self, tokens: list[str] | None = None) -> str:
+        # one node per line, indented by depth, tokens with their text when given
+        lines = []
+        depth = 0
+        for node, entering in self.walk():
+            if not entering:
+                depth -= 1
+                continue
+            text = self.symbol(node)
+            if tokens is not None and self.is_token(node):
+                text += f' {tokens[self.start[node]]!r}'
+            lines.append('  ' * depth + text)
+            depth += 1
+        return '\n'.join(lines)
+
+    def __str__(self) -> str:
+        return self.to_str()
+
+class Node(NamedTuple):
+    # a view of one node, made on demand
+    tree: ParseTree
+    index: int
+
+    @property
+    def symbol(self) -> str:
+        return self.tree.symbol(self.index)
+
+    @property
+    def rule(self) -> int:
+        return self.tree.rule[self.index]
+
+    @property
+    def span(self) -> tuple[int, int]:
+        return self.tree.start[self.index], self.tree.end[self.index]
+
+    @property
+    def children(self) -> Iterator['Node']:
+        return (Node(self.tree, child) for child in self.tree.children(self.index))
+
+class Visitor:
+    # override what is needed, both get the tree and a node index
+    def enter(self, tree: ParseTree, node: int):
+        pass
+
+    def exit(self, tree: ParseTree, node: int):
+        pass
+
+class TreeBuilder:
+    # passed to parse_iter, which calls root/expand/token (PredParser, top down)
+    # or shift/reduce (LRParser, bottom up)
+    def __init__(self, cg: 'CompiledGrammar'):
+        self.cg = cg
+        self.sym = array('i')
+        self.rule = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.start = array('i')
+        self.end = array('i')
+        # bottom up: nodes not reduced yet
+        self.stack: list[int] = []
+        self.top_down = False
+
+    def new(self, sym: int, rule: int, start: int, end: int) -> int:
+        self.sym.append(sym)
+        self.rule.append(rule)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.start.append(start)
+        self.end.append(end)
+        return len(self.sym) - 1
+
+    def root(self, sym: int) -> int:
+        self.top_down = True
+        return self.new(sym, -1, 0, 0)
+
+    def expand(self, node: int, rule_idx: int, pos: int) -> range:
+        # children of node for rule_idx, consecutive ids in body order
+        body = self.cg.bodies[rule_idx]
+        self.rule[node] = rule_idx
+        self.start[node] = self.end[node] = pos
+        first = len(self.sym)
+        for s in body:
+            self.new(s, -1, pos, pos)
+            self.next_sibling[-1] = len(self.sym)
+        if body:
+            self.next_sibling[-1] = -1
+            self.first_child[node] = first
+        return range(first, len(self.sym))
+
+    def token(self, node: int, pos: int):
+        self.start[node] = pos
+        self.end[node] = pos + 1
+
+    def shift(self, t: int, pos: int):
+        self.stack.append(self.new(t, -1, pos, pos + 1))
+
+    def reduce(self, rule_idx: int, pos: int):
+        cg = self.cg
+        stack = self.stack
+        n = len(cg.bodies[rule_idx])
+        if n:
+            first = stack[-n]
+            for k in range(len(stack) - n, len(stack) - 1):
+                self.next_sibling[stack[k]] = stack[k + 1]
+            node = self.new(cg.heads[rule_idx], rule_idx, self.start[first], self.end[stack[-1]])
+            self.first_child[node] = first
+            del stack[-n:]
+        else:
+            node = self.new(cg.heads[rule_idx], rule_idx, pos, pos)
+        stack.append(node)
+
+    def finish(self) -> ParseTree:
+        if not self.top_down:
+            return ParseTree(self.cg, self.sym, self.rule, self.first_child, self.next_sibling, self.start, self.end, self.stack[-1])
+        # top down the spans of inner nodes are only known once their children are done,
+        # children always come after their parent so one backwards pass closes them
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        end = self.end
+        for node in range(len(self.sym) - 1, -1, -1):
+            child = first_child[node]
+            if child < 0: continue
+            while next_sibling[child] >= 0:
+                child = next_sibling[child]
+            end[node] = end[child]
+        return ParseTree(self.cg, self.sym, self.rule, first_child, next_sibling, self.start, end, 0)
+
+def parse_tree(parser: 'PredParser | LRParser', tokens: Iterable[str]) -> ParseTree:
+    builder = TreeBuilder(parser.cg)
+    for _ in parser.parse_iter(tokens, builder):
+        pass
+    return builder.finish()
+
+if __name__ == '__main__':
+    main()
@@ -1,198 +1,363 @@
-from pyscript import document, when, window
-from impl.syntax import PredParser, parse_bnf, Grammar, SLRParser, LRAccept, LRShift, LRReduce, ParserError, GrammarError
+from pyscript import document, when, window, ffi, PyWorker
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
 import html
+import json
 
-EPSILON = 'ϵ'
+# the analysis itself runs in worker.py, this side only renders what it sends back
 
 def log(*args):
     window.console.log(*[x if isinstance(x, str) else repr(x) for x in args])
 
-def fmt_set(terms):
-    l = []
-    for t in sorted(terms):
-        if t == '': t = EPSILON
-        elif t in '{},();': t = f'\'{t}\''
-        l.append(t)
-    return '{' + ', '.join(l) + '}'
-
 def escaped_fmt(fmt: str, *args):
     return fmt.format(*[html.unescape(str(x)) for x in args])
 
-parser: PredParser | None = None
+PROGRESS_NAMES = {
+    'states': 'estados construídos',
+    'table': 'células da tabela preenchidas',
+}
+
+worker = None
+worker_ready = False
+# request waiting for the worker to finish loading
+pending: str | None = None
+running = False
+# last messages, kept to re-render on option changes
+last_rules: list[str] = []
+last_pred_table: dict | None = None
+
+# big results are virtualized, only what is visible (plus OVERSCAN items each side) is in the DOM
+OVERSCAN = 8
+# first guess, the real row height is measured after the first rows are in
+TABLE_ROW_PX = 36
+# state fieldset geometry, must match my-slr-states in style.css
+STATE_ITEM_PX = 24
+STATE_EXTRA_PX = 56
+STATE_GAP_PX = 8
+
+class Virtualized:
+    # keeps the items of `container` that are visible in the scrolling `viewport`, the
+    # `before` and `after` spacers take the height of everything else
+    def __init__(self, viewport, before, container, after, heights: list[float], make_item):
+        self.viewport = viewport
+        self.before = before
+        self.container = container
+        self.after = after
+        self.make_item = make_item
+        self.scheduled = False
+        self.on_scroll_proxy = ffi.create_proxy(self.on_scroll)
+        self.on_frame_proxy = ffi.create_proxy(self.on_frame)
+        viewport.addEventListener('scroll', self.on_scroll_proxy)
+        window.addEventListener('resize', self.on_scroll_proxy)
+        self.set_heights(heights)
+
+    def set_heights(self, heights: list[float]):
+        self.offsets = list(accumulate(heights, initial=0))
+        self.window = None
+        self.render()
+
+    def on_scroll(self, _event):
+        # at most one update per frame however many scroll events come in
+        if not self.scheduled:
+            self.scheduled = True
+            window.requestAnimationFrame(self.on_frame_proxy)
+
+    def on_frame(self, _time):
+        self.scheduled = False
+        self.render()
+
+    def render(self):
+        offsets = self.offsets
+        n = len(offsets) - 1
+        view = self.viewport.getBoundingClientRect()
+        top = view.top - self.before.getBoundingClientRect().top
+        start = max(bisect_right(offsets, top) - 1 - OVERSCAN, 0)
+        # even start, so nth-child striping doesn't flip while scrolling
+        start -= start % 2
+        end = min(bisect_left(offsets, top + view.height) + OVERSCAN, n)
+        if (start, end) == self.window: return
+        self.window = (start, end)
+
+        frag = document.createDocumentFragment()
+        for i in range(start, end):
+            frag.append(self.make_item(i))
+        self.before.style.height = f'{offsets[start]}px'
+        self.after.style.height = f'{offsets[n] - offsets[end]}px'
+        self.container.replaceChildren(frag)
+
+    def destroy(self):
+        self.viewport.removeEventListener('scroll', self.on_scroll_proxy)
+        window.removeEventListener('resize', self.on_scroll_proxy)
+        self.on_scroll_proxy.destroy()
+        self.on_frame_proxy.destroy()
+
+virtual_table: Virtualized | None = None
+virtual_states: Virtualized | None = None
+
+def start_worker():
+    global worker, worker_ready
+    worker_ready = False
+    worker = PyWorker('./worker.py', type='pyodide', config='./pyscript.toml')
+    worker.onmessage = ffi.create_proxy(on_worker_message)
+
+def send_request(req: str):
+    global pending
+    if worker_ready:
+        worker.postMessage(req)
+    else:
+        pending = req
+
+def set_running(active: bool, text: str = 'Analisando...'):
+    global running
+    running = active
+    document.querySelector('my-progress').style.display = '' if active else 'none'
+    document.getElementById('progress-text').textContent = text
 
 @when("click", "#btn-execute")
 def click_handler(_event):
+    global virtual_table, virtual_states
+    if running:
+        cancel()
+
     document.querySelector('my-result').style.display = 'none'
     for n in document.querySelectorAll('.py-error'):
         n.remove()
+    for virtual in (virtual_table, virtual_states):
+        if virtual is not None: virtual.destroy()
+    virtual_table = virtual_states = None
     document.querySelector('my-slr-states').style.display = 'none'
-
-    try:
-        grammar_raw = document.getElementById('ipt-grammar').value
-        try:
-            gm = parse_bnf(grammar_raw)
-        except Exception as e:
-            raise Exception("Error when parsing BNF", str(e))
-
-        if document.getElementById('ipt-algo-preditivo').checked:
-            handle_pred(gm)
-        elif document.getElementById('ipt-algo-slr').checked:
-            handle_slr(gm)
-    except RecursionError as e:
-        error_handler(e)
-    except Exception as e:
-        error_handler(e)
-
-def error_handler(e):
-    if isinstance(e, RecursionError):
-        msg = 'Houve uma recursão infinita ao calcular first ou follow (gramática tem recursão?)'
-    elif isinstance(e, GrammarError):
-        msg = f'Houve um erro na gramática: {str(e)}'
-    elif isinstance(e, ParserError):
-        msg = f'Houve um erro no parser: {str(e)}'
+    document.querySelector('my-slr-states').replaceChildren()
+    document.getElementById('stats-panel').style.display = 'none'
+    document.getElementById('table-pred').replaceChildren()
+
+    if document.getElementById('ipt-algo-preditivo').checked:
+        algo = 'pred'
+    elif document.getElementById('ipt-algo-slr').checked:
+        algo = 'slr'
+    elif document.getElementById('ipt-algo-lalr').checked:
+        algo = 'lalr'
+    else:
+        algo = 'lr1'
+
+    grammar_raw = document.getElementById('ipt-grammar').value
+    set_running(True, 'Analisando...' if worker_ready else 'Carregando o worker...')
+    stats = document.getElementById('ipt-stats').checked
+    send_request(json.dumps({'grammar': grammar_raw, 'algo': algo, 'stats': stats}))
+
+@when("click", "#btn-cancel")
+def cancel_handler(_event):
+    if running:
+        cancel()
+
+def cancel():
+    global pending
+    pending = None
+    worker.terminate()
+    set_running(False)
+    # a busy worker can't be interrupted, start over with a fresh one
+    start_worker()
+
+def on_worker_message(event):
+    global worker_ready, pending
+    msg = json.loads(event.data)
+    kind = msg['type']
+    if kind == 'ready':
+        worker_ready = True
+        if pending is not None:
+            worker.postMessage(pending)
+            pending = None
+            if running: set_running(True)
+    elif kind == 'progress':
+        name = PROGRESS_NAMES.get(msg['phase'], msg['phase'])
+        set_running(True, f'Analisando... {msg["count"]} {name}')
+    elif kind == 'rules':
+        show_rules(msg)
+    elif kind == 'first_follow':
+        show_first_follow(msg)
+    elif kind == 'pred_table':
+        show_pred_table(msg)
+    elif kind == 'states':
+        show_states(msg)
+    elif kind == 'lr_table':
+        show_lr_table(msg)
+    elif kind == 'stats':
+        show_stats(msg)
+    elif kind == 'error':
+        set_running(False)
+        error_handler(msg['kind'], msg['message'])
+    elif kind == 'done':
+        set_running(False)
+
+def error_handler(kind: str, message: str):
+    if kind == 'recursion':
+        msg = 'Houve uma recursão infinita (gramática muito grande?)'
+    elif kind == 'grammar':
+        msg = f'Houve um erro na gramática: {message}'
+    elif kind == 'parser':
+        msg = f'Houve um erro no parser: {message}'
     else:
-        msg = f'Houve um erro: {str(e)}'
+        msg = f'Houve um erro: {message}'
 
     elem = document.querySelector('#error-dialog p')
     elem.textContent = msg
     document.getElementById('error-dialog').showModal()
 
-def handle_pred(gm: Grammar):
-    global parser
-    parser = PredParser(gm)
-
-    document.getElementById('table-first-follow').style.display = ''
-    document.querySelector('label:has(> #ipt-table-rule-idx)').style.display = ''
+def show_rules(msg: dict):
+    global last_rules, last_pred_table
+    last_rules = msg['rules']
+    last_pred_table = None
+    is_lr = msg['start'] == 0
 
     rule_list = document.getElementById('rule-list')
-    rule_list.setAttribute('start', '1')
+    rule_list.setAttribute('start', str(msg['start']))
     new_html = ''
-    for rule in gm.rules:
-        new_html += escaped_fmt('<li>{}</li>\n', str(rule))
+    for i, rule in enumerate(last_rules):
+        if is_lr and i == 0:
+            new_html += escaped_fmt('<li><u>{}</u></li>\n', rule)
+        else:
+            new_html += escaped_fmt('<li>{}</li>\n', rule)
     rule_list.innerHTML = new_html
 
+    document.getElementById('table-first-follow').style.display = 'none' if is_lr else ''
+    document.querySelector('label:has(> #ipt-table-rule-idx)').style.display = 'none' if is_lr else ''
+    document.querySelector('my-result').style.display = ''
+
+def show_first_follow(msg: dict):
     tb_body = document.getElementById('table-first-follow').querySelector('tbody')
     new_html = ''
-    for nt in gm.non_terminals:
-        first = parser.first([nt])
-        follow = parser.follow(nt)
-
+    for nt, first, follow in msg['rows']:
         row = escaped_fmt(
             '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
-            nt, fmt_set(first), fmt_set(follow)
+            nt, first, follow
         )
         new_html += row + '\n'
     tb_body.innerHTML = new_html
 
-    parser.build_table()
-    show_table(parser, rules_as_idx=document.getElementById('ipt-table-rule-idx').checked)
-
-    document.querySelector('my-result').style.display = ''
+def show_pred_table(msg: dict):
+    global last_pred_table
+    last_pred_table = msg
+    render_pred_table(msg, rules_as_idx=document.getElementById('ipt-table-rule-idx').checked)
 
 @when("change", "#ipt-table-rule-idx")
 def click_handler(event):
     active = event.target.checked
-    if parser:
-        show_table(parser, rules_as_idx=active)
-
-def show_table(parser: PredParser, rules_as_idx: bool):
-    gm = parser.g
-    big_table = document.getElementById('table-pred')
-
-    ext_terminals = [*gm.terminals, '$']
-    head_html = ''.join(escaped_fmt('<th>{}</th>', t) for t in ext_terminals)
-    head_html = f'<thead><tr><th></th>{head_html}</tr></thead>'
-
-    body_html = ''
-    for nt in gm.non_terminals:
-        row = escaped_fmt('<th>{}</th>', nt)
-        for t in ext_terminals:
-            rule = parser.table.get((nt, t))
-            if rule is None:
-                text = ''
-            elif rules_as_idx:
-                text = str(gm.rules.index(rule) + 1)
-            else:
-                text = str(rule)
-            row += escaped_fmt('<td>{}</td>', text)
-        body_html += f'<tr>{row}</tr>'
-    body_html = f'<tbody>{body_html}</tbody>'
-
-    big_table.innerHTML = head_html + body_html
-
-def handle_slr(gm: Grammar):
-    parser = SLRParser(gm)
-    parser.build_states()
-    parser.build_table()
-
-    rule_list = document.getElementById('rule-list')
-    rule_list.setAttribute('start', '0')
-    new_html = ''
-    for i, rule in enumerate(gm.rules):
-        if i == 0:
-            new_html += escaped_fmt('<li><u>{}</u></li>\n', str(rule))
+    if last_pred_table:
+        render_pred_table(last_pred_table, rules_as_idx=active)
+
+def render_pred_table(msg: dict, rules_as_idx: bool):
+    def cell_text(rule_idx: int) -> str:
+        if rule_idx < 0:
+            return ''
+        elif rules_as_idx:
+            return str(rule_idx + 1)
         else:
-            new_html += escaped_fmt('<li>{}</li>\n', str(rule))
-    rule_list.innerHTML = new_html
-
-    document.getElementById('table-first-follow').style.display = 'none'
-    document.querySelector('label:has(> #ipt-table-rule-idx)').style.display = 'none'
-
+            return last_rules[rule_idx]
+
+    head = [[('', 1), *((t, 1) for t in msg['terminals'])]]
+    render_table(head, msg['non_terminals'], msg['rows'], cell_text)
+
+def show_lr_table(msg: dict):
+    ext_terminals = msg['terminals']
+    non_terminals = msg['non_terminals']
+    head = [
+        [('', 1), ('Action', len(ext_terminals)), ('Goto', len(non_terminals))],
+        [('', 1), *((t, 1) for t in ext_terminals), *((t, 1) for t in non_terminals)],
+    ]
+    labels = [str(i) for i in range(len(msg['rows']))]
+    render_table(head, labels, msg['rows'], str)
+
+def render_table(head: list[list[tuple[str, int]]], labels: list[str], rows: list[list], cell_text):
+    # head rows are (text, colspan) cells, the body is virtualized: a row is only
+    # built, through cell_text, when it scrolls into view
+    global virtual_table
+    if virtual_table is not None: virtual_table.destroy()
     big_table = document.getElementById('table-pred')
 
-    ext_terminals = [*gm.terminals, '$']
-    non_terminals = [x for x in gm.non_terminals if x != gm.starting_symbol()]
-
-    th_terminals = ''.join(escaped_fmt('<th>{}</th>', t) for t in ext_terminals)
-    th_non_terms = ''.join(escaped_fmt('<th>{}</th>', t) for t in non_terminals)
-    head_html = f'''<thead>
-        <tr>
-            <th></th>
-            <th colspan="{len(ext_terminals)}">Action</th>
-            <th colspan="{len(gm.non_terminals) - 1}">Goto</th>
-        </tr>
-        <tr>
-            <th></th>
-            {th_terminals}
-            {th_non_terms}
-        </tr>
-    </thead>'''
-
-    body_html = ''
-    for i, _ in enumerate(parser.states):
-        row = escaped_fmt('<th>{}</th>', i)
-        for t in ext_terminals:
-            action = parser.action_table.get((i, t))
-            if action is None:
-                text = ''
-            elif isinstance(action, LRAccept):
-                text = 'acc'
-            elif isinstance(action, LRShift):
-                text = f's{action.state}'
-            elif isinstance(action, LRReduce):
-                text = f'r{action.rule_idx}'
-            row += escaped_fmt('<td>{}</td>', text)
-
-        for nt in non_terminals:
-            goto = parser.goto_table.get((i, nt))
-            if goto is None:
-                text = ''
-            else:
-                text = str(goto)
-            row += escaped_fmt('<td>{}</td>', text)
-        body_html += f'<tr>{row}</tr>'
-    body_html = f'<tbody>{body_html}</tbody>'
-
-    big_table.innerHTML = head_html + body_html
-
+    # size the columns from the data up front so they don't change width while scrolling
+    widths = [len(text) for text, _ in head[-1]]
+    widths[0] = max([widths[0], *map(len, labels)])
+    for cells in rows:
+        for j, cell in enumerate(cells, 1):
+            widths[j] = max(widths[j], len(cell_text(cell)))
+
+    thead = document.createElement('thead')
+    for k, head_row in enumerate(head):
+        tr = document.createElement('tr')
+        for j, (text, span) in enumerate(head_row):
+            th = document.createElement('th')
+            th.textContent = text
+            if span > 1: th.colSpan = span
+            if k == len(head) - 1: th.style.minWidth = f'calc({widths[j]}ch + 1rem + 1px)'
+            tr.append(th)
+        thead.append(tr)
+
+    def spacer():
+        # own tbody so the rows keep their nth-child striping
+        tbody = document.createElement('tbody')
+        tr = document.createElement('tr')
+        tr.className = 'spacer'
+        td = document.createElement('td')
+        td.colSpan = len(widths)
+        tr.append(td)
+        tbody.append(tr)
+        return tbody, tr
+
+    before_body, before = spacer()
+    after_body, after = spacer()
+    tbody = document.createElement('tbody')
+    big_table.replaceChildren(thead, before_body, tbody, after_body)
+
+    def make_row(i: int):
+        tr = document.createElement('tr')
+        th = document.createElement('th')
+        th.textContent = labels[i]
+        tr.append(th)
+        for cell in rows[i]:
+            td = document.createElement('td')
+            td.textContent = cell_text(cell)
+            tr.append(td)
+        return tr
+
+    viewport = document.getElementById('table-pred-view')
+    virtual_table = Virtualized(viewport, before, tbody, after, [TABLE_ROW_PX] * len(rows), make_row)
+    # every row has the same height, measure one instead of trusting the estimate
+    if rows and (h := tbody.firstElementChild.getBoundingClientRect().height) > 0:
+        virtual_table.set_heights([h] * len(rows))
+
+def show_states(msg: dict):
+    global virtual_states
+    if virtual_states is not None: virtual_states.destroy()
     slr_states = document.querySelector('my-slr-states')
     slr_states.style.display = ''
-
-    new_html = ''
-    for i, state in enumerate(parser.states):
-        new_html += f'<fieldset><legend>I<sub>{i}</sub></legend>'
-        new_html += '\n'.join(escaped_fmt('<span>{}</span>', str(item)) for item in state.items)
-        new_html += '</fieldset>'
-    slr_states.innerHTML = new_html
-
-    document.querySelector('my-result').style.display = ''
\ No newline at end of file
+    states = msg['states']
+
+    before = document.createElement('div')
+    after = document.createElement('div')
+    container = document.createElement('div')
+    slr_states.replaceChildren(before, container, after)
+
+    def make_state(i: int):
+        fieldset = document.createElement('fieldset')
+        fieldset.style.height = f'{STATE_EXTRA_PX + len(states[i]) * STATE_ITEM_PX}px'
+        legend = document.createElement('legend')
+        legend.append('I')
+        sub = document.createElement('sub')
+        sub.textContent = str(i)
+        legend.append(sub)
+        fieldset.append(legend)
+        for item in states[i]:
+            span = document.createElement('span')
+            span.textContent = item
+            span.title = item
+            fieldset.append(span)
+        return fieldset
+
+    # fieldset geometry is fixed (see style.css), so every offset is known without rendering
+    heights = [STATE_EXTRA_PX + len(items) * STATE_ITEM_PX + STATE_GAP_PX for items in states]
+    virtual_states = Virtualized(slr_states, before, container, after, heights, make_state)
+
+def show_stats(msg: dict):
+    document.getElementById('stats-text').textContent = msg['text']
+    document.getElementById('stats-panel').style.display = ''
+
+start_worker()
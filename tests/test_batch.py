@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from impl.batch import parse_many
+from impl.syntax import SLRParser, parse_bnf
+from impl.tables import TableCache
+
+TEXT = 'E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id'
+LEXER = 'id [a-z]+\n+ \\+\n* \\*\n( \\(\n) \\)\n_ws \\s+\n'
+
+class TestParseMany(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = TableCache(os.path.join(self.dir.name, 'cache'))
+        self.parser = SLRParser(parse_bnf(TEXT))
+        self.parser.build_states()
+        self.parser.build_table()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def expected(self, tokens: list[str]) -> list[int]:
+        return [self.parser.g.rules.index(rule) for rule in self.parser.parse(tokens)]
+
+    def test_pool(self):
+        # two workers, each loads the table bytes once in its initializer
+        paths = [
+            self.write('a.txt', b'id + id\n* id\n'),
+            self.write('b.txt', b'id + + id\n'),
+            self.write('c.txt', b'( id )\n'),
+            os.path.join(self.dir.name, 'missing.txt'),
+            self.write('d.txt', b'id \xff\n'),
+        ]
+        results = list(parse_many(TEXT, 'slr', paths, jobs=2, keep_rules=True, cache=self.cache))
+        self.assertEqual([result.path for result in results], paths)
+        self.assertEqual(results[0].rules, self.expected('id + id * id'.split()))
+        self.assertEqual(results[0].n_rules, len(results[0].rules))
+        self.assertEqual(results[2].rules, self.expected('( id )'.split()))
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[2].error)
+        for result, error in zip([results[1], results[3], results[4]], ['ParserError', 'FileNotFoundError', 'UnicodeDecodeError']):
+            self.assertTrue(result.error.startswith(error + ':'), result.error)
+            self.assertEqual((result.n_rules, result.rules), (0, None))
+
+    def test_lexer(self):
+        paths = [
+            self.write('a.txt', b'x+y * (z)'),
+            self.write('b.txt', b'x + 1'),
+            self.write('c.txt', b'x +'),
+        ]
+        results = list(parse_many(TEXT, 'slr', paths, jobs=2, lexer_spec=LEXER, cache=self.cache))
+        self.assertEqual(results[0].n_rules, len(self.expected('id + id * ( id )'.split())))
+        self.assertIsNone(results[0].rules)
+        self.assertTrue(results[1].error.startswith('LexerError:'), results[1].error)
+        self.assertTrue(results[2].error.startswith('ParserError:'), results[2].error)
+
+    def test_one_job_same(self):
+        paths = [self.write('a.txt', b'id * id'), self.write('b.txt', b'id id')]
+        pool = list(parse_many(TEXT, 'slr', paths, jobs=2, keep_rules=True, cache=self.cache))
+        inline = list(parse_many(TEXT, 'slr', paths, jobs=1, keep_rules=True, cache=self.cache))
+        self.assertEqual(pool, inline)
+
+if __name__ == '__main__':
+    unittest.main()
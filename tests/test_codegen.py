@@ -0,0 +1,60 @@
+import io
+import unittest
+
+from impl.codegen import generate
+from impl.syntax import KINDS, LRParser, ParserError, parse_bnf
+
+# LL(1) too, so every kind builds it
+TEXT = "E -> T E'\nE' -> + T E' | ϵ\nT -> id | ( E )"
+INPUTS = ['id', 'id + id', '( id + ( id ) ) + id', '( ( ( id ) ) )']
+BAD = ['', 'id +', 'id id', '( id', 'x', 'id ) id']
+
+def build(kind: str):
+    parser = KINDS[kind](parse_bnf(TEXT))
+    if isinstance(parser, LRParser):
+        parser.build_states()
+    parser.build_table()
+    return parser
+
+def module_of(parser, packed: bool = False, source: str = '<grammar>') -> dict:
+    out = io.StringIO()
+    generate(parser, out, source, packed)
+    module = {}
+    exec(out.getvalue(), module)
+    return module
+
+class TestGenerated(unittest.TestCase):
+    def test_same_parses(self):
+        # every kind unpacked, LR also packed: the generated parse_iter yields the rules of parse_iter
+        for kind in KINDS:
+            parser = build(kind)
+            for packed in (False, True) if kind != 'pred' else (False,):
+                module = module_of(parser, packed)
+                rules = parser.g.rules
+                self.assertEqual([(head, list(body)) for head, body in module['RULES']], [(rule.name, rule.body) for rule in rules])
+                for text in INPUTS:
+                    tokens = text.split()
+                    got = [rules[r] for r in module['parse_iter'](iter(tokens))]
+                    self.assertEqual(got, list(parser.parse_iter(iter(tokens))), (kind, packed, text))
+
+    def test_same_errors(self):
+        for kind in KINDS:
+            parser = build(kind)
+            for packed in (False, True) if kind != 'pred' else (False,):
+                module = module_of(parser, packed)
+                for text in BAD:
+                    with self.assertRaises(ParserError, msg=(kind, text)):
+                        parser.parse(text.split())
+                    with self.assertRaises(module['ParseError'], msg=(kind, packed, text)):
+                        module['parse'](text.split())
+
+    def test_source_stays_a_comment(self):
+        source = "g.txt\nraise SystemExit('injected')\n#"
+        module = module_of(build('slr'), source=source)
+        self.assertEqual(len(module['parse'](['id'])), 3)
+        out = io.StringIO()
+        generate(build('pred'), out, source)
+        self.assertEqual(out.getvalue().splitlines()[0], f'# generated by impl/codegen.py from {source!r} (pred), do not edit')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import io
+import json
+import unittest
+
+from impl.emit import FORMATS, fmt_action, load_dfa, write
+from impl.regex import Concat, End, assign_ids, build_dfa, fmt_class, minimize_dfa, parse
+from impl.syntax import KINDS, LRParser, parse_bnf
+from impl.tables import load_tables
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# symbols that YAML would read as something else when written plain
+TEXT = 'S -> T R\nR -> : T R | ϵ\nT -> yes | "q" | # | - x | [ S ] | 1 | null | a\'b'
+PATTERNS = ['[a-z]+', '(a|b)*abb', '[:#"\\[\\]-]+x', '\\s|[\u4e00-\u9fff]']
+
+def dfa(pattern: str):
+    root = Concat(parse(pattern), End())
+    assign_ids(root)
+    return minimize_dfa(build_dfa(root))
+
+def build(kind: str):
+    parser = KINDS[kind](parse_bnf(TEXT))
+    if isinstance(parser, LRParser):
+        parser.build_states()
+    parser.build_table()
+    return parser
+
+def emit(obj, fmt: str) -> str | bytes:
+    out = io.BytesIO() if fmt == 'bin' else io.StringIO()
+    write(obj, out, fmt)
+    return out.getvalue()
+
+def dfa_cells(d) -> dict:
+    # state name -> class label -> state name, as the YAML writer names them
+    name = lambda s: 'X' if s < 0 else f'q{s}'
+    return {f'q{s}': {fmt_class(x): name(t) for x, t in zip(d.alphabet, row)} for s, row in enumerate(d.trans)}
+
+def pred_cells(parser) -> dict:
+    return {nt: {t: r for t, r in zip(parser.term_list, row) if r >= 0} for nt, row in zip(parser.g.non_terminals, parser.pred_rows)}
+
+def lr_cells(parser) -> list:
+    return [
+        {
+            'action': {t: fmt_action(code) for t, code in zip(parser.term_list, actions) if code},
+            'goto': {nt: j for nt, j in zip(parser.g.non_terminals, gotos) if j >= 0},
+        }
+        for actions, gotos in zip(parser.action_rows, parser.goto_rows)
+    ]
+
+class TestDFA(unittest.TestCase):
+    def test_json(self):
+        for pattern in PATTERNS:
+            d = dfa(pattern)
+            doc = json.loads(emit(d, 'json'))
+            self.assertEqual([tuple(x) for x in doc['alphabet']], d.alphabet)
+            self.assertEqual((doc['delta'], doc['start']), (d.trans, d.start))
+            self.assertEqual({int(s): tag for s, tag in doc['accept'].items()}, d.accept)
+
+    def test_bin(self):
+        for pattern in PATTERNS:
+            d = dfa(pattern)
+            back = load_dfa(io.BytesIO(emit(d, 'bin')))
+            self.assertEqual((back.alphabet, back.trans, back.start, back.accept), (d.alphabet, d.trans, d.start, d.accept))
+            with self.assertRaises(ValueError):
+                load_dfa(io.BytesIO(emit(d, 'bin')[:-1]))
+
+    @unittest.skipIf(yaml is None, 'PyYAML is not installed')
+    def test_yaml(self):
+        for pattern in PATTERNS:
+            d = dfa(pattern)
+            doc = yaml.safe_load(emit(d, 'yaml'))
+            self.assertEqual(doc['input_alphabet'], [fmt_class(x) for x in d.alphabet])
+            self.assertEqual(doc['start_state'], f'q{d.start}')
+            self.assertEqual(doc['accept_states'], [f'q{s}' for s in sorted(d.accept)])
+            delta = doc['delta']
+            self.assertEqual(delta.pop('X'), {fmt_class(x): 'X' for x in d.alphabet})
+            self.assertEqual(delta, dfa_cells(d))
+
+    def test_dot(self):
+        for pattern in PATTERNS:
+            text = emit(dfa(pattern), 'dot')
+            self.assertTrue(text.startswith('digraph dfa {'))
+            self.assertTrue(text.endswith('}\n'))
+
+class TestTables(unittest.TestCase):
+    def test_json(self):
+        for kind in KINDS:
+            parser = build(kind)
+            doc = json.loads(emit(parser, 'json'))
+            self.assertEqual(doc['terminals'], parser.term_list)
+            self.assertEqual([(rule['head'], rule['body']) for rule in doc['rules']], [(rule.name, rule.body) for rule in parser.g.rules])
+            if kind == 'pred':
+                self.assertEqual(doc['table'], pred_cells(parser))
+            else:
+                self.assertEqual(doc['states'], lr_cells(parser))
+
+    def test_bin(self):
+        for kind in KINDS:
+            parser = build(kind)
+            back = load_tables(io.BytesIO(emit(parser, 'bin')))
+            if kind == 'pred':
+                self.assertEqual(back.pred_rows, parser.pred_rows)
+            else:
+                self.assertEqual((back.action_rows, back.goto_rows), (parser.action_rows, parser.goto_rows))
+
+    @unittest.skipIf(yaml is None, 'PyYAML is not installed')
+    def test_yaml(self):
+        for kind in KINDS:
+            parser = build(kind)
+            doc = yaml.safe_load(emit(parser, 'yaml'))
+            self.assertEqual(doc['terminals'], parser.term_list)
+            self.assertEqual(doc['non_terminals'], parser.g.non_terminals)
+            self.assertEqual(doc['rules'], [str(rule) for rule in parser.g.rules])
+            if kind == 'pred':
+                self.assertEqual(doc['table'], pred_cells(parser))
+            else:
+                self.assertEqual([doc['states'][i] for i in range(len(parser.action_rows))], lr_cells(parser))
+
+    def test_dot(self):
+        for kind in KINDS:
+            text = emit(build(kind), 'dot')
+            self.assertTrue(text.startswith('digraph '))
+            self.assertTrue(text.endswith('}\n'))
+
+    def test_unknown_format(self):
+        self.assertNotIn('xml', FORMATS)
+        with self.assertRaises(ValueError):
+            write(build('slr'), io.StringIO(), 'xml')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import unittest
+
+from impl.codegen import generate
+from impl.glr import GLRParser, count_trees
+from impl.syntax import GrammarError, SLRParser, parse_bnf
+from impl.tables import dump_tables
+from impl.tree import parse_tree
+
+def glr(text: str) -> GLRParser:
+    parser = GLRParser(parse_bnf(text))
+    parser.build_states()
+    parser.build_table()
+    return parser
+
+class TestForest(unittest.TestCase):
+    def test_epsilon_families_once(self):
+        forest = glr('S -> A B B\nA -> ϵ\nB -> ϵ').parse_forest([])
+        self.assertEqual(count_trees(forest), 1)
+        (_, (a, b1, b2)), = forest.families
+        self.assertIs(b1, b2)
+        self.assertEqual(len(b1.families), 1)
+
+    def test_ambiguous_sum(self):
+        # Catalan(3) ways to bracket four terms
+        forest = glr('E -> E + E | id').parse_forest('id + id + id + id'.split())
+        self.assertEqual(count_trees(forest), 5)
+
+    def test_deterministic_is_the_tree(self):
+        # without conflicts the forest is the LR parse tree, unit rules and all
+        text = 'E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id'
+        tokens = 'id * ( id + id ) + id'.split()
+        forest = glr(text).parse_forest(tokens)
+        self.assertEqual(count_trees(forest), 1)
+        lr = SLRParser(parse_bnf(text))
+        lr.build_states()
+        lr.build_table()
+        tree = parse_tree(lr, tokens)
+        expected = [(tree.sym[i], tree.rule[i], tree.start[i], tree.end[i]) for i, entering in tree.walk() if entering]
+        nodes = []
+        stack = [forest]
+        while stack:
+            node = stack.pop()
+            (rule_idx, kids), = node.families or [(-1, ())]
+            nodes.append((node.sym, rule_idx, node.start, node.end))
+            stack.extend(reversed(kids))
+        self.assertEqual(nodes, expected)
+
+    def test_lr_parse_needs_no_conflicts(self):
+        # parse/parse_iter would pick one derivation of an ambiguous input
+        with self.assertRaises(GrammarError):
+            glr('E -> E + E | id').parse('id + id + id'.split())
+        rules = glr('E -> E + id | id').parse('id + id'.split())
+        self.assertEqual([' '.join(rule.body) for rule in rules], ['id', 'E + id'])
+
+    def test_no_table_file(self):
+        # the file and the generated module have one action per cell
+        parser = glr('E -> E + E | id')
+        with self.assertRaises(ValueError):
+            dump_tables(parser, io.BytesIO())
+        with self.assertRaises(ValueError):
+            generate(parser, io.StringIO())
+
+if __name__ == '__main__':
+    unittest.main()
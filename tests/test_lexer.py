@@ -0,0 +1,24 @@
+import unittest
+
+from impl.lexer import Lexer, LexerError
+
+class TestSpec(unittest.TestCase):
+    def test_line_breaks_skipped(self):
+        lexer = Lexer.from_spec('id [a-z]+\n_ws [ \\t\\n]+\n')
+        tokens = [(kind, lexeme) for kind, lexeme, _ in lexer.tokenize('ab\tc\nd\n')]
+        self.assertEqual(tokens, [('id', 'ab'), ('id', 'c'), ('id', 'd')])
+
+    def test_escapes(self):
+        lexer = Lexer.from_spec('nl \\n\ntab \\t\nsp \\s+\nn n\n')
+        # on ties the first rule wins, \s+ takes longer runs
+        kinds = [kind for kind, _, _ in lexer.tokenize('\nn\tn \r')]
+        self.assertEqual(kinds, ['nl', 'n', 'tab', 'n', 'sp'])
+
+    def test_missing_pattern(self):
+        for spec, line in [('id\n', 1), ('id [a-z]+\n\n# comment\nnum   \n', 4)]:
+            with self.assertRaises(LexerError) as caught:
+                Lexer.from_spec(spec)
+            self.assertIn(f'line {line}:', str(caught.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import io
+import unittest
+
+from impl.codegen import generate
+from impl.packed import PackedTables
+from impl.syntax import SLRParser, parse_bnf
+
+def slr(text: str) -> SLRParser:
+    parser = SLRParser(parse_bnf(text))
+    parser.build_states()
+    parser.build_table()
+    return parser
+
+def rules(parser: SLRParser, indices: list[int]) -> list:
+    return [parser.g.rules[r] for r in indices]
+
+def same_cells(test: unittest.TestCase, parser: SLRParser):
+    # every cell of the full rows, the error cells may hold a default reduction instead
+    packed = PackedTables(parser)
+    for state, row in enumerate(parser.action_rows):
+        for t, code in enumerate(row):
+            if code: test.assertEqual(packed.action_at(state, t), code, (state, t))
+    for state, row in enumerate(parser.goto_rows):
+        for nt, j in enumerate(row):
+            if j >= 0: test.assertEqual(packed.goto_at(state, nt), j, (state, nt))
+
+class TestPacked(unittest.TestCase):
+    def test_all_default_goto(self):
+        # the only goto of S is its default, so the goto arrays have no explicit cell
+        parser = slr('S -> ϵ | b')
+        packed = PackedTables(parser)
+        self.assertEqual(len(packed.goto_check), len(parser.goto_rows))
+        self.assertEqual(rules(parser, packed.parse(['b'])), parser.parse(['b']))
+        self.assertEqual(rules(parser, packed.parse([])), parser.parse([]))
+        same_cells(self, parser)
+
+    def test_past_last_column(self):
+        # '$' and the last states are past every explicit cell of some rows
+        parser = slr('E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id')
+        packed = PackedTables(parser)
+        last = len(packed.terminals) - 1
+        for state in range(len(parser.action_rows)):
+            packed.action_at(state, last)
+        for nt in range(len(packed.goto_default)):
+            packed.goto_at(len(parser.goto_rows) - 1, nt)
+        same_cells(self, parser)
+        tokens = 'id + id * ( id + id )'.split()
+        self.assertEqual(rules(parser, packed.parse(tokens)), parser.parse(tokens))
+
+    def test_generated_module(self):
+        parser = slr('S -> ϵ | b')
+        out = io.StringIO()
+        generate(parser, out, packed=True)
+        module = {}
+        exec(out.getvalue(), module)
+        self.assertEqual(rules(parser, module['parse'](['b'])), parser.parse(['b']))
+
+if __name__ == '__main__':
+    unittest.main()
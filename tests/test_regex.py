@@ -0,0 +1,116 @@
+import itertools
+import unittest
+
+from impl.regex import MAX_CHAR, Concat, End, LazyDFA, Leaf, Pattern, Plus, RegexError, Star, Union, assign_ids, build_dfa, compile, minimize_dfa, parse, positions, union_all
+
+def dfa(pattern: str):
+    root = Concat(parse(pattern), End())
+    assign_ids(root)
+    return build_dfa(root)
+
+def strings(chars: str, n: int):
+    for k in range(n + 1):
+        for t in itertools.product(chars, repeat=k):
+            yield ''.join(t)
+
+class TestParse(unittest.TestCase):
+    def test_groups_side_by_side(self):
+        # the matching ')' of the first group is not the last one
+        self.assertEqual(parse('(a)(b)'), Concat(Leaf.char('a'), Leaf.char('b')))
+        self.assertEqual(parse('(a|b)(c)*'), Concat(Union(Leaf.char('a'), Leaf.char('b')), Star(Leaf.char('c'))))
+        self.assertIsNotNone(compile('(a)(b)').fullmatch('ab'))
+        self.assertIsNone(compile('(a)(b)').fullmatch('a)(b'))
+
+    def test_plus_shares_its_operand(self):
+        node = parse('(ab)+')
+        self.assertIsInstance(node, Plus)
+        self.assertEqual(node.c1, Concat(Leaf.char('a'), Leaf.char('b')))
+        self.assertIsNotNone(compile('(ab)+').fullmatch('ababab'))
+        self.assertIsNone(compile('(ab)+').fullmatch(''))
+
+    def test_deep_and_wide(self):
+        # past the recursion limit either way
+        n = 5000
+        self.assertIsNotNone(compile('(' * n + 'a' + ')' * n).fullmatch('a'))
+        words = [f'w{i}x' for i in range(n)]
+        pattern = compile('|'.join(words))
+        self.assertIsNotNone(pattern.fullmatch(words[-1]))
+        self.assertIsNone(pattern.fullmatch('w5000x'))
+
+    def test_unbalanced(self):
+        for pattern in ['(a', 'a)', '(a))(', '*a']:
+            with self.assertRaises(RegexError):
+                parse(pattern)
+
+class TestClasses(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse('[a-z]'), Leaf(((ord('a'), ord('z')),)))
+        # sorted and merged, a '-' at the end is literal
+        self.assertEqual(parse('[x-zb-da-c_-]').ranges, ((ord('-'), ord('-')), (ord('_'), ord('_')), (ord('a'), ord('d')), (ord('x'), ord('z'))))
+        self.assertEqual(parse('[^b-y]').ranges, ((0, ord('a')), (ord('z'), MAX_CHAR)))
+        self.assertEqual(parse('[\\n-\\r]').ranges, ((10, 13),))
+
+    def test_malformed(self):
+        for pattern in ['[z-a]', '[b-a]', '[\\r-\\n]', '[a', '[]', '[^\x00-\U0010ffff]']:
+            with self.assertRaises(RegexError, msg=pattern):
+                parse(pattern)
+
+    def test_alphabet_by_class(self):
+        # overlapping classes split into disjoint pieces, not one column per char
+        self.assertEqual(dfa('[a-m]|[h-z]').alphabet, [(ord('a'), ord('g')), (ord('h'), ord('m')), (ord('n'), ord('z'))])
+        self.assertEqual(len(dfa('[\u4e00-\u9fff]+').alphabet), 1)
+        pattern = compile('[a-m]x|[h-z]y')
+        for text, ok in [('ax', True), ('hx', True), ('hy', True), ('zy', True), ('ay', False), ('zx', False)]:
+            self.assertEqual(pattern.fullmatch(text) is not None, ok, text)
+
+class TestMinimize(unittest.TestCase):
+    def test_state_count(self):
+        # ab / xb and a / x only differ by how they were reached
+        for pattern, raw, minimal in [('abc|xbc', 6, 4), ('ab|cb', 4, 3), ('(ab|cb)*', 3, 2), ('(a|b)*abb', 4, 4)]:
+            full = dfa(pattern)
+            self.assertEqual((len(full.trans), len(minimize_dfa(full).trans)), (raw, minimal), pattern)
+
+    def test_same_language(self):
+        for pattern in ['abc|xbc', '(ab|cb)*', '(a|b)*a(a|b)', 'a*b*|b*a*']:
+            full = dfa(pattern)
+            before = Pattern(pattern, full)
+            after = Pattern(pattern, minimize_dfa(full))
+            for s in strings('abcx', 5):
+                self.assertEqual(before.fullmatch(s) is None, after.fullmatch(s) is None, (pattern, s))
+
+    def test_tags_kept_apart(self):
+        # the lexer's accepting states differ by tag, those never merge
+        alts = []
+        for tag, pattern in enumerate(['if', '[a-z]+']):
+            alts.append(Concat(parse(pattern), End(tag)))
+        root = union_all(alts)
+        assign_ids(root)
+        minimal = minimize_dfa(build_dfa(root))
+        self.assertEqual(sorted(set(minimal.accept.values())), [0, 1])
+        self.assertEqual(len(minimal.trans), 4)
+
+class TestLazy(unittest.TestCase):
+    def test_cache_bounded(self):
+        # an a 6 chars from the end needs 2^7 states, the cache never holds more than max_states
+        pattern = '(a|b)*a' + '(a|b)' * 5
+        full = compile(pattern)
+        texts = [''.join(t) for t in itertools.product('ab', repeat=9)]
+        for max_states in (1, 3, 10):
+            root = Concat(parse(pattern), End())
+            assign_ids(root)
+            lazy = LazyDFA(positions(root), max_states)
+            matcher = Pattern(pattern, lazy)
+            # the cache is at its fullest right after a step, a later flush would hide it
+            peak = []
+            def step(state: int, col: int, lazy=lazy, peak=peak) -> int:
+                j = lazy.step(state, col)
+                peak.append(len(lazy.trans))
+                return j
+            matcher.step = step
+            for text in texts:
+                self.assertEqual(matcher.match_end(text), full.match_end(text), text)
+            self.assertLessEqual(max(peak), lazy.max_states)
+            self.assertGreater(lazy.flushes, 0)
+
+if __name__ == '__main__':
+    unittest.main()
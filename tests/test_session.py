@@ -0,0 +1,136 @@
+import random
+import unittest
+
+from impl.session import Session
+from impl.syntax import GrammarError, LALRParser, PredParser, SLRParser, parse_bnf
+
+def random_grammar(rng: random.Random) -> list[str]:
+    nts = [f'N{i}' for i in range(rng.randint(2, 6))]
+    symbols = nts + ['a', 'b', 'c', 'a', 'b', 'c']
+    lines = []
+    for nt in nts:
+        bodies = [' '.join(rng.choices(symbols, k=rng.randint(0, 3))) or 'ϵ' for _ in range(rng.randint(1, 3))]
+        lines.append(f'{nt} -> ' + ' | '.join(bodies))
+    return lines
+
+def sets(parser) -> dict:
+    g = parser.g
+    return {nt: (parser.first([nt]), parser.follow(nt)) for nt in g.non_terminals}
+
+class TestIncremental(unittest.TestCase):
+    def test_deleted_non_terminal(self):
+        session = Session()
+        session.analyze('S -> b d a | a A\nB -> S b')
+        parser = session.analyze('S -> b d a | a A')
+        self.assertEqual(parser.follow('S'), {'$'})
+
+    def test_reused_rules_moved(self):
+        session = Session()
+        session.analyze('E -> E + id | id')
+        parser = session.analyze('\n\nE -> E + id | id')
+        self.assertEqual(parser.changed, set())
+        self.assertEqual([rule.pos for rule in parser.g.rule_map['E']], [(3, 6), (3, 15)])
+
+    def test_rows_reused(self):
+        # only the states of the edited E' are rebuilt, the rows of the others are prev's own lists
+        text = "S -> { L }\nL -> id = E ; L | ϵ\nE -> T E'\nE' -> + T E' | ϵ\nT -> id | num | ( E )"
+        for edit in ("E' -> + T E' | + + T E' | ϵ", "E' -> + T E' | - T E' | ϵ"):
+            session = Session()
+            prev = session.analyze(text)
+            old_rows = {id(row) for row in prev.action_rows}
+            edited = text.replace("E' -> + T E' | ϵ", edit)
+            parser = session.analyze(edited)
+            self.assertGreater(len(parser.from_prev), len(parser.states) // 2)
+            fresh = SLRParser(parse_bnf(edited))
+            fresh.build_states()
+            fresh.build_table()
+            self.assertEqual((parser.action_rows, parser.goto_rows), (fresh.action_rows, fresh.goto_rows))
+            if '- T' not in edit:
+                kept = sum(id(row) in old_rows for row in parser.action_rows)
+                self.assertEqual(kept, len(parser.from_prev))
+            else:
+                # a new terminal moves every column, the kept rows are remapped
+                self.assertIsNotNone(parser.term_map)
+
+    def test_lr_edits_match_fresh(self):
+        # rewrite one non terminal at a time, terminals come and go
+        rng = random.Random(1)
+        for _ in range(200):
+            kind, cls = rng.choice([('slr', SLRParser), ('lalr', LALRParser)])
+            lines = random_grammar(rng)
+            session = Session()
+            for _ in range(4):
+                k = rng.randrange(len(lines))
+                head = lines[k].split(' -> ')[0]
+                lines[k] = random_grammar(rng)[0].replace('N0 ->', f'{head} ->').replace('c', rng.choice('cde'))
+                text = '\n'.join(lines)
+                try:
+                    parser = session.analyze(text, kind)
+                except GrammarError:
+                    session = Session()
+                    continue
+                fresh = cls(parse_bnf(text))
+                fresh.build_states()
+                fresh.build_table()
+                self.assertEqual((parser.action_rows, parser.goto_rows), (fresh.action_rows, fresh.goto_rows), text)
+
+    def test_reordered_lines(self):
+        # the same states come out numbered another way, the kept rows must point at the new numbers
+        for kind, cls, before, after, tokens, rules in [
+            ('lalr', LALRParser, 'N0 -> b b | N1 N0 | N2 N1\nN1 -> c\nN2 -> a', 'N0 -> b b | N1 N0 | N2 N1\nN2 -> a\nN1 -> c',
+             ['a', 'c'], ['N2 -> a', 'N1 -> c', 'N0 -> N2 N1']),
+            ('slr', SLRParser, 'N0 -> a | N2 N1 | ϵ\nN1 -> c a | N3\nN2 -> ϵ\nN3 -> b', 'N0 -> a | N2 N1 | ϵ\nN3 -> b\nN2 -> ϵ\nN1 -> c a | N3',
+             ['b'], ['N2 -> ', 'N3 -> b', 'N1 -> N3', 'N0 -> N2 N1']),
+        ]:
+            session = Session()
+            session.analyze(before, kind)
+            parser = session.analyze(after, kind)
+            self.assertTrue(parser.from_prev)
+            self.assertEqual([str(rule) for rule in parser.parse(tokens)], rules)
+            fresh = cls(parse_bnf(after))
+            fresh.build_states()
+            fresh.build_table()
+            self.assertEqual((parser.action_rows, parser.goto_rows), (fresh.action_rows, fresh.goto_rows))
+
+    def test_shuffled_edits_match_fresh(self):
+        # move lines and alternatives around, the rules are all reused under new indices
+        rng = random.Random(1)
+        for _ in range(200):
+            kind, cls = rng.choice([('slr', SLRParser), ('lalr', LALRParser)])
+            lines = random_grammar(rng)
+            session = Session()
+            for _ in range(4):
+                head, bodies = lines[0].split(' -> ')
+                bodies = bodies.split(' | ')
+                rng.shuffle(bodies)
+                lines = [f'{head} -> ' + ' | '.join(bodies)] + rng.sample(lines[1:], len(lines) - 1)
+                text = '\n'.join(lines)
+                try:
+                    parser = session.analyze(text, kind)
+                except GrammarError:
+                    session = Session()
+                    continue
+                fresh = cls(parse_bnf(text))
+                fresh.build_states()
+                fresh.build_table()
+                self.assertEqual((parser.action_rows, parser.goto_rows), (fresh.action_rows, fresh.goto_rows), text)
+
+    def test_deletions_match_fresh(self):
+        # drop whole non terminals (all their rules) and compare with an analysis from scratch
+        rng = random.Random(0)
+        for _ in range(300):
+            kind, cls = rng.choice([('pred', PredParser), ('slr', SLRParser)])
+            lines = random_grammar(rng)
+            session = Session()
+            while len(lines) > 1:
+                text = '\n'.join(lines)
+                try:
+                    parser = session.analyze(text, kind)
+                except GrammarError:
+                    break
+                fresh = cls(parse_bnf(text))
+                self.assertEqual(sets(parser), sets(fresh), text)
+                del lines[rng.randrange(1, len(lines))]
+
+if __name__ == '__main__':
+    unittest.main()
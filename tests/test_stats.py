@@ -0,0 +1,23 @@
+import time
+import unittest
+
+from impl.bench import stmt_grammar
+from impl.stats import Stats
+from impl.syntax import LALRParser, parse_bnf
+
+class TestPhases(unittest.TestCase):
+    def test_nested_phase_counted_once(self):
+        # lookaheads runs inside build_states, the phases still add up to no more than the whole
+        g = parse_bnf(stmt_grammar(30))
+        stats = Stats()
+        start = time.perf_counter()
+        parser = LALRParser(g, stats)
+        parser.build_states()
+        parser.build_table()
+        total = time.perf_counter() - start
+        self.assertEqual(set(stats.times), {'first_follow', 'build_states', 'lookaheads', 'build_table'})
+        self.assertLessEqual(sum(stats.times.values()), total)
+        self.assertEqual(stats.nested, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+from impl.syntax import FirstFollow, GrammarError, LALRParser, LR1Parser, ParserError, PredParser, SLRParser, parse_bnf
+
+def bodies(text: str) -> list[list[str]]:
+    return [rule.body for rule in parse_bnf(text).rules]
+
+class TestLoad(unittest.TestCase):
+    def test_pipe_in_symbols(self):
+        self.assertEqual(bodies('A -> x |= y'), [['x', '|=', 'y']])
+        self.assertEqual(bodies('A -> "|" x | a || b'), [['"|"', 'x'], ['a', '||', 'b']])
+
+    def test_alternatives(self):
+        self.assertEqual(bodies('A -> a | b\n  | c | ϵ'), [['a'], ['b'], ['c'], []])
+
+    def test_positions(self):
+        g = parse_bnf('\nA -> a\n  | bc')
+        self.assertEqual([rule.pos for rule in g.rules], [(2, 6), (3, 5)])
+
+class TestFirstFollow(unittest.TestCase):
+    def test_left_recursion(self):
+        # the Soma e Mult example, the recursive version ran into a RecursionError
+        ff = FirstFollow(parse_bnf('E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id'))
+        for nt in 'ETF':
+            self.assertEqual(ff.first([nt]), {'(', 'id'})
+        self.assertEqual(ff.follow('E'), {'+', ')', '$'})
+        self.assertEqual(ff.follow('T'), {'+', '*', ')', '$'})
+        self.assertEqual(ff.follow('F'), {'+', '*', ')', '$'})
+
+    def test_nullable_cycle(self):
+        # A and B reach each other, FOLLOW(B) includes FOLLOW(A) and back
+        ff = FirstFollow(parse_bnf('S -> A x\nA -> B | a\nB -> A b | ϵ'))
+        self.assertEqual(ff.first(['A']), {'a', '', 'b'})
+        self.assertEqual(ff.follow('A'), {'x', 'b'})
+        self.assertEqual(ff.follow('B'), {'x', 'b'})
+
+    def test_long_chain(self):
+        # deeper than the recursion limit
+        n = 5000
+        lines = [f'N{i} -> N{i + 1} t{i} | ϵ' for i in range(n)] + [f'N{n} -> end']
+        ff = FirstFollow(parse_bnf('\n'.join(lines)))
+        self.assertEqual(ff.first(['N0']), {f't{i}' for i in range(n - 1)} | {'end', ''})
+        self.assertEqual(ff.follow(f'N{n}'), {f't{n - 1}'})
+
+class TestPred(unittest.TestCase):
+    def test_trailing_tokens(self):
+        # the stack runs down to '$' after the first a, the rest must still be rejected
+        parser = PredParser(parse_bnf('N0 -> a | ϵ'))
+        parser.build_table()
+        self.assertEqual([str(rule) for rule in parser.parse(['a'])], ['N0 -> a'])
+        self.assertEqual([str(rule) for rule in parser.parse([])], ['N0 -> '])
+        for tokens in (['a', 'c', 'b', 'a'], ['a', 'a'], ['x']):
+            with self.assertRaises(ParserError, msg=tokens):
+                parser.parse(tokens)
+        # the rules applied so far come out before the error
+        rules = parser.parse_iter(['a', 'a'])
+        self.assertEqual(str(next(rules)), 'N0 -> a')
+        with self.assertRaises(ParserError):
+            next(rules)
+
+def build(cls, text: str):
+    parser = cls(parse_bnf(text))
+    parser.build_states()
+    parser.build_table()
+    return parser
+
+class TestLR(unittest.TestCase):
+    # LALR but not SLR: FOLLOW(R) has '=', which only follows an L that is not reduced to R
+    LALR_ONLY = 'S -> L = R | R\nL -> * R | id\nR -> L'
+    # LR(1) but not LALR: the two c states merge into one with a R/R conflict on d and e
+    LR1_ONLY = 'S -> a A d | b B d | a B e | b A e\nA -> c\nB -> c'
+
+    def test_lalr_not_slr(self):
+        with self.assertRaises(GrammarError):
+            build(SLRParser, self.LALR_ONLY)
+        for cls in (LALRParser, LR1Parser):
+            rules = build(cls, self.LALR_ONLY).parse('* id = id'.split())
+            self.assertEqual([rule.name for rule in rules], ['L', 'R', 'L', 'L', 'R', 'S'])
+
+    def test_lr1_not_lalr(self):
+        for cls in (SLRParser, LALRParser):
+            with self.assertRaises(GrammarError):
+                build(cls, self.LR1_ONLY)
+        parser = build(LR1Parser, self.LR1_ONLY)
+        self.assertEqual([rule.name for rule in parser.parse('a c e'.split())], ['B', 'S'])
+        self.assertEqual([rule.name for rule in parser.parse('b c e'.split())], ['A', 'S'])
+
+    def test_lalr_merges_lr1_states(self):
+        # same table shape as SLR where both work, LR(1) only splits states
+        text = 'E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id'
+        self.assertEqual(len(build(LALRParser, text).states), len(build(SLRParser, text).states))
+        self.assertGreater(len(build(LR1Parser, text).states), len(build(LALRParser, text).states))
+
+if __name__ == '__main__':
+    unittest.main()
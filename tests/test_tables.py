@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+
+from impl.syntax import KINDS, LRParser, parse_bnf
+from impl.tables import MAGIC, TableCache, dump_tables, load_tables
+
+# LL(1) too, so every kind builds it
+TEXT = "E -> T E'\nE' -> + T E' | ϵ\nT -> id | ( E )"
+INPUTS = ['id', 'id + id', '( id + ( id ) ) + id']
+
+def build(kind: str, text: str = TEXT):
+    parser = KINDS[kind](parse_bnf(text))
+    if isinstance(parser, LRParser):
+        parser.build_states()
+    parser.build_table()
+    return parser
+
+def tables(parser) -> tuple:
+    if isinstance(parser, LRParser):
+        return parser.action_rows, parser.goto_rows
+    return parser.pred_rows,
+
+class TestFile(unittest.TestCase):
+    def test_round_trip(self):
+        for kind in KINDS:
+            parser = build(kind)
+            data = io.BytesIO()
+            dump_tables(parser, data)
+            self.assertEqual(data.getvalue()[:4], MAGIC)
+            loaded = load_tables(io.BytesIO(data.getvalue()))
+            self.assertIs(type(loaded), KINDS[kind])
+            self.assertEqual(tables(loaded), tables(parser), kind)
+            self.assertEqual([str(rule) for rule in loaded.g.rules], [str(rule) for rule in parser.g.rules])
+            for text in INPUTS:
+                self.assertEqual(loaded.parse(text.split()), parser.parse(text.split()), (kind, text))
+
+    def test_rejected(self):
+        data = io.BytesIO()
+        dump_tables(build('slr'), data)
+        data = data.getvalue()
+        with self.assertRaises(ValueError):
+            load_tables(io.BytesIO(b'XXXX' + data[4:]))
+        with self.assertRaises(ValueError):
+            load_tables(io.BytesIO(data[:-3]))
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = TableCache(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_hit(self):
+        for kind in KINDS:
+            built = self.cache.load_or_build(TEXT, kind)
+            path = self.cache.file_for(TEXT, kind)
+            self.assertTrue(os.path.exists(path))
+            mtime = os.stat(path).st_mtime_ns
+            loaded = self.cache.load_or_build(TEXT, kind)
+            # read back, not built again
+            self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+            self.assertFalse(loaded.states if isinstance(loaded, LRParser) else False)
+            self.assertEqual(tables(loaded), tables(built))
+        self.assertEqual(len(os.listdir(self.dir.name)), len(KINDS))
+
+    def test_changed_grammar_misses(self):
+        self.cache.load_or_build(TEXT, 'slr')
+        edited = TEXT.replace('id', 'num')
+        self.assertNotEqual(self.cache.file_for(edited, 'slr'), self.cache.file_for(TEXT, 'slr'))
+        parser = self.cache.load_or_build(edited, 'slr')
+        self.assertIn('num', parser.g.terminals)
+        self.assertNotIn('id', parser.g.terminals)
+        self.assertEqual(len(os.listdir(self.dir.name)), 2)
+
+    def test_bad_magic_rebuilt(self):
+        self.cache.load_or_build(TEXT, 'slr')
+        path = self.cache.file_for(TEXT, 'slr')
+        with open(path, 'r+b') as file:
+            file.write(b'XXXX')
+        parser = self.cache.load_or_build(TEXT, 'slr')
+        self.assertTrue(parser.states)
+        self.assertEqual(tables(parser), tables(build('slr')))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(4), MAGIC)
+
+    def test_other_kind_rebuilt(self):
+        # lalr tables where slr ones belong
+        self.cache.load_or_build(TEXT, 'lalr')
+        os.replace(self.cache.file_for(TEXT, 'lalr'), self.cache.file_for(TEXT, 'slr'))
+        parser = self.cache.load_or_build(TEXT, 'slr')
+        self.assertIs(type(parser), KINDS['slr'])
+        with open(self.cache.file_for(TEXT, 'slr'), 'rb') as file:
+            self.assertIs(type(load_tables(file)), KINDS['slr'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+from impl.syntax import LALRParser, ParserError, PredParser, SLRParser, parse_bnf
+from impl.tree import Visitor, parse_tree
+
+# LL(1) and SLR, with ϵ rules and nesting
+TEXT = "E -> T E'\nE' -> + T E' | ϵ\nT -> id | ( E )"
+INPUTS = ['id', 'id + id', '( id + ( id ) ) + id', '( ( ( id ) ) )']
+
+def build(cls):
+    parser = cls(parse_bnf(TEXT))
+    if not isinstance(parser, PredParser):
+        parser.build_states()
+    parser.build_table()
+    return parser
+
+def nodes(tree) -> list[tuple]:
+    # every node in pre order, as what it is and what it covers
+    return [(tree.symbol(i), tree.rule[i], tree.start[i], tree.end[i]) for i, entering in tree.walk() if entering]
+
+class Collect(Visitor):
+    def __init__(self):
+        self.events = []
+
+    def enter(self, tree, node):
+        self.events.append(('enter', tree.symbol(node)))
+
+    def exit(self, tree, node):
+        self.events.append(('exit', tree.symbol(node)))
+
+class TestParseTree(unittest.TestCase):
+    def test_rules_in_derivation_order(self):
+        # top down the rule nodes come in pre order, bottom up in post order
+        ll = build(PredParser)
+        for cls in (SLRParser, LALRParser):
+            lr = build(cls)
+            for text in INPUTS:
+                tokens = text.split()
+                tree = parse_tree(ll, tokens)
+                rules = [ll.g.rules[tree.rule[i]] for i, entering in tree.walk() if entering and tree.rule[i] >= 0]
+                self.assertEqual(rules, ll.parse(tokens), text)
+                tree = parse_tree(lr, tokens)
+                rules = [lr.g.rules[tree.rule[i]] for i, entering in tree.walk() if not entering and tree.rule[i] >= 0]
+                self.assertEqual(rules, lr.parse(tokens), text)
+
+    def test_same_tree_both_ways(self):
+        ll = build(PredParser)
+        lr = build(SLRParser)
+        for text in INPUTS:
+            tokens = text.split()
+            top_down = parse_tree(ll, tokens)
+            bottom_up = parse_tree(lr, tokens)
+            # LR rules are numbered after S' -> E, compare them as rules
+            self.assertEqual(
+                [(s, str(ll.g.rules[r]) if r >= 0 else None, a, b) for s, r, a, b in nodes(top_down)],
+                [(s, str(lr.g.rules[r]) if r >= 0 else None, a, b) for s, r, a, b in nodes(bottom_up)],
+                text,
+            )
+            self.assertEqual(top_down.to_str(tokens), bottom_up.to_str(tokens))
+            self.assertEqual(top_down.node().span, (0, len(tokens)))
+            # the leaves are the tokens, in order
+            leaves = [i for i, entering in top_down.walk() if entering and top_down.is_token(i)]
+            self.assertEqual([top_down.start[i] for i in leaves], list(range(len(tokens))))
+
+    def test_to_str(self):
+        tokens = 'id + id'.split()
+        self.assertEqual(parse_tree(build(PredParser), tokens).to_str(tokens), '\n'.join([
+            'E',
+            '  T',
+            "    id 'id'",
+            "  E'",
+            "    + '+'",
+            '    T',
+            "      id 'id'",
+            "    E'",
+        ]))
+
+    def test_visit_and_nodes(self):
+        tree = parse_tree(build(SLRParser), ['(', 'id', ')'])
+        visitor = Collect()
+        tree.visit(visitor)
+        entered = [s for kind, s in visitor.events if kind == 'enter']
+        self.assertEqual(entered, ['E', 'T', '(', 'E', 'T', 'id', "E'", ')', "E'"])
+        self.assertEqual(len(visitor.events), 2 * len(tree))
+        root = tree.node()
+        self.assertEqual([child.symbol for child in root.children], ['T', "E'"])
+        self.assertEqual([child.span for child in root.children], [(0, 3), (3, 3)])
+        # a visit from an inner node stays below it
+        visitor = Collect()
+        tree.visit(visitor, root.children.__next__().index)
+        self.assertEqual(visitor.events[0], ('enter', 'T'))
+        self.assertEqual(visitor.events[-1], ('exit', 'T'))
+
+    def test_deep(self):
+        # nesting past the recursion limit
+        n = 3000
+        tokens = ['('] * n + ['id'] + [')'] * n
+        for cls in (PredParser, SLRParser):
+            tree = parse_tree(build(cls), tokens)
+            self.assertEqual(tree.node().span, (0, len(tokens)))
+            self.assertEqual(sum(1 for i, entering in tree.walk() if entering and tree.is_token(i)), len(tokens))
+
+    def test_trailing_tokens(self):
+        # the LL root would otherwise only cover the prefix read
+        for cls in (PredParser, SLRParser):
+            with self.assertRaises(ParserError):
+                parse_tree(build(cls), 'id id'.split())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+from polyscript import xworker
+from pyscript import ffi
+from impl.syntax import KINDS, PredParser, parse_bnf, Grammar, LRParser, LRState, RuleItem, ParserError, GrammarError
+from impl.stats import Stats
+from impl.session import Session
+
+# runs the grammar analysis off the main thread, every result is posted back as a json message
+# as soon as it is ready: {'type': 'rules' | 'first_follow' | 'pred_table' | 'lr_table' | 'states' | 'stats' | 'progress' | 'error' | 'done', ...}
+
+EPSILON = 'ϵ'
+
+# lives as long as the worker, so re-running an edited grammar only redoes what changed
+session = Session()
+
+def send(msg_type: str, **data):
+    xworker.postMessage(json.dumps({'type': msg_type, **data}))
+
+def progress(phase: str, count: int):
+    send('progress', phase=phase, count=count)
+
+def fmt_set(terms):
+    l = []
+    for t in sorted(terms):
+        if t == '': t = EPSILON
+        elif t in '{},();': t = f'\'{t}\''
+        l.append(t)
+    return '{' + ', '.join(l) + '}'
+
+def fmt_item(parser: LRParser, state: LRState, item: RuleItem) -> str:
+    text = item.to_str(parser.g)
+    if state.lookaheads is not None and item in state.lookaheads:
+        text += ', ' + '/'.join(sorted(parser.bits_to_set(state.lookaheads[item])))
+    return text
+
+def fmt_action(code: int) -> str:
+    # see LRParser.action_rows
+    if code == 0: return ''
+    if code == -1: return 'acc'
+    if code > 0: return f's{code - 1}'
+    return f'r{-code - 1}'
+
+def on_message(event):
+    req = json.loads(event.data)
+    try:
+        try:
+            gm = parse_bnf(req['grammar'])
+        except Exception as e:
+            raise Exception("Error when parsing BNF", str(e))
+
+        stats = Stats() if req.get('stats') else None
+        if req['algo'] == 'pred':
+            analyze_pred(gm, stats)
+        else:
+            analyze_lr(gm, KINDS[req['algo']], stats)
+        if stats is not None:
+            send('stats', text=str(stats), **stats.to_dict())
+    except RecursionError as e:
+        send('error', kind='recursion', message=str(e))
+    except GrammarError as e:
+        send('error', kind='grammar', message=str(e))
+    except ParserError as e:
+        send('error', kind='parser', message=str(e))
+    except Exception as e:
+        send('error', kind='other', message=str(e))
+    else:
+        send('done')
+
+def analyze_pred(gm: Grammar, stats: Stats | None):
+    send('rules', rules=[str(rule) for rule in gm.rules], start=1)
+
+    parser = session.parser_for(gm, PredParser, stats)
+    parser.progress = progress
+    send('first_follow', rows=[
+        [nt, fmt_set(parser.first([nt])), fmt_set(parser.follow(nt))]
+        for nt in gm.non_terminals
+    ])
+
+    parser.build_table()
+    # rows are already rule indices by (non terminal, terminal), -1 if empty
+    send('pred_table', terminals=parser.term_list, non_terminals=gm.non_terminals, rows=parser.pred_rows)
+    session.keep(parser)
+
+def analyze_lr(gm: Grammar, parser_cls: type[LRParser], stats: Stats | None):
+    parser = session.parser_for(gm, parser_cls, stats)
+    parser.progress = progress
+    # extending the grammar added rule 0
+    send('rules', rules=[str(rule) for rule in gm.rules], start=0)
+
+    parser.build_states()
+    send('states', states=[
+        [fmt_item(parser, state, item) for item in state.items]
+        for state in parser.states
+    ])
+
+    parser.build_table()
+    # the start symbol has no gotos, its column is left out
+    start = gm.starting_symbol()
+    columns = [k for k, nt in enumerate(gm.non_terminals) if nt != start]
+    rows = []
+    for actions, gotos in zip(parser.action_rows, parser.goto_rows):
+        cells = [fmt_action(code) for code in actions]
+        cells += ['' if gotos[k] < 0 else str(gotos[k]) for k in columns]
+        rows.append(cells)
+    send('lr_table', terminals=parser.term_list, non_terminals=[gm.non_terminals[k] for k in columns], rows=rows)
+    session.keep(parser)
+
+xworker.onmessage = ffi.create_proxy(on_message)
+send('ready')